@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,7 +7,97 @@ class Settings(BaseSettings):
     LLM_PROVIDER: str
     LLM_MODEL: str
     QDRANT_API_KEY: str
-    QDRANT_URL: str
+    QDRANT_URL: str  # ":memory:" runs Qdrant in-process (local mode)
+    QDRANT_PATH: Optional[str] = None  # local mode persisted to this directory
+
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: Optional[str] = ".cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10_000
+    EMBEDDING_CACHE_MAX_MB: int = 512
+
+    # When the embedding model loads: on first use, in the background once the
+    # server is up, or before it starts accepting requests
+    MODEL_LOAD: Literal["lazy", "background", "startup"] = "background"
+
+    # torch | onnx | onnx-int8 (ONNX Runtime with int8 weights); see EmbeddingsManager
+    EMBEDDING_BACKEND: Literal["torch", "onnx", "onnx-int8"] = "torch"
+    EMBEDDING_THREADS: Optional[int] = None  # defaults to the runtime's choice
+    # Target CPU of the int8 kernels: avx2 | avx512 | avx512_vnni | arm64
+    EMBEDDING_ONNX_QUANTIZATION: str = "avx2"
+    EMBEDDING_ONNX_DIR: str = ".cache/onnx"
+    # Ingestion batches are padded up to one of these token lengths; [] pads
+    # to the longest text in each batch
+    EMBEDDING_PADDING_BUCKETS: List[int] = [32, 64, 128, 256]
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_WORKERS: int = 1
+    INGEST_BATCH_SIZE: int = 256
+    EMBEDDING_EXECUTOR_WORKERS: int = 2
+
+    # Chunk sizes in tokens of the embedding model (all-MiniLM-L6-v2 truncates
+    # past 256, including its two special tokens) or in characters
+    CHUNK_UNIT: Literal["tokens", "chars"] = "tokens"
+    CHUNK_SIZE: int = 250
+    CHUNK_OVERLAP: int = 50
+
+    PDF_WORKERS: Optional[int] = None  # defaults to os.cpu_count()
+    PDF_PAGES_PER_TASK: int = 16
+
+    INGEST_JOBS_DB_PATH: str = ".cache/ingestion_jobs.sqlite3"
+    INGEST_SPOOL_DIR: str = ".cache/spool"
+    INGEST_JOB_WORKERS: int = 2
+    INGEST_MAX_JOBS_PER_COLLECTION: int = 1
+    # Longest a wait=true ingestion request blocks before returning the job id
+    INGEST_WAIT_TIMEOUT_SECONDS: float = 300
+
+    # "context": rag_retrival returns cited passages and the agent answers once.
+    # "generate": rag_retrival runs the full RAG pipeline including its own LLM call.
+    RAG_TOOL_MODE: Literal["context", "generate"] = "context"
+    RAG_CONTEXT_TOKEN_BUDGET: int = 1500
+
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2000
+
+    CHECKPOINTER_BACKEND: Literal["memory", "sqlite", "redis"] = "sqlite"
+    CHECKPOINT_SQLITE_PATH: str = ".cache/checkpoints.sqlite3"
+    CHECKPOINT_REDIS_URL: str = "redis://localhost:6379/0"
+    CHECKPOINT_TTL_SECONDS: Optional[int] = 7 * 24 * 3600
+    CHECKPOINT_MAX_THREADS: Optional[int] = 10_000
+    CHECKPOINT_MAX_MB: int = 256
+
+    # "hybrid": new collections also store BM25 sparse vectors, fused with RRF
+    RETRIEVAL_MODE: Literal["dense", "hybrid"] = "hybrid"
+    HYBRID_PREFETCH_LIMIT: int = 20
+    BM25_AVG_DOC_LENGTH: int = 150
+
+    COLLECTION_WARMUP_ENABLED: bool = True
+    # Change counters that keep the collection caches of worker processes in step
+    COLLECTION_VERSIONS_DB_PATH: str = ".cache/collection_versions.sqlite3"
+    # default | int8 | binary | on_disk | large, see storage_profiles.py
+    DEFAULT_STORAGE_PROFILE: str = "default"
+    QUERY_HNSW_EF: Optional[int] = None
+    QUERY_OVERSAMPLING: Optional[float] = None
+
+    RAG_TOP_K: int = 3
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_BACKEND: Literal["torch", "onnx"] = "torch"
+    RERANK_CANDIDATES: int = 20
+    RERANK_BATCH_SIZE: int = 16
+    RERANK_BUDGET_MS: int = 150
+    RERANK_CACHE_ITEMS: int = 50_000
+
+    CONTEXT_MANAGEMENT_ENABLED: bool = True
+    CONTEXT_TOKEN_BUDGET: int = 4000
+    CONTEXT_KEEP_RECENT_TURNS: int = 2
+    CONTEXT_TOOL_OUTPUT_TOKENS: int = 150
+    CONTEXT_SUMMARY_MAX_WORDS: int = 200
+
+    # Print one JSON line per timing span (trace id, parent, duration)
+    TELEMETRY_LOG_SPANS: bool = False
+    # Per-worker metric snapshots that /metrics sums under app.server
+    METRICS_DB_PATH: str = ".cache/metrics.sqlite3"
 
     model_config = SettingsConfigDict(env_file="../../.env", env_prefix="RAG_CHATBOT_")
 
@@ -1,19 +1,69 @@
-from typing import List, Optional
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import (
+    JSONResponse,
+    ORJSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from app.models.models import (
+    BatchQueryRequest,
+    IngestionJob,
     InitCollectionRequest,
     KnowledgeBotRequest,
     StoreDocsRequest,
     QueryRequest,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from app.services.services_registry import file_processor
-from app.services.services_registry import vector_store_manager
-from app.services.services_registry import knowledge_bot_app
+from starlette.routing import get_route_path
+from app.config.settings import settings
+from app.services.services_registry import services
+from app.services.telemetry import HTTP_REQUEST_SECONDS, metrics, trace
+from app.services.vector_store_manager import payload_selector, point_result
+
+
+async def _load_models() -> None:
+    try:
+        await asyncio.to_thread(services.embeddings_manager.load)
+    except Exception as e:
+        print(f"Loading the embeddings model failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.COLLECTION_WARMUP_ENABLED:
+        try:
+            names = await services.async_vector_store_manager.warm_up()
+            print(f"Warmed up {len(names)} collections")
+        except Exception as e:
+            print(f"Collection warm-up failed: {e}")
+    await services.ingestion_jobs.start()
+    model_load = None
+    if settings.MODEL_LOAD == "startup":
+        await _load_models()
+    elif settings.MODEL_LOAD == "background":
+        # Start serving right away; requests needing embeddings wait on the load
+        model_load = asyncio.create_task(_load_models())
+    yield
+    if model_load is not None:
+        await model_load
+    await services.ingestion_jobs.stop()
+    # Only shut down what was actually built
+    if services.built("async_vector_store_manager"):
+        await services.async_vector_store_manager.close()
+    if services.built("file_processor"):
+        services.file_processor.shutdown()
+    if services.built("reranker") and services.reranker is not None:
+        services.reranker.close()
 
 
 app = FastAPI(
     title="RAG API",
+    lifespan=lifespan,
     version="1.0.0",
     root_path="/api",
     docs_url="/swagger",
@@ -28,24 +78,153 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
 
+def _incoming_trace_id(request: Request) -> Optional[str]:
+    """Continue a caller's trace from X-Trace-Id or a W3C traceparent header."""
+    if trace_id := request.headers.get("x-trace-id"):
+        return trace_id[:64]
+    parts = request.headers.get("traceparent", "").split("-")
+    return parts[1] if len(parts) == 4 else None
+
+
+# Allowance for multipart boundaries, part headers and form fields
+UPLOAD_OVERHEAD_BYTES = 1024 * 1024
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject an upload whose declared size can't fit before reading its body."""
+    # Route path: behind the /api root path the URL path is /api/upload-docs
+    if request.method == "POST" and get_route_path(request.scope) == "/upload-docs":
+        file_processor = services.file_processor
+        limit = (
+            file_processor.max_files * file_processor.max_bytes + UPLOAD_OVERHEAD_BYTES
+        )
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            return JSONResponse(
+                status_code=413,
+                content={
+                    "detail": f"Upload exceeds {limit/1024/1024:.1f} MB "
+                    f"({file_processor.max_files} files of "
+                    f"{file_processor.max_bytes/1024/1024:.1f} MB)"
+                },
+            )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Run each request under one trace id and time it by route and status."""
+    started = time.perf_counter()
+    status = 500
+    with trace(_incoming_trace_id(request)) as trace_id:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            route = request.scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=request.method,
+                # The route template, not the raw path, keeps label cardinality low
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
+    response.headers["X-Trace-Id"] = trace_id
+    return response
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Latency histograms and token counters in the Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.post("/init-collection")
-def init_collection(req: InitCollectionRequest):
+async def init_collection(req: InitCollectionRequest):
     try:
-        vector_store_manager.init_collection(collection_name=req.collection_name)
+        await services.async_vector_store_manager.init_collection(
+            collection_name=req.collection_name, storage_profile=req.storage_profile
+        )
         return {"status": "success", "collection": req.collection_name}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _job_counts(job: IngestionJob) -> Dict[str, Any]:
+    return {
+        "chunks": job.chunks,
+        "added": job.added,
+        "updated": job.updated,
+        "unchanged": job.unchanged,
+        "deleted": job.deleted,
+        "error": job.error,
+    }
+
+
+@app.delete("/collections/{collection_name}")
+async def drop_collection(collection_name: str):
+    try:
+        deleted = await asyncio.to_thread(
+            services.vector_store_manager.drop_collection, collection_name
+        )
+        if not deleted:
+            raise HTTPException(
+                status_code=404, detail=f"Collection {collection_name} not found"
+            )
+        return {"status": "success", "collection": collection_name}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/collections/{collection_name}/refresh")
+async def refresh_collection(collection_name: str):
+    try:
+        entry = await asyncio.to_thread(
+            services.vector_store_manager.refresh_collection, collection_name
+        )
+        if entry is None:
+            raise HTTPException(
+                status_code=404, detail=f"Collection {collection_name} not found"
+            )
+        return {
+            "status": "success",
+            "collection": collection_name,
+            "vector_size": entry.vector_size,
+            "hybrid": entry.hybrid,
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/store-docs")
-def store_docs(req: StoreDocsRequest):
+async def store_docs(req: StoreDocsRequest):
     try:
-        docs = file_processor.load_and_split(req.file_paths)
-        vector_store_manager.add_documents(req.collection_name, docs)
-        return {"status": "success", "docs_stored": len(docs)}
+        job = await services.ingestion_jobs.submit(
+            collection_name=req.collection_name, file_paths=req.file_paths
+        )
+        response = {
+            "status": job.status,
+            "job_id": job.id,
+            "duplicates": job.duplicates,
+        }
+        if req.wait:
+            # Still queued or running if the wait timed out; poll /jobs/{job_id}
+            job = await services.ingestion_jobs.wait(job.id)
+            response.update(status=job.status, **_job_counts(job))
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -55,55 +234,101 @@ async def upload_docs(
     collection_name: str = Form(...),
     files: Optional[List[UploadFile]] = File(None),  # case 1: frontend uploads
     file_paths: Optional[List[str]] = Form(None),  # case 2: backend/local paths
+    wait: bool = Form(False),
 ):
     try:
-        # Ensure collection exists
-        vector_store_manager.init_collection(collection_name=collection_name)
-
-        docs = []
-
-        # Case 1: In-memory uploaded files
-        if files:
-            docs = await file_processor.load_and_split(files=files)
-
-        # Case 2: Existing file paths
-        elif file_paths:
-            docs = await file_processor.load_and_split(file_paths=file_paths)
-
-        else:
+        if not files and not file_paths:
             raise HTTPException(
                 status_code=400, detail="No files or file_paths provided."
             )
 
-        # Store in vector DB
-        vector_store_manager.add_documents(collection_name=collection_name, docs=docs)
+        # Spool to disk and queue; the collection is created by the job worker
+        job = await services.ingestion_jobs.submit(
+            collection_name=collection_name, files=files, file_paths=file_paths
+        )
 
-        return {
-            "status": "success",
+        response = {
+            "status": job.status,
+            "job_id": job.id,
             "collection": collection_name,
-            "docs_stored": len(docs),
-            "files": [file.filename for file in files] if files else file_paths,
+            "files": [f.source for f in job.files],
+            "duplicates": job.duplicates,
         }
+        if wait:
+            # Still queued or running if the wait timed out; poll /jobs/{job_id}
+            job = await services.ingestion_jobs.wait(job.id)
+            response.update(status=job.status, **_job_counts(job))
+        return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = services.ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"status": "success", "job": job}
+
+
 @app.post("/query")
-def query_collection(req: QueryRequest):
+async def query_collection(req: QueryRequest):
     try:
-        results = vector_store_manager.query(
+        points = await services.async_vector_store_manager.search(
             collection_name=req.collection_name,
             query=req.query,
-            filenames=req.filenames,
+            selected_files=req.filenames,
             k=req.k,
+            offset=req.offset,
+            score_threshold=req.score_threshold,
+            with_payload=payload_selector(req.content, req.metadata_fields),
+            hnsw_ef=req.hnsw_ef,
+            oversampling=req.oversampling,
+        )
+        # Plain dicts straight to orjson: no Documents, no response model
+        return ORJSONResponse(
+            {
+                "status": "success",
+                "results": [
+                    point_result(point, req.content, req.snippet_chars)
+                    for point in points
+                ],
+                "next_offset": (
+                    req.offset + len(points) if len(points) == req.k else None
+                ),
+            }
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/query/batch")
+async def query_collections_batch(req: BatchQueryRequest):
+    if not req.collection_names or not req.queries:
+        raise HTTPException(
+            status_code=400, detail="collection_names and queries are required."
+        )
+    try:
+        results = await services.async_vector_store_manager.query_batch(
+            collection_names=req.collection_names,
+            queries=req.queries,
+            selected_files=req.filenames,
+            k=req.k,
+            hnsw_ef=req.hnsw_ef,
+            oversampling=req.oversampling,
         )
         return {
             "status": "success",
             "results": [
-                {"content": doc.page_content, "metadata": doc.metadata}
-                for doc in results
+                [
+                    {"content": doc.page_content, "metadata": doc.metadata}
+                    for doc in docs
+                ]
+                for docs in results
             ],
         }
     except Exception as e:
@@ -111,11 +336,29 @@ def query_collection(req: QueryRequest):
 
 
 @app.post("/invoke-graph")
-def invoke_knowledge_bot(knowledge_bot_request: KnowledgeBotRequest):
+async def invoke_knowledge_bot(knowledge_bot_request: KnowledgeBotRequest):
     try:
-        result = knowledge_bot_app.run_agent(
+        result = await services.knowledge_bot_app.arun_agent(
             knowledge_bot_request=knowledge_bot_request
         )
         return {"status": "success", "response": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _sse(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Format events as Server-Sent Events, reporting failures as an error event."""
+    try:
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'event': 'error', 'detail': str(e)})}\n\n"
+
+
+@app.post("/invoke-graph/stream")
+async def stream_knowledge_bot(knowledge_bot_request: KnowledgeBotRequest):
+    return StreamingResponse(
+        _sse(services.knowledge_bot_app.astream_agent(knowledge_bot_request)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -4,3 +4,5 @@ from langgraph.graph import MessagesState
 
 class KnowledgeBotState(MessagesState):
     selected_files: Optional[list[str]] = None
+    summary: Optional[str] = None
+    context_metrics: Optional[dict] = None
@@ -1,22 +1,85 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Any, List, Literal, Optional
+from pydantic import BaseModel, Field
 from langchain_core.documents import Document
 
+# Beyond a few thousand candidates the HNSW search is close to exhaustive
+MAX_HNSW_EF = 4096
+
 
 class InitCollectionRequest(BaseModel):
     collection_name: str
+    storage_profile: Optional[str] = None  # default, int8, binary, on_disk, large
 
 
 class StoreDocsRequest(BaseModel):
     collection_name: str
     file_paths: List[str]
+    wait: bool = False  # respond once the job finished, with its change counts
+
+
+class IngestFileResult(BaseModel):
+    filename: str
+    pages: int = 0
+    chunks: int = 0
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+
+
+class SpooledFile(BaseModel):
+    source: str
+    path: str
+    spooled: bool = False
+    size: int = 0
+    sha256: Optional[str] = None
+
+
+class IngestionJob(BaseModel):
+    id: str
+    collection_name: str
+    status: str = "queued"  # queued | running | completed | failed
+    stage: str = "queued"
+    files: List[SpooledFile] = []
+    # Files skipped for having the same content as another file of the job,
+    # by source, with the source of the file that was ingested instead
+    duplicates: dict[str, str] = {}
+    results: List[IngestFileResult] = []
+    chunks: int = 0
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    timings: dict[str, float] = {}
 
 
 class QueryRequest(BaseModel):
     collection_name: str
     query: str
     filenames: Optional[List[str]] = None
-    k: int = 3
+    k: int = Field(3, gt=0)
+    offset: int = Field(0, ge=0)  # skip this many hits; pass the response's next_offset
+    score_threshold: Optional[float] = None
+    # ids: id and score only; snippet: text cut to snippet_chars; full: whole text
+    content: Literal["ids", "snippet", "full"] = "full"
+    snippet_chars: int = Field(300, gt=0)
+    metadata_fields: Optional[List[str]] = None  # None returns every field
+    hnsw_ef: Optional[int] = Field(None, gt=0, le=MAX_HNSW_EF)
+    oversampling: Optional[float] = Field(None, ge=1)  # Qdrant rejects < 1
+
+
+class BatchQueryRequest(BaseModel):
+    collection_names: List[str]  # searched concurrently, results fused by rank
+    queries: List[str]
+    filenames: Optional[List[str]] = None
+    k: int = Field(3, gt=0)
+    hnsw_ef: Optional[int] = Field(None, gt=0, le=MAX_HNSW_EF)
+    oversampling: Optional[float] = Field(None, ge=1)
 
 
 class RAGQueryMetadata(BaseModel):
@@ -32,6 +95,7 @@ class RAGQueryRequest(BaseModel):
 class RAGQueryResponse(BaseModel):
     answer: str
     context: Optional[List[Document]] = None
+    timings: Optional[dict[str, Any]] = None
 
 
 class KnowledgeBotMetadata(BaseModel):
@@ -1,4 +1,5 @@
-from typing import List, Optional, TypedDict
+import operator
+from typing import Annotated, Any, Dict, List, Optional, TypedDict
 from langchain_core.documents import Document
 
 
@@ -6,5 +7,9 @@ class RAGPipelineState(TypedDict):
     question: str
     answer: str
     context: List[Document]
+    candidates: List[Document]
     collection_name: str
     selected_files: Optional[list[str]] = None
+    generate: bool
+    # Each node adds its own entries
+    timings: Annotated[Dict[str, Any], operator.or_]
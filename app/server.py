@@ -0,0 +1,124 @@
+"""
+Serve the API from several worker processes forked from one preloaded parent.
+
+uvicorn --workers starts each worker with spawn, so every worker imports the
+app and loads its own copy of the embedding model. With --preload the model is
+loaded once here and the workers are forked after it, sharing its weights
+copy-on-write: per-worker memory drops to what each worker allocates itself,
+and a new worker is ready as soon as it has forked.
+
+Each worker keeps its own collection registry and semantic cache. Drops,
+refreshes and writes through one worker reach the others through the change
+counters in COLLECTION_VERSIONS_DB_PATH, which all workers share. Metrics are
+per worker too: each one writes its snapshot to METRICS_DB_PATH about once a
+second, and /metrics on any worker reports the sum over all of them, so one
+scrape of the shared port covers the whole server.
+
+    python -m app.server --workers 4 --preload
+"""
+
+import argparse
+import os
+import signal
+import socket
+import time
+from typing import List, Optional, Set
+import uvicorn
+from app.config.settings import settings
+from app.services.telemetry import MetricsStore, metrics
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, args: argparse.Namespace) -> None:
+    config = uvicorn.Config("app.main:app", log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _fork_worker(sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # Drop the supervisor's handlers; uvicorn installs its own
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        # A connection of its own; SQLite handles must not cross a fork
+        metrics.share(MetricsStore(settings.METRICS_DB_PATH))
+        try:
+            _run_worker(sock, args)
+        finally:
+            metrics.flush()
+            os._exit(0)
+    return pid
+
+
+def serve(args: argparse.Namespace) -> None:
+    # Imported before forking so the workers share the parsed modules too
+    import app.main  # noqa: F401
+    from app.services.services_registry import services
+
+    if args.preload:
+        started = time.perf_counter()
+        services.preload()
+        print(f"Preloaded models in {time.perf_counter() - started:.1f}s")
+
+    # Snapshots left by a previous run would be added to this run's counts
+    store = MetricsStore(settings.METRICS_DB_PATH)
+    store.clear()
+    store.close()
+
+    sock = _bind(args.host, args.port)
+    workers: Set[int] = set()
+    stopping = False
+
+    def stop(signum: int, frame: Optional[object]) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        workers.add(_fork_worker(sock, args))
+    print(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited ({status}), restarting")
+            workers.add(_fork_worker(sock, args))
+    sock.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--preload",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="load models in the parent before forking the workers",
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    serve(args)
+
+
+if __name__ == "__main__":
+    main()
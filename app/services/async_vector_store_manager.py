@@ -0,0 +1,240 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from qdrant_client.models import PayloadSchemaType, ScoredPoint
+from app.config.settings import settings
+from app.services.collection_registry import CollectionEntry, CollectionRegistry
+from app.services.qdrant_clients import create_async_qdrant_client
+from app.services.sparse_encoder import BM25SparseEncoder
+from app.services.storage_profiles import get_storage_profile, search_params
+from app.services.telemetry import span
+from app.services.vector_store_manager import (
+    batch_request,
+    collection_config,
+    collection_entry,
+    document_from_point,
+    filename_filter,
+    merge_results,
+    search_request,
+)
+
+
+class AsyncVectorStoreManager:
+    """
+    Non-blocking counterpart of VectorStoreManager for the request path.
+
+    Qdrant calls go through AsyncQdrantClient and CPU-bound embedding runs on a
+    small dedicated thread pool, so an embedding never stalls the event loop.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        embedding_workers: Optional[int] = None,
+        sparse_encoder: Optional[BM25SparseEncoder] = None,
+        vector_size: Optional[int | Callable[[], int]] = None,
+        registry: Optional[CollectionRegistry] = None,
+    ) -> None:
+        self.client = create_async_qdrant_client()
+        self.embeddings = embeddings
+        self.sparse_encoder = sparse_encoder
+        # Needed to create collections; a callable is resolved on first use
+        self.vector_size = vector_size
+        self.registry = registry or CollectionRegistry()
+        self._embedding_executor = ThreadPoolExecutor(
+            max_workers=embedding_workers or settings.EMBEDDING_EXECUTOR_WORKERS,
+            thread_name_prefix="query-embedding",
+        )
+
+    async def embed_query(self, query: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        with span("embedding.query"):
+            return await loop.run_in_executor(
+                self._embedding_executor, self.embeddings.embed_query, query
+            )
+
+    async def _entry(self, collection_name: str) -> CollectionEntry:
+        entry = self.registry.get(collection_name)
+        if entry is None:
+            entry = self.registry.put(
+                collection_entry(
+                    collection_name, await self.client.get_collection(collection_name)
+                )
+            )
+        return entry
+
+    async def _is_hybrid(self, collection_name: str) -> bool:
+        return (await self._entry(collection_name)).hybrid
+
+    async def warm_up(self, collection_names: Optional[List[str]] = None) -> List[str]:
+        """Load the schema of the given (by default all) collections into the registry."""
+        if collection_names is None:
+            response = await self.client.get_collections()
+            collection_names = [c.name for c in response.collections]
+        await asyncio.gather(*(self._entry(name) for name in collection_names))
+        return collection_names
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        if hasattr(self.embeddings, "embed_queries"):
+            return self.embeddings.embed_queries(queries)
+        return self.embeddings.embed_documents(queries)
+
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed a batch of queries in a single forward pass."""
+        loop = asyncio.get_running_loop()
+        with span("embedding.queries", queries=len(queries)):
+            return await loop.run_in_executor(
+                self._embedding_executor, self._embed_queries, queries
+            )
+
+    async def init_collection(
+        self, collection_name: str, storage_profile: Optional[str] = None
+    ) -> None:
+        """Create collection and indexes if not exists."""
+        if self.registry.get(collection_name) is not None:
+            return
+        if not await self.client.collection_exists(collection_name):
+            profile = get_storage_profile(storage_profile)
+            if callable(self.vector_size):
+                # Reads the model config from disk, or loads a model not on disk
+                self.vector_size = await asyncio.to_thread(self.vector_size)
+            if self.vector_size is None:
+                raise ValueError("vector_size is needed to create collections")
+            hybrid = self.sparse_encoder is not None
+            await self.client.create_collection(
+                collection_name=collection_name,
+                **collection_config(self.vector_size, hybrid, profile),
+            )
+            self.registry.put(
+                CollectionEntry(
+                    name=collection_name, vector_size=self.vector_size, hybrid=hybrid
+                )
+            )
+            print(f"Created collection '{collection_name}'")
+
+            # Create payload index
+            await self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name="metadata.filename",
+                field_schema=PayloadSchemaType.KEYWORD,
+            )
+        else:
+            await self._entry(collection_name)
+            print(f"Using existing collection '{collection_name}'")
+
+    async def query(
+        self,
+        collection_name: str,
+        query: str,
+        selected_files: list[str] | None = None,
+        k: int = 3,
+        hnsw_ef: Optional[int] = None,
+        oversampling: Optional[float] = None,
+    ) -> List[Document]:
+        """Search collection with optional filename filter."""
+        points = await self.search(
+            collection_name,
+            query,
+            selected_files=selected_files,
+            k=k,
+            hnsw_ef=hnsw_ef,
+            oversampling=oversampling,
+        )
+        return [document_from_point(point, collection_name) for point in points]
+
+    async def search(
+        self,
+        collection_name: str,
+        query: str,
+        selected_files: list[str] | None = None,
+        k: int = 3,
+        offset: int = 0,
+        score_threshold: Optional[float] = None,
+        with_payload: bool | List[str] = True,
+        hnsw_ef: Optional[int] = None,
+        oversampling: Optional[float] = None,
+    ) -> List[ScoredPoint]:
+        """
+        Raw scored points of a search, with only the payload keys in
+        with_payload (see payload_selector) fetched from Qdrant.
+        """
+        vector = await self.embed_query(query)
+        sparse_vector = (
+            self.sparse_encoder.encode_query(query) if self.sparse_encoder else None
+        )
+        hybrid_layout = await self._is_hybrid(collection_name)
+        with span("qdrant.query", collection=collection_name):
+            response = await self.client.query_points(
+                collection_name=collection_name,
+                **search_request(
+                    dense_vector=vector,
+                    sparse_vector=sparse_vector,
+                    hybrid_layout=hybrid_layout,
+                    query_filter=filename_filter(selected_files),
+                    k=k,
+                    params=search_params(hnsw_ef, oversampling),
+                    offset=offset,
+                    score_threshold=score_threshold,
+                ),
+                with_payload=with_payload,
+            )
+        return response.points
+
+    async def query_batch(
+        self,
+        collection_names: List[str],
+        queries: List[str],
+        selected_files: list[str] | None = None,
+        k: int = 3,
+        hnsw_ef: Optional[int] = None,
+        oversampling: Optional[float] = None,
+    ) -> List[List[Document]]:
+        """
+        Run many queries against one or more collections.
+
+        Queries are embedded together and sent as one query_batch_points request
+        per collection, with collections searched concurrently. Each query's
+        hits across collections are fused by rank (RRF) into a single top k.
+        """
+        vectors = await self.embed_queries(queries)
+        sparse_vectors = [
+            self.sparse_encoder.encode_query(query) if self.sparse_encoder else None
+            for query in queries
+        ]
+        query_filter = filename_filter(selected_files)
+        params = search_params(hnsw_ef, oversampling)
+
+        async def search_collection(collection_name: str) -> list:
+            hybrid_layout = await self._is_hybrid(collection_name)
+            with span("qdrant.query_batch", collection=collection_name):
+                responses = await self.client.query_batch_points(
+                    collection_name=collection_name,
+                    requests=[
+                        batch_request(
+                            dense_vector=vector,
+                            sparse_vector=sparse_vector,
+                            hybrid_layout=hybrid_layout,
+                            query_filter=query_filter,
+                            k=k,
+                            params=params,
+                        )
+                        for vector, sparse_vector in zip(vectors, sparse_vectors)
+                    ],
+                )
+            return [response.points for response in responses]
+
+        per_collection = await asyncio.gather(
+            *(search_collection(name) for name in collection_names)
+        )
+        return [
+            merge_results(
+                [results[i] for results in per_collection], collection_names, k
+            )
+            for i in range(len(queries))
+        ]
+
+    async def close(self) -> None:
+        await self.client.close()
+        self._embedding_executor.shutdown(wait=False)
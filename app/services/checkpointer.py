@@ -0,0 +1,637 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from app.config.settings import settings
+
+# Field names inside a thread's hash; \x1f keeps them apart from namespace and
+# channel names, which may contain ":" or "|"
+SEP = "\x1f"
+
+
+class CheckpointStore(ABC):
+    """
+    Storage backend for BoundedCheckpointSaver.
+
+    Each thread is a hash of field -> bytes, mirroring a Redis hash, plus a
+    last-access time used for TTL and LRU eviction.
+    """
+
+    @abstractmethod
+    def get_fields(
+        self, thread_id: str, fields: Sequence[str]
+    ) -> List[Optional[bytes]]: ...
+
+    @abstractmethod
+    def field_names(self, thread_id: str) -> List[str]: ...
+
+    @abstractmethod
+    def set_fields(self, thread_id: str, mapping: Dict[str, bytes]) -> None: ...
+
+    @abstractmethod
+    def delete_fields(self, thread_id: str, fields: Sequence[str]) -> None: ...
+
+    @abstractmethod
+    def delete_thread(self, thread_id: str) -> None: ...
+
+    @abstractmethod
+    def touch(self, thread_id: str, ttl_seconds: Optional[int]) -> None: ...
+
+    @abstractmethod
+    def last_access(self, thread_id: str) -> Optional[float]: ...
+
+    @abstractmethod
+    def threads(self) -> List[tuple[str, float, int]]:
+        """(thread_id, last_access, bytes) for every thread, least recent first."""
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # WAL and a busy timeout let several uvicorn workers share the file
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoint_threads (
+                    thread_id TEXT PRIMARY KEY,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoint_fields (
+                    thread_id TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    PRIMARY KEY (thread_id, field)
+                )
+                """
+            )
+            self._conn.commit()
+
+    def get_fields(
+        self, thread_id: str, fields: Sequence[str]
+    ) -> List[Optional[bytes]]:
+        if not fields:
+            return []
+        placeholders = ",".join("?" * len(fields))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT field, value FROM checkpoint_fields "
+                f"WHERE thread_id = ? AND field IN ({placeholders})",
+                (thread_id, *fields),
+            ).fetchall()
+        found = dict(rows)
+        return [found.get(field) for field in fields]
+
+    def field_names(self, thread_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field FROM checkpoint_fields WHERE thread_id = ?", (thread_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def set_fields(self, thread_id: str, mapping: Dict[str, bytes]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO checkpoint_fields (thread_id, field, value) "
+                "VALUES (?, ?, ?)",
+                [(thread_id, field, value) for field, value in mapping.items()],
+            )
+            self._conn.commit()
+
+    def delete_fields(self, thread_id: str, fields: Sequence[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM checkpoint_fields WHERE thread_id = ? AND field = ?",
+                [(thread_id, field) for field in fields],
+            )
+            self._conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM checkpoint_fields WHERE thread_id = ?", (thread_id,)
+            )
+            self._conn.execute(
+                "DELETE FROM checkpoint_threads WHERE thread_id = ?", (thread_id,)
+            )
+            self._conn.commit()
+
+    def touch(self, thread_id: str, ttl_seconds: Optional[int]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoint_threads (thread_id, last_access) "
+                "VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            self._conn.commit()
+
+    def last_access(self, thread_id: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_access FROM checkpoint_threads WHERE thread_id = ?",
+                (thread_id,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def threads(self) -> List[tuple[str, float, int]]:
+        with self._lock:
+            return self._conn.execute(
+                """
+                SELECT t.thread_id, t.last_access, COALESCE(SUM(LENGTH(f.value)), 0)
+                FROM checkpoint_threads t
+                LEFT JOIN checkpoint_fields f ON f.thread_id = t.thread_id
+                GROUP BY t.thread_id
+                ORDER BY t.last_access
+                """
+            ).fetchall()
+
+
+class RedisCheckpointStore(CheckpointStore):
+    """
+    Redis-compatible backend: one hash per thread and a sorted set of access times.
+
+    Each thread's stored size is kept in a separate hash, adjusted with HSTRLEN
+    deltas on every write, so eviction sweeps read one integer per thread
+    instead of transferring the checkpoint data. Concurrent writers to the same
+    fields can make it drift slightly; it only steers eviction.
+
+    Any client exposing the redis-py API works, so a local stand-in such as
+    fakeredis or a Valkey/KeyDB server can replace Redis.
+    """
+
+    def __init__(self, client: Any, prefix: str = "rag-chatbot:checkpoints:") -> None:
+        self.client = client
+        self.prefix = prefix
+        self._threads_key = f"{prefix}threads"
+        self._sizes_key = f"{prefix}sizes"
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "RedisCheckpointStore":
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError(
+                "The redis checkpointer backend requires the 'redis' package."
+            ) from e
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, thread_id: str) -> str:
+        return f"{self.prefix}thread:{thread_id}"
+
+    def get_fields(
+        self, thread_id: str, fields: Sequence[str]
+    ) -> List[Optional[bytes]]:
+        if not fields:
+            return []
+        return self.client.hmget(self._key(thread_id), list(fields))
+
+    def field_names(self, thread_id: str) -> List[str]:
+        return [
+            f.decode() if isinstance(f, bytes) else f
+            for f in self.client.hkeys(self._key(thread_id))
+        ]
+
+    def _stored_bytes(self, thread_id: str, fields: Sequence[str]) -> int:
+        """Total length of the given fields' current values, without reading them."""
+        pipe = self.client.pipeline()
+        for field in fields:
+            pipe.hstrlen(self._key(thread_id), field)
+        return sum(pipe.execute())
+
+    def set_fields(self, thread_id: str, mapping: Dict[str, bytes]) -> None:
+        if mapping:
+            replaced = self._stored_bytes(thread_id, list(mapping))
+            added = sum(len(value) for value in mapping.values())
+            pipe = self.client.pipeline()
+            pipe.hset(self._key(thread_id), mapping=mapping)
+            pipe.hincrby(self._sizes_key, thread_id, added - replaced)
+            pipe.execute()
+
+    def delete_fields(self, thread_id: str, fields: Sequence[str]) -> None:
+        if fields:
+            removed = self._stored_bytes(thread_id, fields)
+            pipe = self.client.pipeline()
+            pipe.hdel(self._key(thread_id), *fields)
+            pipe.hincrby(self._sizes_key, thread_id, -removed)
+            pipe.execute()
+
+    def delete_thread(self, thread_id: str) -> None:
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(thread_id))
+        pipe.zrem(self._threads_key, thread_id)
+        pipe.hdel(self._sizes_key, thread_id)
+        pipe.execute()
+
+    def touch(self, thread_id: str, ttl_seconds: Optional[int]) -> None:
+        pipe = self.client.pipeline()
+        pipe.zadd(self._threads_key, {thread_id: time.time()})
+        if ttl_seconds:
+            # Let Redis expire idle threads on its own as well
+            pipe.expire(self._key(thread_id), ttl_seconds)
+        pipe.execute()
+
+    def last_access(self, thread_id: str) -> Optional[float]:
+        return self.client.zscore(self._threads_key, thread_id)
+
+    def threads(self) -> List[tuple[str, float, int]]:
+        entries = self.client.zrange(self._threads_key, 0, -1, withscores=True)
+        if not entries:
+            return []
+        thread_ids = [
+            member.decode() if isinstance(member, bytes) else member
+            for member, _ in entries
+        ]
+        sizes = self.client.hmget(self._sizes_key, thread_ids)
+        return [
+            # A thread that was only touched has no size yet
+            (thread_id, score, int(size or 0))
+            for thread_id, (_, score), size in zip(thread_ids, entries, sizes)
+        ]
+
+
+class BoundedCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer with persistence, TTL and memory bounds.
+
+    Only the latest checkpoint per thread and namespace is kept. Channel values
+    are stored per (channel, version), so each put writes just the channels that
+    changed (the delta), and blobs the latest checkpoint no longer references are
+    pruned. Threads idle for longer than ttl_seconds expire, and the least
+    recently used threads are evicted beyond max_threads or max_bytes.
+    """
+
+    def __init__(
+        self,
+        store: CheckpointStore,
+        ttl_seconds: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sweep_interval: int = 50,
+    ) -> None:
+        super().__init__()
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._puts_since_sweep = 0
+        self._sweep_lock = threading.Lock()
+
+    # Serialization helpers: serde returns (type, bytes); store them as one value
+    def _pack(self, value: Any) -> bytes:
+        type_, data = self.serde.dumps_typed(value)
+        return type_.encode() + b"\0" + data
+
+    def _unpack(self, value: bytes) -> Any:
+        type_, _, data = value.partition(b"\0")
+        return self.serde.loads_typed((type_.decode(), data))
+
+    @staticmethod
+    def _checkpoint_field(checkpoint_ns: str) -> str:
+        return f"c{SEP}{checkpoint_ns}"
+
+    @staticmethod
+    def _blob_field(checkpoint_ns: str, channel: str, version: Any) -> str:
+        return f"b{SEP}{checkpoint_ns}{SEP}{channel}{SEP}{version}"
+
+    @staticmethod
+    def _writes_prefix(checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"w{SEP}{checkpoint_ns}{SEP}{checkpoint_id}{SEP}"
+
+    def _writes_field(
+        self, checkpoint_ns: str, checkpoint_id: str, task_id: str
+    ) -> str:
+        # One field per task: tasks of a step (e.g. parallel tool calls) write
+        # concurrently, and never read-modify-write each other's writes
+        return self._writes_prefix(checkpoint_ns, checkpoint_id) + task_id
+
+    def _is_expired(self, thread_id: str) -> bool:
+        if not self.ttl_seconds:
+            return False
+        last_access = self.store.last_access(thread_id)
+        return last_access is not None and time.time() - last_access > self.ttl_seconds
+
+    def _load_tuple(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str] = None
+    ) -> Optional[CheckpointTuple]:
+        (record,) = self.store.get_fields(
+            thread_id, [self._checkpoint_field(checkpoint_ns)]
+        )
+        if record is None:
+            return None
+        saved = self._unpack(record)
+        checkpoint = saved["checkpoint"]
+        if checkpoint_id and checkpoint["id"] != checkpoint_id:
+            # Older checkpoints are compacted away
+            return None
+
+        versions = checkpoint["channel_versions"]
+        channels = list(versions)
+        writes_prefix = self._writes_prefix(checkpoint_ns, checkpoint["id"])
+        writes_fields = sorted(
+            field
+            for field in self.store.field_names(thread_id)
+            if field.startswith(writes_prefix)
+        )
+        blobs = self.store.get_fields(
+            thread_id,
+            [self._blob_field(checkpoint_ns, c, versions[c]) for c in channels]
+            + writes_fields,
+        )
+        task_writes = blobs[len(channels) :]
+        del blobs[len(channels) :]
+        channel_values = {}
+        for channel, blob in zip(channels, blobs):
+            if blob is not None and not blob.startswith(b"empty\0"):
+                channel_values[channel] = self._unpack(blob)
+
+        parent_id = saved["parent_id"]
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint["id"],
+                }
+            },
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=saved["metadata"],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, value)
+                for writes in task_writes
+                if writes is not None
+                for task_id, _, channel, value, _ in self._unpack(writes)
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        if self._is_expired(thread_id):
+            self.store.delete_thread(thread_id)
+            return None
+        return self._load_tuple(
+            thread_id,
+            config["configurable"].get("checkpoint_ns", ""),
+            get_checkpoint_id(config),
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config:
+            thread_ids = [config["configurable"]["thread_id"]]
+            config_ns = config["configurable"].get("checkpoint_ns")
+            config_id = get_checkpoint_id(config)
+        else:
+            thread_ids = [thread_id for thread_id, _, _ in self.store.threads()]
+            config_ns = config_id = None
+        before_id = get_checkpoint_id(before) if before else None
+
+        for thread_id in thread_ids:
+            namespaces = sorted(
+                field.split(SEP, 1)[1]
+                for field in self.store.field_names(thread_id)
+                if field.startswith(f"c{SEP}")
+            )
+            for checkpoint_ns in namespaces:
+                if config_ns is not None and checkpoint_ns != config_ns:
+                    continue
+                checkpoint_tuple = self._load_tuple(thread_id, checkpoint_ns, config_id)
+                if checkpoint_tuple is None:
+                    continue
+                if before_id and checkpoint_tuple.checkpoint["id"] >= before_id:
+                    continue
+                if filter and not all(
+                    checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()
+                ):
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")
+
+        # Only channels that changed since the parent checkpoint are written
+        mapping = {
+            self._blob_field(checkpoint_ns, channel, version): (
+                self._pack(values[channel]) if channel in values else b"empty\0"
+            )
+            for channel, version in new_versions.items()
+        }
+        mapping[self._checkpoint_field(checkpoint_ns)] = self._pack(
+            {
+                "checkpoint": c,
+                "metadata": get_checkpoint_metadata(config, metadata),
+                "parent_id": config["configurable"].get("checkpoint_id"),
+            }
+        )
+        self.store.set_fields(thread_id, mapping)
+        self._compact(thread_id, checkpoint_ns, c)
+        self.store.touch(thread_id, self.ttl_seconds)
+        self._maybe_sweep()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def _compact(self, thread_id: str, checkpoint_ns: str, checkpoint: Dict) -> None:
+        """Drop blobs and writes the latest checkpoint no longer references."""
+        live = {
+            self._blob_field(checkpoint_ns, channel, version)
+            for channel, version in checkpoint["channel_versions"].items()
+        }
+        live.add(self._checkpoint_field(checkpoint_ns))
+        live_writes = self._writes_prefix(checkpoint_ns, checkpoint["id"])
+
+        stale = []
+        for field in self.store.field_names(thread_id):
+            kind, field_ns = field.split(SEP, 2)[:2]
+            if field_ns == checkpoint_ns:
+                if field not in live and not field.startswith(live_writes):
+                    stale.append(field)
+            elif checkpoint_ns == "" and kind in ("c", "b", "w"):
+                # Subgraph runs (e.g. the RAG pipeline called from a tool) have
+                # finished once the root graph checkpoints again
+                stale.append(field)
+        if stale:
+            self.store.delete_fields(thread_id, stale)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        field = self._writes_field(
+            checkpoint_ns, config["configurable"]["checkpoint_id"], task_id
+        )
+
+        (existing,) = self.store.get_fields(thread_id, [field])
+        saved = self._unpack(existing) if existing else []
+        indexes = {idx for _, idx, _, _, _ in saved}
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            if write_idx >= 0 and write_idx in indexes:
+                continue
+            saved = [w for w in saved if w[1] != write_idx] + [
+                (task_id, write_idx, channel, value, task_path)
+            ]
+
+        self.store.set_fields(thread_id, {field: self._pack(saved)})
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.store.delete_thread(thread_id)
+
+    def _maybe_sweep(self) -> None:
+        with self._sweep_lock:
+            self._puts_since_sweep += 1
+            if self._puts_since_sweep < self.sweep_interval:
+                return
+            self._puts_since_sweep = 0
+        self.sweep()
+
+    def sweep(self) -> int:
+        """Expire idle threads and evict LRU threads beyond the caps; returns count."""
+        threads = self.store.threads()  # least recently used first
+        now = time.time()
+        total_bytes = sum(size for _, _, size in threads)
+        evicted = 0
+
+        for thread_id, last_access, size in threads:
+            expired = self.ttl_seconds and now - last_access > self.ttl_seconds
+            over_count = self.max_threads and len(threads) - evicted > self.max_threads
+            over_bytes = self.max_bytes and total_bytes > self.max_bytes
+            if not (expired or over_count or over_bytes):
+                break
+            self.store.delete_thread(thread_id)
+            total_bytes -= size
+            evicted += 1
+
+        if evicted:
+            print(f"Evicted {evicted} checkpoint threads")
+        return evicted
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """Build the checkpointer selected by CHECKPOINTER_BACKEND."""
+    backend = settings.CHECKPOINTER_BACKEND
+    if backend == "memory":
+        return MemorySaver()
+
+    if backend == "redis":
+        store = RedisCheckpointStore.from_url(settings.CHECKPOINT_REDIS_URL)
+    else:
+        store = SQLiteCheckpointStore(settings.CHECKPOINT_SQLITE_PATH)
+
+    return BoundedCheckpointSaver(
+        store=store,
+        ttl_seconds=settings.CHECKPOINT_TTL_SECONDS,
+        max_threads=settings.CHECKPOINT_MAX_THREADS,
+        max_bytes=settings.CHECKPOINT_MAX_MB * 1024 * 1024,
+    )
@@ -0,0 +1,80 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from app.services.collection_versions import CollectionVersions
+
+
+@dataclass
+class CollectionEntry:
+    name: str
+    vector_size: int
+    hybrid: bool
+    vector_store: Optional[Any] = None  # QdrantVectorStore, built on first use
+    schema_version: int = 0  # CollectionVersions schema version it was read at
+
+
+class CollectionRegistry:
+    """
+    Process-wide cache of known collections and their schema.
+
+    Shared by the sync and async vector store managers so existence checks and
+    collection lookups happen once per collection instead of once per request.
+    Entries live until dropped or refreshed through the collections API; a
+    collection deleted directly in Qdrant needs an explicit refresh.
+
+    With versions, a drop or refresh in any server process reaches the others:
+    an entry read at an older schema version is dropped on its next lookup.
+    Without, the registry only knows about changes made in this process.
+    """
+
+    def __init__(self, versions: Optional[CollectionVersions] = None) -> None:
+        self.versions = versions
+        self._entries: Dict[str, CollectionEntry] = {}
+        self._lock = threading.Lock()
+
+    def _schema_version(self, name: str) -> int:
+        return self.versions.get(name)[0] if self.versions is not None else 0
+
+    def get(self, name: str) -> Optional[CollectionEntry]:
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None or self.versions is None:
+            return entry
+        if entry.schema_version != self._schema_version(name):
+            with self._lock:
+                if self._entries.get(name) is entry:
+                    del self._entries[name]
+            return None
+        return entry
+
+    def put(self, entry: CollectionEntry) -> CollectionEntry:
+        entry.schema_version = self._schema_version(entry.name)
+        with self._lock:
+            # Keep the first entry so a concurrent init doesn't drop its wrapper
+            return self._entries.setdefault(entry.name, entry)
+
+    def drop(self, name: str) -> None:
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def invalidate(self, name: str) -> None:
+        """Forget the collection here and in every other process."""
+        if self.versions is not None:
+            self.versions.bump(name, schema=True)
+        self.drop(name)
+
+    def mark_written(self, name: str) -> None:
+        """Record a write to the collection's points for every process."""
+        if self.versions is not None:
+            self.versions.bump(name)
+
+    def data_version(self, name: str) -> int:
+        return self.versions.get(name)[1] if self.versions is not None else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._entries)
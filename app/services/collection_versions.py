@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import threading
+from typing import Tuple
+
+
+class CollectionVersions:
+    """
+    Per-collection change counters in SQLite, shared by all server processes.
+
+    Every worker keeps its own collection registry and semantic cache; they
+    compare these counters on lookup to notice changes made by the others.
+    The schema version moves when a collection is dropped or refreshed, the
+    data version with every write to it (and when it is dropped).
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS collection_versions (
+                    name TEXT PRIMARY KEY,
+                    schema_version INTEGER NOT NULL,
+                    data_version INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+    def get(self, name: str) -> Tuple[int, int]:
+        """(schema version, data version) of the collection; (0, 0) if never changed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT schema_version, data_version FROM collection_versions "
+                "WHERE name = ?",
+                (name,),
+            ).fetchone()
+        return row or (0, 0)
+
+    def bump(self, name: str, schema: bool = False) -> None:
+        """Advance the data version, and with schema=True the schema version too."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO collection_versions (name, schema_version, data_version) "
+                "VALUES (?, ?, 1) ON CONFLICT (name) DO UPDATE SET "
+                "schema_version = schema_version + excluded.schema_version, "
+                "data_version = data_version + 1",
+                (name, int(schema)),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
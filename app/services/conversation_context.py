@@ -0,0 +1,220 @@
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.prompts import ChatPromptTemplate
+from app.models.knowledge_bot_pipeline import KnowledgeBotState
+from app.services.llm_manager import LLMManager
+
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You maintain a running summary of a conversation between a user and a Knowledge Bot
+            that answers from the user's uploaded documents.
+            Extend the existing summary with the new messages. Keep facts, figures, document names
+            and open questions the user may refer back to; drop pleasantries and raw tool output.
+            Answer with the updated summary only, in at most {max_words} words.""",
+        ),
+        (
+            "user",
+            "Existing summary:\n{summary}\n\nNew messages:\n{transcript}",
+        ),
+    ]
+)
+
+# Rough per-message overhead for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(
+        part if isinstance(part, str) else str(part.get("text", ""))
+        for part in message.content
+    )
+
+
+class ConversationContextManager:
+    """
+    Keeps the agent's prompt within a token budget.
+
+    Runs once per turn, before the agent. Tool outputs from older turns are
+    collapsed to a short preview, and if the history is still over budget the
+    oldest turns are folded into a running summary and removed from the state.
+    The most recent turns are always kept verbatim.
+    """
+
+    def __init__(
+        self,
+        llm_manager: LLMManager,
+        token_budget: int,
+        keep_recent_turns: int = 2,
+        tool_output_tokens: int = 150,
+        summary_max_words: int = 200,
+        tokenizer: Optional[Any] = None,
+    ) -> None:
+        self.llm_manager = llm_manager
+        self.token_budget = token_budget
+        self.keep_recent_turns = max(keep_recent_turns, 1)
+        self.tool_output_tokens = tool_output_tokens
+        self.summary_max_words = summary_max_words
+        # Any local tokenizer with an encode(text) method (HF tokenizers, tiktoken);
+        # without one tokens are estimated at ~4 characters each
+        self.count_tokens: Callable[[str], int] = (
+            (lambda text: len(tokenizer.encode(text)) if text else 0)
+            if tokenizer is not None
+            else (lambda text: (len(text) + 3) // 4)
+        )
+        self.llm: Optional[BaseChatModel] = None
+
+    def count_message_tokens(self, messages: Sequence[BaseMessage]) -> int:
+        total = 0
+        for message in messages:
+            total += self.count_tokens(_text(message)) + MESSAGE_OVERHEAD_TOKENS
+            if isinstance(message, AIMessage) and message.tool_calls:
+                total += self.count_tokens(
+                    json.dumps([call["args"] for call in message.tool_calls])
+                )
+        return total
+
+    @staticmethod
+    def _split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+        """Group messages into turns, each starting with a user message."""
+        turns: List[List[BaseMessage]] = []
+        for message in messages:
+            if isinstance(message, HumanMessage) or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def _collapse_tool_output(self, message: ToolMessage) -> Optional[ToolMessage]:
+        if message.additional_kwargs.get("collapsed"):
+            return None
+        content = _text(message)
+        tokens = self.count_tokens(content)
+        if tokens <= self.tool_output_tokens:
+            return None
+        keep_chars = len(content) * self.tool_output_tokens // tokens
+        preview = content[:keep_chars].rsplit(" ", 1)[0]
+        # Same id, so add_messages replaces the original in the state
+        return message.model_copy(
+            update={
+                "content": f"{preview} ... [older tool output truncated, {tokens} tokens]",
+                "additional_kwargs": {**message.additional_kwargs, "collapsed": True},
+            }
+        )
+
+    def _plan(self, state: KnowledgeBotState) -> Dict[str, Any]:
+        summary = state.get("summary") or ""
+        turns = self._split_turns(state["messages"])
+        old_turns = turns[: -self.keep_recent_turns]
+        plan = {
+            "started": time.perf_counter(),
+            "summary": summary,
+            "tokens_before": self.count_message_tokens(state["messages"])
+            + self.count_tokens(summary),
+            "updates": [],
+            "collapsed": 0,
+            "fold": [],
+        }
+
+        for turn in old_turns:
+            for i, message in enumerate(turn):
+                if isinstance(message, ToolMessage):
+                    collapsed = self._collapse_tool_output(message)
+                    if collapsed is not None:
+                        turn[i] = collapsed
+                        plan["updates"].append(collapsed)
+                        plan["collapsed"] += 1
+
+        total = sum(self.count_message_tokens(turn) for turn in turns)
+        total += self.count_tokens(summary)
+        for turn in old_turns:
+            if total <= self.token_budget:
+                break
+            plan["fold"].extend(turn)
+            total -= self.count_message_tokens(turn)
+        return plan
+
+    def _transcript(self, messages: Sequence[BaseMessage]) -> str:
+        lines = []
+        for message in messages:
+            if isinstance(message, HumanMessage):
+                lines.append(f"User: {_text(message)}")
+            elif isinstance(message, ToolMessage):
+                lines.append(f"Tool ({message.name}): {_text(message)}")
+            elif isinstance(message, AIMessage):
+                text = _text(message)
+                if message.tool_calls:
+                    calls = ", ".join(call["name"] for call in message.tool_calls)
+                    text = f"{text} [called {calls}]".strip()
+                lines.append(f"Assistant: {text}")
+        return "\n".join(lines)
+
+    def _summary_prompt(self, plan: Dict[str, Any]) -> List[BaseMessage]:
+        return SUMMARY_PROMPT.format_prompt(
+            summary=plan["summary"] or "(none)",
+            transcript=self._transcript(plan["fold"]),
+            max_words=self.summary_max_words,
+        ).to_messages()
+
+    def _result(
+        self, state: KnowledgeBotState, plan: Dict[str, Any], summary: str
+    ) -> Dict[str, Any]:
+        folded_ids = {message.id for message in plan["fold"]}
+        updates = [m for m in plan["updates"] if m.id not in folded_ids]
+        updates += [RemoveMessage(id=message_id) for message_id in folded_ids]
+
+        replaced = {m.id: m for m in plan["updates"]}
+        kept = [
+            replaced.get(m.id, m) for m in state["messages"] if m.id not in folded_ids
+        ]
+        tokens_after = self.count_message_tokens(kept) + self.count_tokens(summary)
+        metrics = {
+            "tokens_before": plan["tokens_before"],
+            "tokens_after": tokens_after,
+            "tokens_saved": plan["tokens_before"] - tokens_after,
+            "collapsed_tool_outputs": plan["collapsed"],
+            "summarized_messages": len(folded_ids),
+            "seconds": round(time.perf_counter() - plan["started"], 4),
+        }
+        print(f"Conversation context - {metrics}")
+        return {"messages": updates, "summary": summary, "context_metrics": metrics}
+
+    def manage(self, state: KnowledgeBotState) -> Dict[str, Any]:
+        plan = self._plan(state)
+        summary = plan["summary"]
+        if plan["fold"]:
+            self.llm = self.llm or self.llm_manager.get_model()
+            summary = self.llm.invoke(self._summary_prompt(plan)).content
+        return self._result(state, plan, summary)
+
+    async def amanage(self, state: KnowledgeBotState) -> Dict[str, Any]:
+        plan = self._plan(state)
+        summary = plan["summary"]
+        if plan["fold"]:
+            self.llm = self.llm or self.llm_manager.get_model()
+            summary = (await self.llm.ainvoke(self._summary_prompt(plan))).content
+        return self._result(state, plan, summary)
+
+    @staticmethod
+    def agent_messages(state: KnowledgeBotState) -> List[BaseMessage]:
+        """History as the agent sees it, with the running summary up front."""
+        summary = state.get("summary")
+        if not summary:
+            return state["messages"]
+        return [
+            SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"),
+            *state["messages"],
+        ]
@@ -0,0 +1,253 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache with an in-memory LRU tier backed by SQLite.
+
+    Keys are a SHA-256 of the model name and the text, so the same chunk uploaded
+    into different collections is only ever embedded once per model.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        path: Optional[str] = None,
+        memory_items: int = 10_000,
+        max_disk_mb: int = 512,
+    ) -> None:
+        self.model_name = model_name
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access "
+                "ON embeddings (last_access)"
+            )
+            self._conn.commit()
+            self._disk_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()[0]
+
+    def key(self, text: str, kind: str = "document") -> str:
+        """Hash of model name, embedding kind and text."""
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(kind.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """Insert into the memory tier, evicting least recently used entries."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(
+        self, texts: Sequence[str], kind: str = "document"
+    ) -> List[Optional[np.ndarray]]:
+        """Return cached float32 vectors, or None for each text not cached."""
+        keys = [self.key(text, kind) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        disk_lookup: dict[str, list[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup and self._conn is not None:
+                found = self._read_disk(list(disk_lookup))
+                for key, vector in found.items():
+                    self._remember(key, vector)
+                    for i in disk_lookup.pop(key):
+                        results[i] = vector
+                        self.disk_hits += 1
+
+            self.misses += sum(len(idx) for idx in disk_lookup.values())
+
+        return results
+
+    def _read_disk(self, keys: List[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                batch,
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+            self._conn.commit()
+        return found
+
+    def put_many(
+        self,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        kind: str = "document",
+    ) -> None:
+        """Store vectors in both tiers."""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text, kind)
+                array = np.asarray(vector, dtype=np.float32)
+                self._remember(key, array)
+                rows.append((key, array.tobytes(), array.nbytes, now))
+
+            if rows and self._conn is not None:
+                self._write_disk(rows)
+
+    def _write_disk(self, rows: list[tuple]) -> None:
+        keys = [row[0] for row in rows]
+        existing = 0
+        for start in range(0, len(keys), 500):
+            batch = keys[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            existing += self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM embeddings "
+                f"WHERE key IN ({placeholders})",
+                batch,
+            ).fetchone()[0]
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) "
+            "VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        self._disk_bytes += sum(row[2] for row in rows) - existing
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+        self._conn.commit()
+
+    def _evict_disk(self) -> None:
+        """Drop least recently used rows until the disk tier is under 90% of its cap."""
+        target = int(self.max_disk_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_access LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                self._disk_bytes -= size
+                if self._disk_bytes <= target:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+            self.evictions += len(victims)
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+            ),
+            "evictions": self.evictions,
+            "memory_items": len(self._memory),
+            "disk_bytes": self._disk_bytes if self._conn is not None else 0,
+        }
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that consults an EmbeddingCache before the model."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache) -> None:
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.cache.get_many(texts)
+
+        # Embed each distinct missing text once, even if repeated in the batch
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        if missing:
+            computed = self.embeddings.embed_documents(missing)
+            self.cache.put_many(missing, computed)
+            by_text = dict(zip(missing, computed))
+            cached = [v if v is not None else by_text[t] for t, v in zip(texts, cached)]
+
+        return [np.asarray(v, dtype=np.float32).tolist() for v in cached]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries with one forward pass for the uncached ones."""
+        cached = self.cache.get_many(texts, kind="query")
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        if missing:
+            # The embedding model has no query-specific prompt, so queries can be
+            # batched through embed_documents
+            computed = self.embeddings.embed_documents(missing)
+            self.cache.put_many(missing, computed, kind="query")
+            by_text = dict(zip(missing, computed))
+            cached = [v if v is not None else by_text[t] for t, v in zip(texts, cached)]
+        return [np.asarray(v, dtype=np.float32).tolist() for v in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        cached = self.cache.get_many([text], kind="query")[0]
+        if cached is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many([text], [vector], kind="query")
+            return list(vector)
+        return cached.tolist()
@@ -0,0 +1,144 @@
+import atexit
+import bisect
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from app.services.embedding_cache import EmbeddingCache
+
+
+class EmbeddingEngine:
+    """
+    Batched embedding stage for ingestion.
+
+    Wraps the SentenceTransformer model directly so chunks are encoded in
+    fixed-size batches, optionally across a multi-process worker pool, and
+    returned as float32 matrices instead of lists of Python floats.
+
+    With padding_buckets, in-process batches are grouped by token length and
+    padded up to the next bucket rather than to their longest text, so the
+    runtime sees a handful of fixed input shapes (ONNX Runtime and oneDNN
+    reuse their plans for each) and short chunks don't pay for long ones.
+    """
+
+    def __init__(
+        self,
+        load_model: Callable[[], Any],
+        batch_size: int = 64,
+        workers: int = 1,
+        cache: Optional[EmbeddingCache] = None,
+        encode_kwargs: Optional[Dict[str, Any]] = None,
+        padding_buckets: Sequence[int] = (),
+    ) -> None:
+        # Returns the sentence_transformers.SentenceTransformer, loading it once
+        self._load_model = load_model
+        self.batch_size = batch_size
+        self.workers = workers
+        self.cache = cache
+        self.encode_kwargs = encode_kwargs or {}
+        self.padding_buckets = sorted(padding_buckets)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def model(self) -> Any:
+        return self._load_model()
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _get_pool(self) -> Optional[dict]:
+        """Start the multi-process pool on first use when more than one worker is set."""
+        if self.workers <= 1:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                print(f"Starting embedding pool with {self.workers} workers...")
+                self._pool = self.model.start_multi_process_pool(
+                    target_devices=["cpu"] * self.workers
+                )
+                atexit.register(self.close)
+        return self._pool
+
+    def _bucket(self, length: int, max_length: int) -> int:
+        index = bisect.bisect_left(self.padding_buckets, length)
+        if index == len(self.padding_buckets):
+            return max_length
+        return min(self.padding_buckets[index], max_length)
+
+    def _encode_bucketed(self, texts: List[str]) -> np.ndarray:
+        import torch
+
+        model = self.model
+        tokenizer = model.tokenizer
+        max_length = model.max_seq_length
+        lengths = [
+            len(ids)
+            for ids in tokenizer(
+                texts, truncation=True, max_length=max_length, verbose=False
+            )["input_ids"]
+        ]
+        # Sorted by length, so each batch lands in the smallest bucket it fits
+        order = np.argsort(lengths, kind="stable")
+        vectors = np.empty(
+            (len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32
+        )
+        with torch.inference_mode():
+            for start in range(0, len(texts), self.batch_size):
+                batch = order[start : start + self.batch_size]
+                features = tokenizer(
+                    [texts[i] for i in batch],
+                    padding="max_length",
+                    truncation=True,
+                    max_length=self._bucket(lengths[batch[-1]], max_length),
+                    return_tensors="pt",
+                )
+                embeddings = model(dict(features))["sentence_embedding"]
+                if self.encode_kwargs.get("normalize_embeddings"):
+                    embeddings = torch.nn.functional.normalize(embeddings, dim=1)
+                vectors[batch] = embeddings.float().cpu().numpy()
+        return vectors
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        pool = self._get_pool()
+        if pool is None and self.padding_buckets:
+            return self._encode_bucketed(texts)
+        kwargs = {
+            **self.encode_kwargs,
+            "batch_size": self.batch_size,
+            "convert_to_numpy": True,
+            "show_progress_bar": False,
+        }
+        if pool is not None:
+            # Spread the batch over every worker instead of the default chunking
+            kwargs["pool"] = pool
+            kwargs["chunk_size"] = max(1, -(-len(texts) // self.workers))
+        vectors = self.model.encode(texts, **kwargs)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts into an (n, dim) float32 matrix, reusing cached vectors."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        if self.cache is None:
+            return self._encode(texts)
+
+        cached = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        computed: Dict[str, np.ndarray] = {}
+        if missing:
+            vectors = self._encode(missing)
+            self.cache.put_many(missing, vectors)
+            computed = dict(zip(missing, vectors))
+
+        return np.stack(
+            [v if v is not None else computed[t] for t, v in zip(texts, cached)]
+        ).astype(np.float32, copy=False)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self.model.stop_multi_process_pool(self._pool)
+                self._pool = None
@@ -1,16 +1,264 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+import json
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from app.config.settings import settings
+from app.services.embedding_cache import CachedEmbeddings, EmbeddingCache
+from app.services.embedding_engine import EmbeddingEngine
+
+if TYPE_CHECKING:
+    # Imports torch and transformers; loaded on first use instead
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+
+class LazyEmbeddings(Embeddings):
+    """Embeddings that load the manager's model on the first embed call."""
+
+    def __init__(self, manager: "EmbeddingsManager") -> None:
+        self.manager = manager
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.manager.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.manager.model.embed_query(text)
+
+
+class LazyTokenizer:
+    """The model's tokenizer, loaded with the model on the first encode call."""
+
+    def __init__(self, manager: "EmbeddingsManager") -> None:
+        self.manager = manager
+
+    def encode(self, text: str) -> List[int]:
+        return self.manager.model._client.tokenizer.encode(text)
+
+    def token_starts(self, text: str) -> List[int]:
+        """Character offset at which each token of text starts (no special tokens)."""
+        encoding = self.manager.model._client.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False,
+        )
+        return [start for start, _ in encoding["offset_mapping"]]
 
 
 class EmbeddingsManager:
+    """
+    Owns the sentence-transformers model and the wrappers built on it.
+
+    Nothing touches torch until the first embedding is requested (or load()
+    is called), so importing and wiring the services stays cheap.
+
+    backend selects the runtime: "torch" (float32), "onnx" (ONNX Runtime,
+    float32) or "onnx-int8" (ONNX Runtime with dynamically quantized int8
+    weights, exported once into EMBEDDING_ONNX_DIR). All three produce the
+    same model's vectors, so existing collections stay searchable: onnx
+    matches torch up to float rounding (cosine >= 0.9999) and onnx-int8 to a
+    cosine of at least 0.99, as checked by tests/test_embedding_backends.py
+    (and on a corpus of PDFs by benchmarks/embedding_backends.py).
+    """
+
     def __init__(
-        self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        backend: Optional[str] = None,
+        threads: Optional[int] = None,
     ) -> None:
         self._model_name = model_name
-        self._embeddings = None  # lazy initialization
+        self.backend = backend or settings.EMBEDDING_BACKEND
+        self.threads = threads or settings.EMBEDDING_THREADS
+        self.encode_kwargs: Dict[str, Any] = {}
+        self._model = None  # lazy initialization
+        self._model_lock = threading.Lock()
+        self._embeddings = None
+        self._engine = None
+        self._cache: Optional[EmbeddingCache] = None
+        self._dimension: Optional[int] = None
 
     @property
-    def embeddings(self) -> HuggingFaceEmbeddings:
+    def cache(self) -> Optional[EmbeddingCache]:
+        if self._cache is None and settings.EMBEDDING_CACHE_ENABLED:
+            self._cache = EmbeddingCache(
+                # int8 vectors differ slightly, so each backend gets its own keys
+                model_name=(
+                    self._model_name
+                    if self.backend == "torch"
+                    else f"{self._model_name}@{self.backend}"
+                ),
+                path=settings.EMBEDDING_CACHE_PATH,
+                memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+                max_disk_mb=settings.EMBEDDING_CACHE_MAX_MB,
+            )
+        return self._cache
+
+    @property
+    def model(self) -> "HuggingFaceEmbeddings":
+        with self._model_lock:
+            if self._model is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+
+                print(f"Loading embeddings model ({self.backend})...")
+                model_name, model_kwargs = self._model_source()
+                self._model = HuggingFaceEmbeddings(
+                    model_name=model_name,
+                    model_kwargs=model_kwargs,
+                    encode_kwargs=self.encode_kwargs,
+                )
+        return self._model
+
+    def _onnx_session_kwargs(self) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"provider": "CPUExecutionProvider"}
+        if self.threads:
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            kwargs["session_options"] = options
+        return kwargs
+
+    def _quantized_model_dir(self) -> str:
+        """Local copy of the model with int8 ONNX weights, exported on first use."""
+        target = settings.EMBEDDING_ONNX_QUANTIZATION
+        path = os.path.join(
+            settings.EMBEDDING_ONNX_DIR, self._model_name.replace("/", "__")
+        )
+        if not os.path.exists(os.path.join(path, "onnx", f"model_qint8_{target}.onnx")):
+            from sentence_transformers import (
+                SentenceTransformer,
+                export_dynamic_quantized_onnx_model,
+            )
+
+            print(f"Quantizing {self._model_name} to int8 ({target})...")
+            model = SentenceTransformer(
+                self._model_name,
+                backend="onnx",
+                model_kwargs=self._onnx_session_kwargs(),
+            )
+            model.save(path)
+            export_dynamic_quantized_onnx_model(
+                model, target, path, file_suffix=f"qint8_{target}"
+            )
+        return path
+
+    def _model_source(self) -> tuple[str, Dict[str, Any]]:
+        """Model name or path and SentenceTransformer kwargs for the backend."""
+        if self.backend == "torch":
+            if self.threads:
+                import torch
+
+                torch.set_num_threads(self.threads)
+            return self._model_name, {}
+        if self.backend == "onnx":
+            return self._model_name, {
+                "backend": "onnx",
+                "model_kwargs": self._onnx_session_kwargs(),
+            }
+        if self.backend == "onnx-int8":
+            target = settings.EMBEDDING_ONNX_QUANTIZATION
+            return self._quantized_model_dir(), {
+                "backend": "onnx",
+                "model_kwargs": {
+                    **self._onnx_session_kwargs(),
+                    "file_name": f"onnx/model_qint8_{target}.onnx",
+                },
+            }
+        raise ValueError(
+            f"Unknown embedding backend '{self.backend}', "
+            "expected one of torch, onnx, onnx-int8"
+        )
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> None:
+        """Load the model weights now, e.g. before forking workers."""
+        self.model
+
+    @property
+    def tokenizer(self) -> LazyTokenizer:
+        return LazyTokenizer(self)
+
+    def _read_model_file(self, filename: str) -> Optional[Dict[str, Any]]:
+        """A JSON file of the model, if it's on disk (a local path or the HF cache)."""
+        if os.path.isdir(self._model_name):
+            path = os.path.join(self._model_name, filename)
+        else:
+            from huggingface_hub import try_to_load_from_cache
+
+            path = try_to_load_from_cache(self._model_name, filename)
+        if not isinstance(path, str) or not os.path.isfile(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _config_dimension(self) -> Optional[int]:
+        """
+        Sentence embedding size from the model's module configs: the last
+        Pooling (word dimension times its pooling modes) or Dense layer.
+        """
+        modules = self._read_model_file("modules.json")
+        if modules is None:
+            return None
+        dimension = None
+        for module in modules:
+            kind = module["type"].rsplit(".", 1)[-1]
+            if kind not in ("Pooling", "Dense"):
+                continue
+            config = self._read_model_file(f"{module['path']}/config.json")
+            if config is None:
+                return None
+            if kind == "Dense":
+                dimension = config["out_features"]
+            else:
+                modes = sum(
+                    1
+                    for key, value in config.items()
+                    if key.startswith("pooling_mode_") and value is True
+                )
+                dimension = config["word_embedding_dimension"] * max(modes, 1)
+        return dimension
+
+    @property
+    def dimension(self) -> int:
+        """
+        Embedding size from the model config, without loading the model. Only
+        a model that is neither loaded nor on disk yet is loaded for it.
+        """
+        if self._dimension is None:
+            if self._model is None:
+                try:
+                    self._dimension = self._config_dimension()
+                except (ImportError, OSError, KeyError, ValueError) as e:
+                    print(f"Could not read the embedding size from the config - {e}")
+            if self._dimension is None:
+                self._dimension = self.model._client.get_sentence_embedding_dimension()
+        return self._dimension
+
+    @property
+    def embeddings(self) -> Embeddings:
         if self._embeddings is None:
-            print("Loading embeddings model...")
-            self._embeddings = HuggingFaceEmbeddings(model_name=self._model_name)
+            cache = self.cache
+            lazy = LazyEmbeddings(self)
+            self._embeddings = (
+                CachedEmbeddings(embeddings=lazy, cache=cache) if cache else lazy
+            )
         return self._embeddings
+
+    @property
+    def engine(self) -> EmbeddingEngine:
+        """Batched float32 embedding stage used for ingestion."""
+        if self._engine is None:
+            self._engine = EmbeddingEngine(
+                load_model=lambda: self.model._client,
+                batch_size=settings.EMBEDDING_BATCH_SIZE,
+                workers=settings.EMBEDDING_WORKERS,
+                cache=self.cache,
+                encode_kwargs=self.encode_kwargs,
+                padding_buckets=settings.EMBEDDING_PADDING_BUCKETS,
+            )
+        return self._engine
@@ -1,22 +1,66 @@
+import asyncio
+import hashlib
+import multiprocessing
 import os
-from typing import List, Optional
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import groupby, islice
+from typing import Any, Iterable, Iterator, List, Optional
 from fastapi import UploadFile
-import fitz
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-import gc
+from app.config.settings import settings
+from app.models.models import SpooledFile
+from app.services import pdf_extraction
+from app.services.telemetry import span
+from app.services.text_chunker import PageChunker
+
+# Block size for streaming uploads to disk and hashing files
+SPOOL_BLOCK_BYTES = 1024 * 1024
 
 
 class FileProcessor:
     def __init__(
-        self, chunk_size=1000, chunk_overlap=200, max_files=5, max_mb=10
+        self,
+        chunk_size=1000,
+        chunk_overlap=200,
+        max_files=5,
+        max_mb=10,
+        tokenizer: Optional[Any] = None,
     ) -> None:
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
-        )
+        # Sizes are in tokens of tokenizer when one is given, else in characters
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.tokenizer = tokenizer
         self.max_files = max_files
         self.max_bytes = max_mb * 1024 * 1024  # MB → bytes
+        self.pages_per_task = settings.PDF_PAGES_PER_TASK
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Process pool for PDF parsing, started on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                # Spawn rather than fork: the parent holds torch and HTTP client threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.PDF_WORKERS or os.cpu_count(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        return self._executor
+
+    def _reset_if_broken(self, error: Exception) -> None:
+        """Drop a pool whose worker died (e.g. a crash in PyMuPDF) so the next call starts fresh."""
+        if isinstance(error, BrokenProcessPool):
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
 
     def get_file_name(self, file_path: str) -> str:
         """Generate safe filename (without spaces, lowercase)."""
@@ -52,114 +96,180 @@ class FileProcessor:
                         f"File {fp} exceeds {self.max_bytes/1024/1024:.1f} MB"
                     )
 
-    async def _load_pdf_from_memory(
-        self, filename: str, content: bytes
-    ) -> List[Document]:
-        """Load PDF from memory bytes with proper cleanup."""
-        doc = None
+    def spool_upload(self, file: UploadFile, path: str) -> SpooledFile:
+        """
+        Stream an upload to path block by block, hashing it on the way.
+
+        Only one block is in memory at a time. Raises ValueError as soon as
+        the upload passes max_bytes, without leaving a partial file behind.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        file.file.seek(0)
         try:
-            doc = fitz.open("pdf", content)
-            documents = []
-
-            for page_num in range(doc.page_count):
-                page = doc[page_num]
-                text = page.get_text()
-
-                document = Document(
-                    page_content=text,
-                    metadata={
-                        "source": filename,
-                        "page": page_num,
-                        "filename": self.get_file_name(filename),
-                    },
-                )
-                documents.append(document)
+            with open(path, "wb") as out:
+                while block := file.file.read(SPOOL_BLOCK_BYTES):
+                    size += len(block)
+                    if size > self.max_bytes:
+                        raise ValueError(
+                            f"File {file.filename} exceeds "
+                            f"{self.max_bytes/1024/1024:.1f} MB"
+                        )
+                    digest.update(block)
+                    out.write(block)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return SpooledFile(
+            source=file.filename,
+            path=path,
+            spooled=True,
+            size=size,
+            sha256=digest.hexdigest(),
+        )
+
+    def file_sha256(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while block := f.read(SPOOL_BLOCK_BYTES):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def submit_pages(
+        self,
+        source: str,
+        content: Optional[bytes] = None,
+        path: Optional[str] = None,
+    ) -> List[Future]:
+        """
+        Queue extraction of a PDF in page ranges on the process pool.
+
+        The PDF is read from content if given, else from path, else from source.
+        """
+        path = path or source
+        try:
+            with span("pdf.page_count"):
+                total = self.executor.submit(
+                    pdf_extraction.page_count, path, content
+                ).result()
+        except Exception as e:
+            self._reset_if_broken(e)
+            raise ValueError(f"Error processing PDF {source}: {str(e)}")
 
-            return documents
+        return [
+            self.executor.submit(
+                pdf_extraction.extract_page_range,
+                path,
+                content,
+                start,
+                min(start + self.pages_per_task, total),
+            )
+            for start in range(0, total, self.pages_per_task)
+        ]
 
+    def collect_pages(self, source: str, futures: List[Future]) -> Iterator[Document]:
+        """Yield one Document per page, in page order, as page ranges complete."""
+        file_name = self.get_file_name(source)
+        try:
+            for future in futures:
+                # Time spent waiting on the parser processes for this page range
+                with span("pdf.parse"):
+                    pages = future.result()
+                for page_num, text in pages:
+                    yield Document(
+                        page_content=text,
+                        metadata={
+                            "source": source,
+                            "page": page_num,
+                            "filename": file_name,
+                        },
+                    )
         except Exception as e:
-            raise ValueError(f"Error processing PDF {filename}: {str(e)}")
-        finally:
-            # Close document to free PyMuPDF internal buffers
-            if doc is not None:
-                doc.close()
+            for future in futures:
+                future.cancel()
+            self._reset_if_broken(e)
+            raise ValueError(f"Error processing PDF {source}: {str(e)}")
+
+    def iter_pages(
+        self,
+        source: str,
+        content: Optional[bytes] = None,
+        path: Optional[str] = None,
+    ) -> Iterator[Document]:
+        """Yield one Document per PDF page, from memory bytes or from a file path."""
+        yield from self.collect_pages(source, self.submit_pages(source, content, path))
+
+    def _split_file(self, source: str, pages: Iterable[Document]) -> Iterator[Document]:
+        """Chunk one file's pages as they arrive; chunks may span pages."""
+        chunker = PageChunker(self.chunk_size, self.chunk_overlap, self.tokenizer)
+        file_name = self.get_file_name(source)
+        for page in pages:
+            with span("pdf.split"):
+                chunks = chunker.feed(page.metadata["page"], page.page_content)
+            for chunk in chunks:
+                yield chunk.to_document(source, file_name)
+        with span("pdf.split"):
+            chunks = chunker.finish()
+        for chunk in chunks:
+            yield chunk.to_document(source, file_name)
+
+    def split_pages(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """Chunk pages in order, file by file (consecutive pages of one source)."""
+        for source, file_pages in groupby(
+            pages, key=lambda page: page.metadata["source"]
+        ):
+            yield from self._split_file(source, file_pages)
+
+    def iter_chunks(
+        self, pages: Iterable[Document], batch_size: int
+    ) -> Iterator[List[Document]]:
+        """Split pages lazily and yield chunks in batches of at most batch_size."""
+        chunks = self.split_pages(pages)
+        while batch := list(islice(chunks, batch_size)):
+            yield batch
 
     async def load_and_split(
         self,
         files: Optional[List[UploadFile]] = None,
         file_paths: Optional[List[str]] = None,
     ) -> List[Document]:
-        """Load and split PDFs with comprehensive memory cleanup."""
+        """Load and split PDFs into a single list of chunks."""
 
         self.validate_files(files=files, file_paths=file_paths)
         all_docs = []
 
-        try:
-            if files:
-                for file in files:
-                    content = None
-                    docs = None
-                    split_docs = None
-
-                    try:
-                        # Read file content
-                        content = await file.read()
-
-                        # Validate size
-                        if len(content) > self.max_bytes:
-                            raise ValueError(
-                                f"File {file.filename} exceeds {self.max_bytes/1024/1024:.1f} MB"
-                            )
-
-                        # Process PDF (document cleanup handled in _load_pdf_from_memory)
-                        docs = await self._load_pdf_from_memory(file.filename, content)
-
-                        # Split documents
-                        split_docs = self.text_splitter.split_documents(docs)
-
-                        # Add metadata
-                        file_name = self.get_file_name(file.filename)
-                        for d in split_docs:
-                            d.metadata.update({"filename": file_name})
-
-                        print(f"{file_name}: {len(split_docs)} chunks")
-                        all_docs.extend(split_docs)
-
-                        # Reset file pointer
-                        await file.seek(0)
-
-                    finally:
-                        # Clean up intermediate objects
-                        del content, docs, split_docs
-                        # Force garbage collection
-                        gc.collect()
-
-            elif file_paths:
-                for file_path in file_paths:
-                    loader = None
-                    docs = None
-                    split_docs = None
-
-                    try:
-                        loader = PyMuPDFLoader(file_path)
-                        docs = loader.load()
-                        split_docs = self.text_splitter.split_documents(docs)
-
-                        file_name = self.get_file_name(file_path)
-                        for d in split_docs:
-                            d.metadata.update({"filename": file_name})
-
-                        print(f"{file_name}: {len(split_docs)} chunks")
-                        all_docs.extend(split_docs)
-
-                    finally:
-                        # Clean up file-based processing
-                        del loader, docs, split_docs
-                        gc.collect()
-
-            return all_docs
+        if files:
+            os.makedirs(settings.INGEST_SPOOL_DIR, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=settings.INGEST_SPOOL_DIR) as spool:
+                for index, file in enumerate(files):
+                    # Parsed from disk: no in-memory copy of the upload
+                    spooled = await asyncio.to_thread(
+                        self.spool_upload,
+                        file,
+                        os.path.join(
+                            spool, f"{index}-{os.path.basename(file.filename)}"
+                        ),
+                    )
+                    pages = await asyncio.to_thread(
+                        lambda: list(self.iter_pages(file.filename, path=spooled.path))
+                    )
+                    split_docs = list(self.split_pages(pages))
+                    print(
+                        f"{self.get_file_name(file.filename)}: {len(split_docs)} chunks"
+                    )
+                    all_docs.extend(split_docs)
 
-        except Exception as e:
-            # Clean up on error
-            gc.collect()
-            raise e
+                    # Reset file pointer
+                    await file.seek(0)
+
+        elif file_paths:
+            for file_path in file_paths:
+                pages = await asyncio.to_thread(
+                    lambda: list(self.iter_pages(file_path))
+                )
+                split_docs = list(self.split_pages(pages))
+                print(f"{self.get_file_name(file_path)}: {len(split_docs)} chunks")
+                all_docs.extend(split_docs)
+
+        return all_docs
@@ -0,0 +1,346 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from fastapi import UploadFile
+from app.models.models import IngestFileResult, IngestionJob, SpooledFile
+from app.services.ingestion_pipeline import IngestionPipeline
+from app.services.telemetry import span, trace
+from app.services.vector_store_manager import VectorStoreManager
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+class IngestionJobStore:
+    """
+    SQLite-backed job table so queued jobs survive a restart.
+
+    The table is shared by every worker process. Each job records the pid of
+    the process that owns it: only the owner runs it, and only a job whose
+    owner has died is taken over by another process.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    data TEXT NOT NULL,
+                    owner INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+    def add(self, job: IngestionJob, owner: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingestion_jobs (id, status, created_at, data, owner) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job.id, job.status, job.created_at, job.model_dump_json(), owner),
+            )
+            self._conn.commit()
+
+    def save(self, job: IngestionJob) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, data = ? WHERE id = ?",
+                (job.status, job.model_dump_json(), job.id),
+            )
+            self._conn.commit()
+
+    def claim(self, job_id: str, owner: int) -> bool:
+        """Mark a queued job as running, if owner still owns it and it is queued."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ingestion_jobs SET status = 'running' "
+                "WHERE id = ? AND owner = ? AND status = 'queued'",
+                (job_id, owner),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def take_over(self, job: IngestionJob, previous_owner: int, owner: int) -> bool:
+        """Move an unfinished job to owner, unless another process took it first."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, data = ?, owner = ? "
+                "WHERE id = ? AND owner = ? AND status IN ('queued', 'running')",
+                (job.status, job.model_dump_json(), owner, job.id, previous_owner),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return IngestionJob.model_validate_json(row[0]) if row else None
+
+    def unfinished(self) -> List[Tuple[IngestionJob, int]]:
+        """Queued or running jobs, with the pid of the process that owns each."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data, owner FROM ingestion_jobs "
+                "WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [(IngestionJob.model_validate_json(data), owner) for data, owner in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class IngestionJobQueue:
+    """
+    Runs ingestion outside the HTTP request.
+
+    Uploads are spooled to disk and a job id is returned immediately. A fixed
+    number of worker tasks then process jobs, with at most
+    max_jobs_per_collection running against the same collection at once.
+
+    With several server processes, each runs only the jobs it owns: the ones
+    submitted to it, and on start the ones whose owner process has died.
+    """
+
+    def __init__(
+        self,
+        ingestion_pipeline: IngestionPipeline,
+        vector_store_manager: VectorStoreManager,
+        store: IngestionJobStore,
+        spool_dir: str,
+        workers: int = 2,
+        max_jobs_per_collection: int = 1,
+        wait_timeout: float = 300,
+    ) -> None:
+        self.ingestion_pipeline = ingestion_pipeline
+        self.vector_store_manager = vector_store_manager
+        self.store = store
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.max_jobs_per_collection = max_jobs_per_collection
+        self.wait_timeout = wait_timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._collection_limits = defaultdict(
+            lambda: asyncio.Semaphore(self.max_jobs_per_collection)
+        )
+
+    async def start(self) -> None:
+        """Start workers and take over jobs left unfinished by dead processes."""
+        self._queue = asyncio.Queue()
+        pid = os.getpid()
+        for job, owner in self.store.unfinished():
+            # A job owned by this pid is from a previous run that had it too
+            if owner != pid and _process_alive(owner):
+                continue
+            job.status = "queued"
+            job.stage = "queued"
+            if self.store.take_over(job, owner, pid):
+                self._queue.put_nowait(job.id)
+                print(f"Re-queued ingestion job {job.id}")
+
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _spool(self, job_id: str, index: int, file: UploadFile) -> SpooledFile:
+        """Stream an upload into the job's spool directory, hashing it on the way."""
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        path = os.path.join(job_dir, f"{index}-{os.path.basename(file.filename)}")
+        return self.ingestion_pipeline.file_processor.spool_upload(file, path)
+
+    def _discard_spool(self, job: IngestionJob) -> None:
+        if any(f.spooled for f in job.files):
+            shutil.rmtree(os.path.join(self.spool_dir, job.id), ignore_errors=True)
+
+    async def submit(
+        self,
+        collection_name: str,
+        files: Optional[List[UploadFile]] = None,
+        file_paths: Optional[List[str]] = None,
+    ) -> IngestionJob:
+        """Validate and spool the input, then queue a job for it."""
+        if self._queue is None:
+            raise RuntimeError("IngestionJobQueue.start() must run before submit()")
+        file_processor = self.ingestion_pipeline.file_processor
+        file_processor.validate_files(files=files, file_paths=file_paths)
+
+        job = IngestionJob(
+            id=uuid.uuid4().hex,
+            collection_name=collection_name,
+            created_at=time.time(),
+        )
+        try:
+            if files:
+                # Sizes are enforced while streaming: an oversized upload fails
+                # after max_bytes have been read, not after the whole file
+                for index, file in enumerate(files):
+                    spooled = await asyncio.to_thread(self._spool, job.id, index, file)
+                    job.files.append(spooled)
+            else:
+                for fp in file_paths:
+                    job.files.append(
+                        SpooledFile(
+                            source=fp,
+                            path=fp,
+                            size=os.path.getsize(fp),
+                            sha256=await asyncio.to_thread(
+                                file_processor.file_sha256, fp
+                            ),
+                        )
+                    )
+        except BaseException:
+            self._discard_spool(job)
+            raise
+
+        # The same content twice in one request is ingested once; the skipped
+        # names are reported in job.duplicates
+        unique: Dict[str, SpooledFile] = {}
+        for spooled in job.files:
+            if spooled.sha256 in unique:
+                original = unique[spooled.sha256].source
+                print(f"{spooled.source}: same content as {original}, skipped")
+                job.duplicates[spooled.source] = original
+                if spooled.spooled:
+                    os.remove(spooled.path)
+            else:
+                unique[spooled.sha256] = spooled
+        job.files = list(unique.values())
+
+        job.timings["spool"] = round(time.time() - job.created_at, 3)
+        self.store.add(job, owner=os.getpid())
+        self._finished[job.id] = asyncio.Event()
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.store.get(job_id)
+
+    async def wait(
+        self, job_id: str, timeout: Optional[float] = None
+    ) -> Optional[IngestionJob]:
+        """
+        Wait until a job submitted by this process finishes, then return it.
+
+        Gives up after timeout seconds (wait_timeout by default) and returns
+        the job as it is, still queued or running, to be polled by its id.
+        """
+        finished = self._finished.get(job_id)
+        if finished is not None:
+            try:
+                await asyncio.wait_for(
+                    finished.wait(),
+                    timeout if timeout is not None else self.wait_timeout,
+                )
+            except asyncio.TimeoutError:
+                pass
+        return self.get(job_id)
+
+    def _notify_finished(self, job_id: str) -> None:
+        finished = self._finished.pop(job_id, None)
+        if finished is not None:
+            finished.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.store.get(job_id)
+                if job is None:
+                    self._notify_finished(job_id)
+                    continue
+                async with self._collection_limits[job.collection_name]:
+                    # Claimed atomically: a job another process took over
+                    # after this one was thought dead is skipped
+                    if not self.store.claim(job_id, os.getpid()):
+                        self._notify_finished(job_id)
+                        continue
+                    # The job id doubles as the trace id of its spans
+                    with trace(job.id), span("ingest.job"):
+                        await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IngestionJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.timings["queued"] = round(job.started_at - job.created_at, 3)
+        job.results = []
+        job.chunks = 0
+
+        job.added = job.updated = job.unchanged = job.deleted = 0
+
+        def on_progress(result: IngestFileResult) -> None:
+            job.results.append(result)
+            job.chunks += result.chunks
+            job.added += result.added
+            job.updated += result.updated
+            job.unchanged += result.unchanged
+            job.deleted += result.deleted
+            self.store.save(job)
+
+        try:
+            job.stage = "init_collection"
+            self.store.save(job)
+            await asyncio.to_thread(
+                self.vector_store_manager.init_collection, job.collection_name
+            )
+
+            job.stage = "ingesting"
+            self.store.save(job)
+            await self.ingestion_pipeline.ingest(
+                collection_name=job.collection_name,
+                file_paths=[f.path for f in job.files],
+                source_names=[f.source for f in job.files],
+                file_hashes=[f.sha256 for f in job.files],
+                on_progress=on_progress,
+            )
+            job.status = "completed"
+            job.stage = "completed"
+
+        except Exception as e:
+            print(f"Ingestion job {job.id} failed: {e}")
+            job.status = "failed"
+            job.stage = "failed"
+            job.error = str(e)
+
+        finally:
+            job.finished_at = time.time()
+            job.timings["run"] = round(job.finished_at - job.started_at, 3)
+            self.store.save(job)
+            # A cancelled job stays "running" and is re-queued with its spool on restart
+            if job.status != "running":
+                self._discard_spool(job)
+                self._notify_finished(job.id)
@@ -0,0 +1,165 @@
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Iterator, List, Optional
+from fastapi import UploadFile
+from langchain_core.documents import Document
+from app.config.settings import settings
+from app.models.models import IngestFileResult
+from app.services.file_processor import FileProcessor
+from app.services.telemetry import traced
+from app.services.vector_store_manager import VectorStoreManager
+
+
+class IngestionPipeline:
+    """
+    Streams PDFs page by page through splitting, embedding and upsert.
+
+    Only one batch of chunks (and its vectors) is held in memory at a time, so
+    memory is bounded by the batch size rather than by the size of the upload.
+    """
+
+    def __init__(
+        self,
+        file_processor: FileProcessor,
+        vector_store_manager: VectorStoreManager,
+        batch_size: Optional[int] = None,
+    ) -> None:
+        self.file_processor = file_processor
+        self.vector_store_manager = vector_store_manager
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+
+    @traced("ingest.file")
+    def _ingest_file(
+        self,
+        collection_name: str,
+        source: str,
+        page_futures: List[Future],
+        file_sha256: Optional[str] = None,
+    ) -> IngestFileResult:
+        started = time.perf_counter()
+        result = IngestFileResult(filename=self.file_processor.get_file_name(source))
+
+        def counted_pages() -> Iterator[Document]:
+            for page in self.file_processor.collect_pages(source, page_futures):
+                result.pages += 1
+                yield page
+
+        counts = self.vector_store_manager.sync_document_batches(
+            collection_name,
+            result.filename,
+            self.file_processor.iter_chunks(counted_pages(), self.batch_size),
+            file_sha256=file_sha256,
+        )
+        result.added = counts["added"]
+        result.updated = counts["updated"]
+        result.unchanged = counts["unchanged"]
+        result.deleted = counts["deleted"]
+        result.chunks = result.added + result.updated + result.unchanged
+        result.seconds = round(time.perf_counter() - started, 3)
+        print(
+            f"{result.filename}: {result.pages} pages, {result.chunks} chunks in "
+            f"'{collection_name}' ({result.added} added, {result.updated} updated, "
+            f"{result.unchanged} unchanged, {result.deleted} deleted; "
+            f"{result.seconds}s)"
+        )
+        return result
+
+    async def ingest(
+        self,
+        collection_name: str,
+        files: Optional[List[UploadFile]] = None,
+        file_paths: Optional[List[str]] = None,
+        source_names: Optional[List[str]] = None,
+        file_hashes: Optional[List[Optional[str]]] = None,
+        on_progress: Optional[Callable[[IngestFileResult], None]] = None,
+    ) -> List[IngestFileResult]:
+        """
+        Ingest uploaded files or local file paths, one file at a time.
+
+        The next file is parsed on the process pool while the current one is
+        embedded; reading ahead only one file keeps at most two files' parsed
+        pages in memory, however many files are passed.
+
+        source_names overrides the source recorded for each of file_paths, e.g.
+        the original upload name of a spooled file. With file_hashes (SHA-256
+        of each file), a file whose stored version has the same hash is
+        reported unchanged without being parsed.
+        """
+        self.file_processor.validate_files(files=files, file_paths=file_paths)
+
+        if files:
+            # Stream uploads to disk and parse them from there, so no copy of
+            # an upload is held in memory
+            os.makedirs(settings.INGEST_SPOOL_DIR, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=settings.INGEST_SPOOL_DIR) as spool:
+                spooled = [
+                    await asyncio.to_thread(
+                        self.file_processor.spool_upload,
+                        file,
+                        os.path.join(
+                            spool, f"{index}-{os.path.basename(file.filename)}"
+                        ),
+                    )
+                    for index, file in enumerate(files)
+                ]
+                return await self.ingest(
+                    collection_name,
+                    file_paths=[f.path for f in spooled],
+                    source_names=[f.source for f in spooled],
+                    file_hashes=[f.sha256 for f in spooled],
+                    on_progress=on_progress,
+                )
+
+        if not file_paths:
+            return []
+        sources = list(
+            zip(
+                source_names or file_paths,
+                file_paths,
+                file_hashes or [None] * len(file_paths),
+            )
+        )
+
+        results: List[Optional[IngestFileResult]] = [None] * len(sources)
+        for index, (source, _, file_sha256) in enumerate(sources):
+            if file_sha256 is None:
+                continue
+            filename = self.file_processor.get_file_name(source)
+            stored_hash, chunks = await asyncio.to_thread(
+                self.vector_store_manager.stored_file_hash, collection_name, filename
+            )
+            if stored_hash == file_sha256:
+                print(f"{filename}: unchanged in '{collection_name}', skipped")
+                results[index] = IngestFileResult(
+                    filename=filename, chunks=chunks, unchanged=chunks
+                )
+
+        def submit(index: int) -> Awaitable[List[Future]]:
+            source, path, _ = sources[index]
+            return asyncio.to_thread(
+                self.file_processor.submit_pages, source, None, path
+            )
+
+        to_parse = [index for index, result in enumerate(results) if result is None]
+        read_ahead = iter(to_parse[1:])
+        next_pages = await submit(to_parse[0]) if to_parse else None
+        for index, (source, _, file_sha256) in enumerate(sources):
+            if results[index] is None:
+                page_futures = next_pages
+                # Queue the following file before consuming this one
+                following = next(read_ahead, None)
+                next_pages = await submit(following) if following is not None else None
+                results[index] = await asyncio.to_thread(
+                    self._ingest_file,
+                    collection_name,
+                    source,
+                    page_futures,
+                    file_sha256,
+                )
+            if on_progress:
+                on_progress(results[index])
+
+        return results
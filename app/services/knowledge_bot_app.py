@@ -1,8 +1,9 @@
+from typing import Any, AsyncIterator, Dict, Optional
 from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.graph.message import add_messages
 from langchain_core.prompts import MessagesPlaceholder
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 from langchain_core.messages import HumanMessage, SystemMessage
 from app.models.models import (
     KnowledgeBotRequest,
@@ -12,44 +13,72 @@ from app.services.llm_manager import LLMManager
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.graph import END, StateGraph
-from IPython.display import Image, display
+from app.services.conversation_context import ConversationContextManager
 from app.services.knowledge_bot_tools import KnowledgeTools
+from app.services.telemetry import traced
 
 
-memory_saver = MemorySaver()
+AGENT_PROMPT = ChatPromptTemplate(
+    [
+        SystemMessage(
+            content="""
+            You are a Knowledge Bot that helps users find information from their uploaded documents.
+            IMPORTANT: Always try to search the document collection first using the rag_retrival tool when users ask questions. Only ask them to upload documents if the RAG search returns no results or if there are clearly no documents in the system.
+            Don't ask users to upload documents unless you've first attempted to search the existing document collection.
+            Answer from the passages rag_retrival returns and cite them by number, e.g. [1]. If they don't contain the answer, say so.
+            """
+        ),
+        MessagesPlaceholder(variable_name="messages"),
+    ]
+)
 
 
 class KnowledgeBotApp:
-    def __init__(self, llm_manager: LLMManager) -> None:
+    def __init__(
+        self,
+        llm_manager: LLMManager,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        context_manager: Optional[ConversationContextManager] = None,
+    ) -> None:
         self.llm_manager = llm_manager
+        self.checkpointer = checkpointer
+        self.context_manager = context_manager
         self.knowledge_tools: KnowledgeTools = KnowledgeTools()
+        self.agent_runnable: Optional[Runnable] = None
         self.compiled_graph: CompiledStateGraph = self._build_rag_graph()
 
-    def _agent(self, state: KnowledgeBotState):
+    def _build_agent_runnable(self) -> Runnable:
         llm = self.llm_manager.get_model()
-        agent_prompt = ChatPromptTemplate(
-            [
-                SystemMessage(
-                    content="""
-                    You are a Knowledge Bot that helps users find information from their uploaded documents.
-                    IMPORTANT: Always try to search the document collection first using the rag_retrival tool when users ask questions. Only ask them to upload documents if the RAG search returns no results or if there are clearly no documents in the system.
-                    Don't ask users to upload documents unless you've first attempted to search the existing document collection.
-                    """
-                ),
-                MessagesPlaceholder(variable_name="messages"),
-            ]
-        )
-        agent_runnable = agent_prompt | llm.bind_tools(
+        return AGENT_PROMPT | llm.bind_tools(
             tools=[self.knowledge_tools.calculator, self.knowledge_tools.rag_retrival],
         )
-        response = agent_runnable.invoke(input=state)
+
+    def _agent_prompt_input(self, state: KnowledgeBotState) -> dict:
+        if self.context_manager is None:
+            return state
+        return {"messages": self.context_manager.agent_messages(state)}
+
+    @traced("agent.agent")
+    def _agent(self, state: KnowledgeBotState):
+        response = self.agent_runnable.invoke(input=self._agent_prompt_input(state))
+        state["messages"] = add_messages(left=state["messages"], right=response)
+        return state
+
+    @traced("agent.agent")
+    async def _aagent(self, state: KnowledgeBotState):
+        response = await self.agent_runnable.ainvoke(
+            input=self._agent_prompt_input(state)
+        )
         state["messages"] = add_messages(left=state["messages"], right=response)
         return state
 
     def _build_rag_graph(self) -> CompiledStateGraph:
+        # Prompt and tool binding are compiled once, not on every agent step
+        self.agent_runnable = self._build_agent_runnable()
+
         graph = StateGraph(KnowledgeBotState)
 
-        graph.add_node("agent", self._agent)
+        graph.add_node("agent", RunnableLambda(self._agent, afunc=self._aagent))
         graph.add_node(
             "tools",
             ToolNode(
@@ -57,7 +86,19 @@ class KnowledgeBotApp:
             ),
         )
 
-        graph.set_entry_point("agent")
+        if self.context_manager is not None:
+            # Trim and summarize the history once per turn, before the agent runs
+            graph.add_node(
+                "manage_context",
+                RunnableLambda(
+                    traced("agent.manage_context")(self.context_manager.manage),
+                    afunc=traced("agent.manage_context")(self.context_manager.amanage),
+                ),
+            )
+            graph.set_entry_point("manage_context")
+            graph.add_edge("manage_context", "agent")
+        else:
+            graph.set_entry_point("agent")
         graph.add_conditional_edges(
             "agent",
             tools_condition,
@@ -65,26 +106,114 @@ class KnowledgeBotApp:
         )
         graph.add_edge("tools", "agent")
 
-        compiled_graph = graph.compile(checkpointer=memory_saver)
+        compiled_graph = graph.compile(checkpointer=self.checkpointer)
         return compiled_graph
 
     def display_graph(self) -> None:
+        from IPython.display import Image, display
+
         display(
             Image(
                 self.compiled_graph.get_graph(xray=True).draw_mermaid_png(max_retries=5)
             )
         )
 
-    def run_agent(self, knowledge_bot_request: KnowledgeBotRequest) -> None:
-        config = RunnableConfig(
+    def _agent_input(self, knowledge_bot_request: KnowledgeBotRequest) -> dict:
+        return {
+            "messages": HumanMessage(content=knowledge_bot_request.user_query),
+            "selected_files": knowledge_bot_request.metadata.selected_files,
+        }
+
+    def _agent_config(
+        self, knowledge_bot_request: KnowledgeBotRequest
+    ) -> RunnableConfig:
+        return RunnableConfig(
             configurable={"thread_id": knowledge_bot_request.thread_id}
         )
+
+    @traced("agent.run")
+    def run_agent(self, knowledge_bot_request: KnowledgeBotRequest) -> str:
         result = self.compiled_graph.invoke(
-            {
-                "messages": HumanMessage(content=knowledge_bot_request.user_query),
-                "selected_files": knowledge_bot_request.metadata.selected_files,
-            },
-            config=config,
+            self._agent_input(knowledge_bot_request),
+            config=self._agent_config(knowledge_bot_request),
+        )
+        print(result["messages"][-1].content)
+        return result["messages"][-1].content
+
+    @traced("agent.run")
+    async def arun_agent(self, knowledge_bot_request: KnowledgeBotRequest) -> str:
+        result = await self.compiled_graph.ainvoke(
+            self._agent_input(knowledge_bot_request),
+            config=self._agent_config(knowledge_bot_request),
         )
         print(result["messages"][-1].content)
         return result["messages"][-1].content
+
+    async def astream_agent(
+        self, knowledge_bot_request: KnowledgeBotRequest
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream LLM tokens, tool calls and retrieval results as the graph runs.
+
+        Yields dicts with an "event" key: context (history trimming metrics),
+        token, tool_start, tool_end, retrieval and finally done with the agent's
+        final answer.
+        """
+        final_answer = ""
+        async for event in self.compiled_graph.astream_events(
+            self._agent_input(knowledge_bot_request),
+            config=self._agent_config(knowledge_bot_request),
+            version="v2",
+        ):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chat_model_stream" and node != "manage_context":
+                content = event["data"]["chunk"].content
+                if content:
+                    yield {"event": "token", "node": node, "content": content}
+
+            elif kind == "on_chat_model_end" and node == "agent":
+                output = event["data"]["output"]
+                if not output.tool_calls:
+                    final_answer = output.content
+
+            elif kind == "on_chain_end" and event["name"] == "manage_context":
+                metrics = (event["data"].get("output") or {}).get("context_metrics")
+                yield {"event": "context", "metrics": metrics}
+
+            elif kind == "on_tool_start":
+                yield {
+                    "event": "tool_start",
+                    "tool": event["name"],
+                    "input": {
+                        k: v
+                        for k, v in event["data"].get("input", {}).items()
+                        if k not in ("state", "tool_call_id", "special_config_param")
+                    },
+                }
+
+            elif kind == "on_tool_end":
+                yield {"event": "tool_end", "tool": event["name"]}
+
+            elif kind == "on_chain_end" and event["name"] in (
+                "retrieve_documents",
+                "rerank_documents",
+            ):
+                # With reranking, retrieve_documents only yields candidates
+                docs = (event["data"].get("output") or {}).get("context")
+                if docs is None:
+                    continue
+                yield {
+                    "event": "retrieval",
+                    "sources": [
+                        {
+                            "source": doc.metadata.get("source"),
+                            "filename": doc.metadata.get("filename"),
+                            "page": doc.metadata.get("page"),
+                        }
+                        for doc in docs
+                    ],
+                }
+
+        yield {"event": "done", "response": final_answer}
@@ -1,14 +1,40 @@
 from typing import Annotated
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool, tool
 from langgraph.types import Command
 from langchain_core.messages import ToolMessage
 from langgraph.prebuilt import InjectedState
 from langchain_core.tools import InjectedToolCallId
+from app.config.settings import settings
 from app.models.models import RAGQueryMetadata, RAGQueryRequest
 from app.services.rag_pipeline import RAGPipeline
+from app.services.telemetry import span
 from langchain_core.runnables import RunnableConfig
 
 
+def _rag_request(
+    user_query: str, state: dict, config: RunnableConfig
+) -> RAGQueryRequest:
+    thread_id = config["configurable"]["thread_id"]
+    return RAGQueryRequest(
+        user_query=user_query,
+        collection_name=thread_id,
+        metadata=RAGQueryMetadata(selected_files=state["selected_files"]),
+    )
+
+
+def _tool_result(result, tool_call_id: str) -> Command:
+    return Command(
+        update={
+            "messages": [
+                ToolMessage(
+                    content=result,
+                    tool_call_id=tool_call_id,
+                )
+            ]
+        },
+    )
+
+
 class KnowledgeTools:
     rag_pipeline: RAGPipeline = None
 
@@ -26,19 +52,9 @@ class KnowledgeTools:
         Use this tool to add two numbers.
         """
         result = a + b
-        return Command(
-            update={
-                "messages": [
-                    ToolMessage(
-                        content=result,
-                        tool_call_id=tool_call_id,
-                    )
-                ]
-            },
-        )
+        return _tool_result(result, tool_call_id)
 
-    @tool()
-    def rag_retrival(
+    def _rag_retrival(
         user_query: str,
         tool_call_id: Annotated[str, InjectedToolCallId] = None,
         state: Annotated[dict, InjectedState] = None,
@@ -46,21 +62,40 @@ class KnowledgeTools:
     ) -> Command:
         """
         Use this tool to search and give details about the documents uploaded by the user.
+        Returns numbered passages with their source file and page.
         """
-        thread_id = special_config_param["configurable"]["thread_id"]
-        rag_bot_request = RAGQueryRequest(
-            user_query=user_query,
-            collection_name=thread_id,
-            metadata=RAGQueryMetadata(selected_files=state["selected_files"]),
-        )
-        result = KnowledgeTools.rag_pipeline.run_pipeline(rag_bot_request)
-        return Command(
-            update={
-                "messages": [
-                    ToolMessage(
-                        content=result,
-                        tool_call_id=tool_call_id,
-                    )
-                ]
-            },
-        )
+        rag_bot_request = _rag_request(user_query, state, special_config_param)
+        rag_pipeline = KnowledgeTools.rag_pipeline
+        with span("tool.rag_retrival"):
+            if settings.RAG_TOOL_MODE == "generate":
+                # Only the answer goes into the message history, not the context
+                result = rag_pipeline.run_pipeline(rag_bot_request).answer
+            else:
+                retrieved = rag_pipeline.run_pipeline(rag_bot_request, generate=False)
+                result = rag_pipeline.format_context(retrieved.context or [])
+        return _tool_result(result, tool_call_id)
+
+    async def _arag_retrival(
+        user_query: str,
+        tool_call_id: Annotated[str, InjectedToolCallId] = None,
+        state: Annotated[dict, InjectedState] = None,
+        special_config_param: RunnableConfig = None,
+    ) -> Command:
+        rag_bot_request = _rag_request(user_query, state, special_config_param)
+        rag_pipeline = KnowledgeTools.rag_pipeline
+        with span("tool.rag_retrival"):
+            if settings.RAG_TOOL_MODE == "generate":
+                result = (await rag_pipeline.arun_pipeline(rag_bot_request)).answer
+            else:
+                retrieved = await rag_pipeline.arun_pipeline(
+                    rag_bot_request, generate=False
+                )
+                result = rag_pipeline.format_context(retrieved.context or [])
+        return _tool_result(result, tool_call_id)
+
+    # Sync and async implementations, so ToolNode doesn't fall back to a thread
+    rag_retrival = StructuredTool.from_function(
+        func=_rag_retrival,
+        coroutine=_arag_retrival,
+        name="rag_retrival",
+    )
@@ -1,22 +1,53 @@
-from typing import Optional
+import json
+import threading
+from typing import Any, Dict, Optional
 from langchain.chat_models import init_chat_model
 from langchain_core.language_models import BaseChatModel
 from app.config.settings import settings
+from app.services.telemetry import token_usage_callback
 
 
 class LLMManager:
     """
     Handles initialization of LLMs with flexibility to switch models or providers.
+
+    Models are kept in a registry keyed by (provider, model, params), so every
+    caller shares one warm client and its pooled keep-alive HTTP connections.
     """
 
+    def __init__(self) -> None:
+        self._models: Dict[tuple[str, str, str], BaseChatModel] = {}
+        self._lock = threading.Lock()
+
     def get_model(
-        self, model_name: Optional[str] = None, model_provider: Optional[str] = None
+        self,
+        model_name: Optional[str] = None,
+        model_provider: Optional[str] = None,
+        **model_kwargs: Any,
     ) -> BaseChatModel:
         """
-        Initialize and return the LLM instance.
+        Return the shared LLM instance, initializing it on first use.
         """
-        return init_chat_model(
-            model=model_name or settings.LLM_MODEL,
-            model_provider=model_provider or settings.LLM_PROVIDER,
-            api_key=settings.LLM_API_KEY,
-        )
+        model = model_name or settings.LLM_MODEL
+        provider = model_provider or settings.LLM_PROVIDER
+        key = (provider, model, json.dumps(model_kwargs, sort_keys=True, default=str))
+
+        llm = self._models.get(key)
+        if llm is None:
+            with self._lock:
+                llm = self._models.get(key)
+                if llm is None:
+                    llm = init_chat_model(
+                        model=model,
+                        model_provider=provider,
+                        api_key=settings.LLM_API_KEY,
+                        callbacks=[token_usage_callback],
+                        **model_kwargs,
+                    )
+                    self._models[key] = llm
+        return llm
+
+    def clear(self) -> None:
+        """Drop cached models, e.g. after changing credentials."""
+        with self._lock:
+            self._models.clear()
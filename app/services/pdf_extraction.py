@@ -0,0 +1,32 @@
+"""
+PDF text extraction functions run inside the FileProcessor process pool.
+
+Kept free of app imports so spawned workers only need to import PyMuPDF.
+"""
+
+from typing import List, Optional, Tuple
+import fitz
+
+
+def _open(source: str, content: Optional[bytes] = None) -> fitz.Document:
+    return fitz.open("pdf", content) if content is not None else fitz.open(source)
+
+
+def page_count(source: str, content: Optional[bytes] = None) -> int:
+    doc = _open(source, content)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def extract_page_range(
+    source: str, content: Optional[bytes], start: int, end: int
+) -> List[Tuple[int, str]]:
+    """Return (page number, text) for pages in [start, end)."""
+    doc = _open(source, content)
+    try:
+        return [(page_num, doc[page_num].get_text()) for page_num in range(start, end)]
+    finally:
+        # Close document to free PyMuPDF internal buffers
+        doc.close()
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from typing import Any, Optional
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from app.config.settings import settings
+
+
+_local_client: Optional[QdrantClient] = None
+_local_lock = threading.Lock()
+
+
+def is_local_mode() -> bool:
+    """QDRANT_URL=":memory:" or a QDRANT_PATH selects Qdrant's in-process local mode."""
+    return settings.QDRANT_URL == ":memory:" or bool(settings.QDRANT_PATH)
+
+
+def create_qdrant_client() -> QdrantClient:
+    """
+    Client for the configured Qdrant.
+
+    Local mode keeps its data inside the client (and locks its path), so every
+    manager in the process shares one local client.
+    """
+    global _local_client
+    if not is_local_mode():
+        return QdrantClient(api_key=settings.QDRANT_API_KEY, url=settings.QDRANT_URL)
+    with _local_lock:
+        if _local_client is None:
+            _local_client = (
+                QdrantClient(path=settings.QDRANT_PATH)
+                if settings.QDRANT_PATH
+                else QdrantClient(location=":memory:")
+            )
+        return _local_client
+
+
+class ThreadedAsyncQdrantClient:
+    """
+    AsyncQdrantClient stand-in that runs a sync client's calls on threads.
+
+    Used in local mode, where an AsyncQdrantClient would hold its own separate
+    data instead of seeing what the sync client ingested.
+    """
+
+    def __init__(self, client: QdrantClient) -> None:
+        self._client = client
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await asyncio.to_thread(attr, *args, **kwargs)
+
+        return call
+
+    async def close(self) -> None:
+        # The shared local client is closed with the process
+        pass
+
+
+def create_async_qdrant_client() -> AsyncQdrantClient | ThreadedAsyncQdrantClient:
+    if is_local_mode():
+        return ThreadedAsyncQdrantClient(create_qdrant_client())
+    return AsyncQdrantClient(api_key=settings.QDRANT_API_KEY, url=settings.QDRANT_URL)
@@ -1,83 +1,385 @@
-from typing import Any, Dict
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
 from langgraph.graph import START, END, StateGraph
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph.state import CompiledStateGraph
-from IPython.display import Image, display
+from app.config.settings import settings
 from app.models.rag_pipeline_state import RAGPipelineState
 from app.models.models import (
     RAGQueryRequest,
     RAGQueryResponse,
 )
+from app.services.async_vector_store_manager import AsyncVectorStoreManager
 from app.services.llm_manager import LLMManager
+from app.services.reranker import CrossEncoderReranker
+from app.services.semantic_cache import SemanticCache
+from app.services.telemetry import traced
 from app.services.vector_store_manager import VectorStoreManager
 
 
+ANSWER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a helpful assistant. 
+            Use the following pieces of context to answer the question at the end. 
+            If you don't know the answer, just say that you don't know, don't try to make up an answer.
+            {context}
+            """,
+        ),
+        ("user", "\nQuestion: {question}"),
+    ]
+)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+# Shortest shared text taken as chunk overlap rather than a coincidence
+MIN_OVERLAP_CHARS = 20
+
+
+def _merge_overlap(first: str, second: str) -> Optional[str]:
+    """first and second as one text, if second starts with the end of first."""
+    anchor = second[:MIN_OVERLAP_CHARS]
+    if len(anchor) < MIN_OVERLAP_CHARS:
+        return None
+    start = first.find(anchor)
+    while start != -1:
+        if second.startswith(first[start:]):
+            return first[:start] + second
+        start = first.find(anchor, start + 1)
+    return None
+
+
 class RAGPipeline:
     def __init__(
-        self, llm_manager: LLMManager, vector_store_manager: VectorStoreManager
+        self,
+        llm_manager: LLMManager,
+        vector_store_manager: VectorStoreManager,
+        async_vector_store_manager: Optional[AsyncVectorStoreManager] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        reranker: Optional[CrossEncoderReranker] = None,
+        top_k: int = 3,
+        rerank_candidates: int = 20,
     ) -> None:
         self.llm_manager = llm_manager
         self.vector_store_manager = vector_store_manager
+        self.async_vector_store_manager = async_vector_store_manager
+        self.semantic_cache = semantic_cache
+        self.reranker = reranker
+        self.top_k = top_k
+        # With a reranker, over-fetch candidates and keep the top_k it picks
+        self.fetch_k = max(rerank_candidates, top_k) if reranker else top_k
+        self.llm: Optional[BaseChatModel] = None
         self.compiled_graph: CompiledStateGraph = self._build_rag_graph()
 
+    def _retrieval_update(
+        self, retrieved_docs: List[Document], started: float
+    ) -> Dict[str, Any]:
+        key = "candidates" if self.reranker else "context"
+        return {
+            key: retrieved_docs,
+            "timings": {"retrieve_ms": _elapsed_ms(started)},
+        }
+
+    @traced("rag.retrieve_documents")
     def _retrieve_documents(self, state: RAGPipelineState) -> Dict[str, Any]:
+        started = time.perf_counter()
         retrieved_docs = self.vector_store_manager.query(
             collection_name=state["collection_name"],
             query=state["question"],
             selected_files=state["selected_files"],
+            k=self.fetch_k,
         )
-        return {"context": retrieved_docs}
+        return self._retrieval_update(retrieved_docs, started)
 
-    def _generate_answer(self, state: RAGPipelineState):
-        llm = self.llm_manager.get_model()
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """You are a helpful assistant. 
-                    Use the following pieces of context to answer the question at the end. 
-                    If you don't know the answer, just say that you don't know, don't try to make up an answer.
-                    {context}
-                    """,
-                ),
-                ("user", "\nQuestion: {question}"),
-            ]
+    @traced("rag.retrieve_documents")
+    async def _aretrieve_documents(self, state: RAGPipelineState) -> Dict[str, Any]:
+        if self.async_vector_store_manager is None:
+            return await asyncio.to_thread(self._retrieve_documents, state)
+        started = time.perf_counter()
+        retrieved_docs = await self.async_vector_store_manager.query(
+            collection_name=state["collection_name"],
+            query=state["question"],
+            selected_files=state["selected_files"],
+            k=self.fetch_k,
+        )
+        return self._retrieval_update(retrieved_docs, started)
+
+    @traced("rag.rerank_documents")
+    def _rerank_documents(self, state: RAGPipelineState) -> Dict[str, Any]:
+        context, timings = self.reranker.rerank(
+            state["question"], state["candidates"], self.top_k
         )
+        return {"context": context, "timings": timings}
 
+    @traced("rag.rerank_documents")
+    async def _arerank_documents(self, state: RAGPipelineState) -> Dict[str, Any]:
+        context, timings = await self.reranker.arerank(
+            state["question"], state["candidates"], self.top_k
+        )
+        return {"context": context, "timings": timings}
+
+    def _build_answer_prompt(self, state: RAGPipelineState) -> List[BaseMessage]:
         context_texts = [doc.page_content for doc in state["context"]]
         context_combined = "\n\n".join(context_texts)
 
-        chat_input = prompt.format_prompt(
+        return ANSWER_PROMPT.format_prompt(
             context=context_combined,
             question=state["question"],
         ).to_messages()
 
-        answer = llm.invoke(chat_input).content
-        return {"answer": answer}
+    @traced("rag.generate_answer")
+    def _generate_answer(self, state: RAGPipelineState):
+        started = time.perf_counter()
+        answer = self.llm.invoke(self._build_answer_prompt(state)).content
+        return {"answer": answer, "timings": {"generate_ms": _elapsed_ms(started)}}
+
+    @traced("rag.generate_answer")
+    async def _agenerate_answer(self, state: RAGPipelineState):
+        started = time.perf_counter()
+        answer = (await self.llm.ainvoke(self._build_answer_prompt(state))).content
+        return {"answer": answer, "timings": {"generate_ms": _elapsed_ms(started)}}
 
     def _build_rag_graph(self) -> CompiledStateGraph:
+        self.llm = self.llm_manager.get_model()
+
         graph = StateGraph(RAGPipelineState)
 
-        graph.add_node("retrieve_documents", self._retrieve_documents)
-        graph.add_node("generate_answer", self._generate_answer)
+        # Sync and async implementations so both invoke and ainvoke run natively
+        graph.add_node(
+            "retrieve_documents",
+            RunnableLambda(self._retrieve_documents, afunc=self._aretrieve_documents),
+        )
+        graph.add_node(
+            "generate_answer",
+            RunnableLambda(self._generate_answer, afunc=self._agenerate_answer),
+        )
 
         graph.add_edge(START, "retrieve_documents")
-        graph.add_edge("retrieve_documents", "generate_answer")
+        last_retrieval_node = "retrieve_documents"
+        if self.reranker is not None:
+            graph.add_node(
+                "rerank_documents",
+                RunnableLambda(self._rerank_documents, afunc=self._arerank_documents),
+            )
+            graph.add_edge("retrieve_documents", "rerank_documents")
+            last_retrieval_node = "rerank_documents"
+
+        graph.add_conditional_edges(
+            last_retrieval_node,
+            lambda state: "generate_answer" if state.get("generate", True) else END,
+            {"generate_answer": "generate_answer", END: END},
+        )
         graph.add_edge("generate_answer", END)
 
         compiled_graph = graph.compile()
         return compiled_graph
 
     def display_graph(self) -> None:
+        from IPython.display import Image, display
+
         display(Image(self.compiled_graph.get_graph().draw_mermaid_png()))
 
-    def run_pipeline(self, rag_query_request: RAGQueryRequest) -> RAGQueryResponse:
+    def format_context(
+        self, docs: List[Document], token_budget: Optional[int] = None
+    ) -> str:
+        """
+        Render retrieved chunks as compact, numbered passages with citations.
+
+        Duplicate chunks and chunks contained in another are dropped, and
+        neighbouring chunks of a file that share text (the chunker's overlap)
+        are merged into one passage, so no text takes up the budget twice.
+        Passages are added in rank order until the token budget, estimated at
+        ~4 characters per token, is used up.
+        """
+        budget_chars = (token_budget or settings.RAG_CONTEXT_TOKEN_BUDGET) * 4
+        passages: List[list] = []  # [source, label, text]
+
+        for doc in docs:
+            text = " ".join(doc.page_content.split())
+            if not text or any(text in kept for _, _, kept in passages):
+                continue
+
+            source = doc.metadata.get("filename") or doc.metadata.get("source")
+            page = doc.metadata.get("page")
+            label = f"{source}, page {page + 1}" if isinstance(page, int) else source
+            passage = [source, label, text]
+
+            # A longer chunk that contains an earlier one replaces it in place
+            contained = [p for p in passages if p[2] in text]
+            if contained:
+                contained[0][:] = passage
+                passages = [
+                    p for p in passages if p is contained[0] or p[2] not in text
+                ]
+                continue
+
+            # Merge with overlapping passages of the same file, keeping the
+            # rank of the best one and the label of the one that comes first
+            target = None
+            for other in [p for p in passages if p[0] == source]:
+                merged = _merge_overlap(other[2], passage[2])
+                first = other
+                if merged is None:
+                    merged = _merge_overlap(passage[2], other[2])
+                    first = passage
+                if merged is None:
+                    continue
+                if target is None:
+                    target = other
+                else:
+                    passages.remove(other)
+                target[1:] = [first[1], merged]
+                passage = target
+            if target is None:
+                passages.append(passage)
+
+        rendered: List[str] = []
+        used = 0
+        for i, (_, label, text) in enumerate(passages, start=1):
+            citation = f"[{i}] {label}"
+            remaining = budget_chars - used - len(citation) - 1
+            if remaining <= 0:
+                break
+            if len(text) > remaining:
+                text = text[:remaining].rsplit(" ", 1)[0] + " ..."
+            rendered.append(f"{citation}\n{text}")
+            used += len(citation) + len(text) + 2
+
+        if not rendered:
+            return "No relevant passages were found in the uploaded documents."
+        return "\n\n".join(rendered)
+
+    def _pipeline_input(
+        self, rag_query_request: RAGQueryRequest, generate: bool
+    ) -> Dict[str, Any]:
+        return {
+            "question": rag_query_request.user_query,
+            "collection_name": rag_query_request.collection_name,
+            "selected_files": rag_query_request.metadata.selected_files,
+            "generate": generate,
+            "timings": {},
+        }
+
+    def _data_version(self, rag_query_request: RAGQueryRequest) -> int:
+        # Read before retrieval: a write landing mid-pipeline leaves the result
+        # cached at the old version instead of passing it off as current
+        return self.vector_store_manager.registry.data_version(
+            rag_query_request.collection_name
+        )
+
+    def _cache_lookup(
+        self,
+        rag_query_request: RAGQueryRequest,
+        query_vector: List[float],
+        generate: bool,
+        version: int,
+    ) -> Optional[RAGQueryResponse]:
+        entry = self.semantic_cache.lookup(
+            collection_name=rag_query_request.collection_name,
+            selected_files=rag_query_request.metadata.selected_files,
+            query_vector=query_vector,
+            require_answer=generate,
+            version=version,
+        )
+        if entry is None:
+            return None
+        print(f"Semantic cache hit - '{entry.question}'")
+        return RAGQueryResponse(
+            answer=entry.answer if generate else "", context=entry.context
+        )
+
+    def _cache_store(
+        self,
+        rag_query_request: RAGQueryRequest,
+        query_vector: List[float],
+        result: Dict[str, Any],
+        generate: bool,
+        version: int,
+    ) -> None:
+        self.semantic_cache.store(
+            collection_name=rag_query_request.collection_name,
+            selected_files=rag_query_request.metadata.selected_files,
+            question=rag_query_request.user_query,
+            query_vector=query_vector,
+            context=result.get("context") or [],
+            answer=result.get("answer") if generate else None,
+            version=version,
+        )
+
+    @traced("rag.pipeline")
+    def run_pipeline(
+        self, rag_query_request: RAGQueryRequest, generate: bool = True
+    ) -> RAGQueryResponse:
+        """Retrieve context and, unless generate is False, answer with the LLM."""
+        if self.semantic_cache is not None:
+            query_vector = self.vector_store_manager.embeddings.embed_query(
+                rag_query_request.user_query
+            )
+            version = self._data_version(rag_query_request)
+            cached = self._cache_lookup(
+                rag_query_request, query_vector, generate, version
+            )
+            if cached is not None:
+                return cached
+
         result = self.compiled_graph.invoke(
-            {
-                "question": rag_query_request.user_query,
-                "collection_name": rag_query_request.collection_name,
-                "selected_files": rag_query_request.metadata.selected_files,
-            }
+            self._pipeline_input(rag_query_request, generate)
+        )
+        if generate:
+            print(f"Rag Bot answer - {result['answer']}")
+        print(f"RAG pipeline timings - {result.get('timings')}")
+        if self.semantic_cache is not None:
+            self._cache_store(
+                rag_query_request, query_vector, result, generate, version
+            )
+        return RAGQueryResponse(
+            answer=result.get("answer", ""),
+            context=result.get("context"),
+            timings=result.get("timings"),
+        )
+
+    @traced("rag.pipeline")
+    async def arun_pipeline(
+        self, rag_query_request: RAGQueryRequest, generate: bool = True
+    ) -> RAGQueryResponse:
+        if self.semantic_cache is not None:
+            if self.async_vector_store_manager is not None:
+                query_vector = await self.async_vector_store_manager.embed_query(
+                    rag_query_request.user_query
+                )
+            else:
+                query_vector = await asyncio.to_thread(
+                    self.vector_store_manager.embeddings.embed_query,
+                    rag_query_request.user_query,
+                )
+            version = self._data_version(rag_query_request)
+            cached = self._cache_lookup(
+                rag_query_request, query_vector, generate, version
+            )
+            if cached is not None:
+                return cached
+
+        result = await self.compiled_graph.ainvoke(
+            self._pipeline_input(rag_query_request, generate)
+        )
+        if generate:
+            print(f"Rag Bot answer - {result['answer']}")
+        print(f"RAG pipeline timings - {result.get('timings')}")
+        if self.semantic_cache is not None:
+            self._cache_store(
+                rag_query_request, query_vector, result, generate, version
+            )
+        return RAGQueryResponse(
+            answer=result.get("answer", ""),
+            context=result.get("context"),
+            timings=result.get("timings"),
         )
-        print(f"Rag Bot answer - {result["answer"]}")
-        return RAGQueryResponse(answer=result["answer"], context=result.get("context"))
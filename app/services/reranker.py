@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Tuple
+from langchain_core.documents import Document
+
+
+class CrossEncoderReranker:
+    """
+    CPU cross-encoder that rescores vector search candidates.
+
+    Candidates are scored in batches on a single dedicated thread. Each request
+    gets a hard latency budget: if not every candidate is scored in time the
+    original vector order is kept, and the abandoned job stops: a job that has
+    not started is cancelled, and a running one finishes only its current batch
+    (which still fills the score cache), so later requests never queue behind
+    work nobody waits for. Scores are cached per (query hash, chunk id), so a
+    repeated query over the same chunks skips the model.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        backend: str = "torch",
+        batch_size: int = 16,
+        budget_ms: float = 150,
+        cache_items: int = 50_000,
+    ) -> None:
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_items = cache_items
+        self._model = None  # lazy initialization
+        self._model_lock = threading.Lock()
+        self._scores: OrderedDict[Tuple[str, str], float] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # One scoring thread: the model uses all cores per batch already
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+    @property
+    def model(self) -> Any:
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                print(f"Loading reranker model ({self.backend})...")
+                self._model = CrossEncoder(
+                    self.model_name, device="cpu", backend=self.backend
+                )
+        return self._model
+
+    @staticmethod
+    def _query_key(query: str) -> str:
+        return hashlib.sha1(query.encode()).hexdigest()
+
+    @staticmethod
+    def _chunk_id(doc: Document) -> str:
+        chunk_id = doc.metadata.get("_id")
+        if chunk_id is None:
+            return hashlib.sha1(doc.page_content.encode()).hexdigest()
+        return str(chunk_id)
+
+    def _cached(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        with self._cache_lock:
+            found = {}
+            for key in keys:
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    found[key] = self._scores[key]
+            return found
+
+    def _store(self, scores: Dict[Tuple[str, str], float]) -> None:
+        with self._cache_lock:
+            self._scores.update(scores)
+            while len(self._scores) > self.cache_items:
+                self._scores.popitem(last=False)
+
+    def _score(
+        self,
+        query: str,
+        pending: List[Tuple[Tuple[str, str], str]],
+        abandoned: threading.Event,
+    ) -> None:
+        """Score (key, text) pairs batch by batch, caching each batch as it lands."""
+        for start in range(0, len(pending), self.batch_size):
+            if abandoned.is_set():
+                return
+            batch = pending[start : start + self.batch_size]
+            scores = self.model.predict(
+                [(query, text) for _, text in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            self._store({key: float(score) for (key, _), score in zip(batch, scores)})
+
+    def _prepare(
+        self, query: str, docs: List[Document]
+    ) -> Tuple[List[Tuple[str, str]], List[Tuple[Tuple[str, str], str]], int]:
+        query_key = self._query_key(query)
+        keys = [(query_key, self._chunk_id(doc)) for doc in docs]
+        cached = self._cached(keys)
+        pending = [
+            (key, doc.page_content) for key, doc in zip(keys, docs) if key not in cached
+        ]
+        return keys, pending, len(cached)
+
+    def _submit(
+        self, query: str, pending: List[Tuple[Tuple[str, str], str]]
+    ) -> Tuple[Future, threading.Event]:
+        abandoned = threading.Event()
+        return self._executor.submit(self._score, query, pending, abandoned), abandoned
+
+    @staticmethod
+    def _abandon(future: Future, abandoned: threading.Event) -> None:
+        """Drop a job that ran out of budget: unstarted jobs never run."""
+        abandoned.set()
+        future.cancel()
+
+    def _finish(
+        self,
+        docs: List[Document],
+        keys: List[Tuple[str, str]],
+        k: int,
+        cached: int,
+        started: float,
+    ) -> Tuple[List[Document], Dict[str, Any]]:
+        scores = self._cached(keys)
+        fallback = len(scores) < len(keys)
+        if fallback:
+            ranked = docs[:k]
+        else:
+            order = sorted(
+                range(len(docs)), key=lambda i: scores[keys[i]], reverse=True
+            )
+            ranked = []
+            for i in order[:k]:
+                doc = docs[i]
+                doc.metadata["rerank_score"] = scores[keys[i]]
+                ranked.append(doc)
+        timings = {
+            "rerank_ms": round((time.perf_counter() - started) * 1000, 2),
+            "rerank_candidates": len(docs),
+            "rerank_cached": cached,
+            "rerank_fallback": fallback,
+        }
+        return ranked, timings
+
+    def rerank(
+        self, query: str, docs: List[Document], k: int
+    ) -> Tuple[List[Document], Dict[str, Any]]:
+        """Return the top k documents and rerank timings for this request."""
+        started = time.perf_counter()
+        keys, pending, cached = self._prepare(query, docs)
+        if pending:
+            future, abandoned = self._submit(query, pending)
+            try:
+                future.result(timeout=self.budget_ms / 1000)
+            except FutureTimeoutError:
+                self._abandon(future, abandoned)
+            except Exception as e:
+                print(f"Reranking failed, keeping vector order - {e}")
+        return self._finish(docs, keys, k, cached, started)
+
+    async def arerank(
+        self, query: str, docs: List[Document], k: int
+    ) -> Tuple[List[Document], Dict[str, Any]]:
+        started = time.perf_counter()
+        keys, pending, cached = self._prepare(query, docs)
+        if pending:
+            future, abandoned = self._submit(query, pending)
+            try:
+                # shield: the job is stopped through _abandon, between batches
+                await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(future)),
+                    timeout=self.budget_ms / 1000,
+                )
+            except asyncio.TimeoutError:
+                self._abandon(future, abandoned)
+            except Exception as e:
+                print(f"Reranking failed, keeping vector order - {e}")
+        return self._finish(docs, keys, k, cached, started)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
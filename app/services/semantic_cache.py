@@ -0,0 +1,138 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from langchain_core.documents import Document
+
+
+@dataclass
+class SemanticCacheEntry:
+    question: str
+    vector: np.ndarray
+    context: List[Document]
+    answer: Optional[str] = None
+    version: int = 0  # data version of the collection the context came from
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticCache:
+    """
+    Answer cache that matches new questions to past ones by embedding similarity.
+
+    Entries are scoped by collection and selected files, expire after a TTL and
+    are evicted least-recently-used once max_entries is reached. Each entry
+    records the collection's data version (see CollectionVersions) it was
+    answered at, and only matches lookups at that version, so a write to the
+    collection from any server process retires it.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 2000,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._scopes: Dict[tuple, Dict[str, SemanticCacheEntry]] = {}
+        self._lru: OrderedDict[str, tuple] = OrderedDict()  # entry id → scope
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _scope(collection_name: str, selected_files: Optional[Sequence[str]]) -> tuple:
+        return (collection_name, tuple(sorted(selected_files or ())))
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _remove(self, entry_id: str) -> None:
+        scope = self._lru.pop(entry_id, None)
+        entries = self._scopes.get(scope)
+        if entries is not None:
+            entries.pop(entry_id, None)
+            if not entries:
+                del self._scopes[scope]
+
+    def lookup(
+        self,
+        collection_name: str,
+        selected_files: Optional[Sequence[str]],
+        query_vector: Sequence[float],
+        require_answer: bool = False,
+        version: int = 0,
+    ) -> Optional[SemanticCacheEntry]:
+        """Return the most similar live entry above the threshold, if any."""
+        vector = self._normalize(query_vector)
+        now = time.time()
+
+        with self._lock:
+            entries = self._scopes.get(self._scope(collection_name, selected_files), {})
+            expired = [
+                entry_id
+                for entry_id, entry in entries.items()
+                if now - entry.created_at > self.ttl_seconds or entry.version != version
+            ]
+            for entry_id in expired:
+                self._remove(entry_id)
+
+            candidates = [
+                (entry_id, entry)
+                for entry_id, entry in entries.items()
+                if not require_answer or entry.answer is not None
+            ]
+            if candidates:
+                scores = np.stack([entry.vector for _, entry in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._lru.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        collection_name: str,
+        selected_files: Optional[Sequence[str]],
+        question: str,
+        query_vector: Sequence[float],
+        context: List[Document],
+        answer: Optional[str] = None,
+        version: int = 0,
+    ) -> None:
+        scope = self._scope(collection_name, selected_files)
+        entry_id = uuid.uuid4().hex
+        entry = SemanticCacheEntry(
+            question=question,
+            vector=self._normalize(query_vector),
+            context=context,
+            answer=answer,
+            version=version,
+        )
+        with self._lock:
+            self._scopes.setdefault(scope, {})[entry_id] = entry
+            self._lru[entry_id] = scope
+            while len(self._lru) > self.max_entries:
+                self._remove(next(iter(self._lru)))
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._lru),
+        }
@@ -1,18 +1,222 @@
+import functools
+import gc
+import threading
+from typing import Any, Callable, Dict, TypeVar
+from app.config.settings import settings
+from app.services.async_vector_store_manager import AsyncVectorStoreManager
+from app.services.checkpointer import create_checkpointer
+from app.services.collection_registry import CollectionRegistry
+from app.services.collection_versions import CollectionVersions
+from app.services.conversation_context import ConversationContextManager
 from app.services.embeddings_manager import EmbeddingsManager
 from app.services.file_processor import FileProcessor
+from app.services.ingestion_jobs import IngestionJobQueue, IngestionJobStore
+from app.services.ingestion_pipeline import IngestionPipeline
 from app.services.knowledge_bot_app import KnowledgeBotApp
 from app.services.llm_manager import LLMManager
 from app.services.rag_pipeline import RAGPipeline
+from app.services.reranker import CrossEncoderReranker
+from app.services.semantic_cache import SemanticCache
+from app.services.sparse_encoder import BM25SparseEncoder
 from app.services.knowledge_bot_tools import KnowledgeTools
 from app.services.vector_store_manager import VectorStoreManager
 
+T = TypeVar("T")
 
-file_processor = FileProcessor()
-embeddings_manager = EmbeddingsManager()
-vector_store_manager = VectorStoreManager(embeddings=embeddings_manager.embeddings)
-llm_manager = LLMManager()
-rag_pipeline = RAGPipeline(
-    llm_manager=llm_manager, vector_store_manager=vector_store_manager
-)
-KnowledgeTools.set_rag_pipeline(rag_pipeline)
-knowledge_bot_app = KnowledgeBotApp(llm_manager=llm_manager)
+
+def service(factory: Callable[["ServiceContainer"], T]) -> T:
+    """Container property that builds its service once, on first access."""
+    name = factory.__name__
+
+    @functools.wraps(factory)
+    def get(self: "ServiceContainer") -> T:
+        if name not in self._instances:
+            # Re-entrant: a factory pulls in the services it depends on
+            with self._lock:
+                if name not in self._instances:
+                    self._instances[name] = factory(self)
+        return self._instances[name]
+
+    return property(get)
+
+
+class ServiceContainer:
+    """
+    Lazily built application services, wired together on first use.
+
+    Importing the app constructs nothing: the embedding model, Qdrant clients,
+    checkpointer and LangGraph graphs are created when a request first needs
+    them. override() swaps in instances (e.g. a fake LLMManager) before use.
+    """
+
+    def __init__(self) -> None:
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def override(self, **instances: Any) -> None:
+        for name, instance in instances.items():
+            if not isinstance(getattr(type(self), name, None), property):
+                raise AttributeError(f"Unknown service '{name}'")
+            self._instances[name] = instance
+
+    def built(self, name: str) -> bool:
+        return name in self._instances
+
+    @service
+    def file_processor(self) -> FileProcessor:
+        if settings.CHUNK_UNIT == "chars":
+            return FileProcessor(
+                chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP
+            )
+        return FileProcessor(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            tokenizer=self.embeddings_manager.tokenizer,
+        )
+
+    @service
+    def embeddings_manager(self) -> EmbeddingsManager:
+        return EmbeddingsManager()
+
+    @service
+    def sparse_encoder(self) -> BM25SparseEncoder | None:
+        if settings.RETRIEVAL_MODE != "hybrid":
+            return None
+        return BM25SparseEncoder(avg_doc_length=settings.BM25_AVG_DOC_LENGTH)
+
+    @service
+    def collection_registry(self) -> CollectionRegistry:
+        return CollectionRegistry(
+            versions=CollectionVersions(settings.COLLECTION_VERSIONS_DB_PATH)
+        )
+
+    @service
+    def vector_store_manager(self) -> VectorStoreManager:
+        return VectorStoreManager(
+            embeddings=self.embeddings_manager.embeddings,
+            embedding_engine=self.embeddings_manager.engine,
+            sparse_encoder=self.sparse_encoder,
+            # Read from the model config when the first collection is created
+            vector_size=lambda: self.embeddings_manager.dimension,
+            registry=self.collection_registry,
+        )
+
+    @service
+    def async_vector_store_manager(self) -> AsyncVectorStoreManager:
+        return AsyncVectorStoreManager(
+            embeddings=self.embeddings_manager.embeddings,
+            sparse_encoder=self.sparse_encoder,
+            vector_size=lambda: self.embeddings_manager.dimension,
+            registry=self.collection_registry,
+        )
+
+    @service
+    def ingestion_pipeline(self) -> IngestionPipeline:
+        return IngestionPipeline(
+            file_processor=self.file_processor,
+            vector_store_manager=self.vector_store_manager,
+        )
+
+    @service
+    def ingestion_jobs(self) -> IngestionJobQueue:
+        return IngestionJobQueue(
+            ingestion_pipeline=self.ingestion_pipeline,
+            vector_store_manager=self.vector_store_manager,
+            store=IngestionJobStore(settings.INGEST_JOBS_DB_PATH),
+            spool_dir=settings.INGEST_SPOOL_DIR,
+            workers=settings.INGEST_JOB_WORKERS,
+            max_jobs_per_collection=settings.INGEST_MAX_JOBS_PER_COLLECTION,
+            wait_timeout=settings.INGEST_WAIT_TIMEOUT_SECONDS,
+        )
+
+    @service
+    def llm_manager(self) -> LLMManager:
+        return LLMManager()
+
+    @service
+    def reranker(self) -> CrossEncoderReranker | None:
+        if not settings.RERANK_ENABLED:
+            return None
+        return CrossEncoderReranker(
+            model_name=settings.RERANK_MODEL,
+            backend=settings.RERANK_BACKEND,
+            batch_size=settings.RERANK_BATCH_SIZE,
+            budget_ms=settings.RERANK_BUDGET_MS,
+            cache_items=settings.RERANK_CACHE_ITEMS,
+        )
+
+    @service
+    def rag_pipeline(self) -> RAGPipeline:
+        rag_pipeline = RAGPipeline(
+            llm_manager=self.llm_manager,
+            vector_store_manager=self.vector_store_manager,
+            async_vector_store_manager=self.async_vector_store_manager,
+            semantic_cache=(
+                SemanticCache(
+                    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+                    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                )
+                if settings.SEMANTIC_CACHE_ENABLED
+                else None
+            ),
+            reranker=self.reranker,
+            top_k=settings.RAG_TOP_K,
+            rerank_candidates=settings.RERANK_CANDIDATES,
+        )
+        KnowledgeTools.set_rag_pipeline(rag_pipeline)
+        return rag_pipeline
+
+    @service
+    def context_manager(self) -> ConversationContextManager | None:
+        if not settings.CONTEXT_MANAGEMENT_ENABLED:
+            return None
+        return ConversationContextManager(
+            llm_manager=self.llm_manager,
+            token_budget=settings.CONTEXT_TOKEN_BUDGET,
+            keep_recent_turns=settings.CONTEXT_KEEP_RECENT_TURNS,
+            tool_output_tokens=settings.CONTEXT_TOOL_OUTPUT_TOKENS,
+            summary_max_words=settings.CONTEXT_SUMMARY_MAX_WORDS,
+            # Reuses the local embedding model's tokenizer, loaded with the model
+            tokenizer=self.embeddings_manager.tokenizer,
+        )
+
+    @service
+    def knowledge_bot_app(self) -> KnowledgeBotApp:
+        # The agent's rag_retrival tool calls the pipeline through KnowledgeTools
+        self.rag_pipeline
+        return KnowledgeBotApp(
+            llm_manager=self.llm_manager,
+            checkpointer=create_checkpointer(),
+            context_manager=self.context_manager,
+        )
+
+    def preload(self) -> None:
+        """
+        Load model weights before worker processes are forked from this one.
+
+        Only the model weights are loaded, without a forward pass so torch
+        starts no thread pools. Anything holding sockets, threads or file
+        handles (Qdrant and LLM clients, SQLite, process pools) is left for
+        each worker to create after the fork. That includes ONNX models: an
+        onnxruntime session starts its thread pools as it is created, so models
+        on an onnx backend are left for each worker to load.
+        """
+        if self.embeddings_manager.backend == "torch":
+            self.embeddings_manager.load()
+        if self.reranker is not None and self.reranker.backend == "torch":
+            self.reranker.model
+        # Move what exists so far out of the GC's reach, so collections in the
+        # workers don't write to (and un-share) the inherited pages
+        gc.collect()
+        gc.freeze()
+
+
+services = ServiceContainer()
+
+
+def __getattr__(name: str) -> Any:
+    # Back-compat for `services_registry.<service>`; builds it on first access
+    if isinstance(getattr(ServiceContainer, name, None), property):
+        return getattr(services, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
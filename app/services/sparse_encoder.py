@@ -0,0 +1,63 @@
+import re
+import zlib
+from collections import Counter
+from typing import List
+from qdrant_client import models
+
+
+# Keeps identifiers such as "XJ-220", "v2.1" or "ISO_9001" as single terms
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    """a an and are as at be but by for from has have he her his if in into is it
+    its of on or she so than that the their them then there these they this to
+    was we were what when where which who will with you your""".split()
+)
+
+
+class BM25SparseEncoder:
+    """
+    BM25 term weights as Qdrant sparse vectors.
+
+    Documents carry the BM25 term-frequency component; the IDF component is
+    applied by Qdrant at query time (Modifier.IDF on the sparse vector config),
+    so weights stay valid as the collection grows. Terms are hashed to indices,
+    which needs no shared vocabulary between workers.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_doc_length: int = 150):
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = avg_doc_length
+
+    def tokenize(self, text: str) -> List[str]:
+        tokens = []
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            if token in STOPWORDS:
+                continue
+            tokens.append(token)
+            # Also index the parts of compound terms, so "XJ-220" matches "XJ 220"
+            if any(sep in token for sep in "-_./"):
+                tokens.extend(re.split(r"[-_./]", token))
+        return tokens
+
+    @staticmethod
+    def _index(token: str) -> int:
+        return zlib.crc32(token.encode())
+
+    def encode_document(self, text: str) -> models.SparseVector:
+        tokens = self.tokenize(text)
+        length_norm = 1 - self.b + self.b * len(tokens) / self.avg_doc_length
+        weights: dict[int, float] = {}
+        for token, tf in Counter(tokens).items():
+            index = self._index(token)
+            weight = tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+            weights[index] = weights.get(index, 0.0) + weight
+        return models.SparseVector(indices=list(weights), values=list(weights.values()))
+
+    def encode_documents(self, texts: List[str]) -> List[models.SparseVector]:
+        return [self.encode_document(text) for text in texts]
+
+    def encode_query(self, text: str) -> models.SparseVector:
+        indices = sorted({self._index(token) for token in self.tokenize(text)})
+        return models.SparseVector(indices=indices, values=[1.0] * len(indices))
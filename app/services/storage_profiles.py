@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Literal, Optional
+from qdrant_client import models
+from app.config.settings import settings
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """How a collection's vectors are stored and indexed, chosen at creation."""
+
+    quantization: Optional[Literal["int8", "binary"]] = None
+    # Keep quantized vectors in RAM while the originals may live on disk
+    quantized_always_ram: bool = True
+    on_disk_vectors: bool = False
+    on_disk_payload: bool = False
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+
+    def quantization_config(self) -> Optional[models.QuantizationConfig]:
+        if self.quantization == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=self.quantized_always_ram,
+                )
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(
+                    always_ram=self.quantized_always_ram
+                )
+            )
+        return None
+
+    def hnsw_config(self) -> Optional[models.HnswConfigDiff]:
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def collection_kwargs(self) -> Dict[str, Any]:
+        """create_collection arguments besides the vectors config."""
+        kwargs: Dict[str, Any] = {"on_disk_payload": self.on_disk_payload}
+        if self.quantization_config() is not None:
+            kwargs["quantization_config"] = self.quantization_config()
+        if self.hnsw_config() is not None:
+            kwargs["hnsw_config"] = self.hnsw_config()
+        return kwargs
+
+
+STORAGE_PROFILES: Dict[str, StorageProfile] = {
+    # float32 vectors and HNSW graph in memory: Qdrant's defaults
+    "default": StorageProfile(),
+    # ~4x smaller in RAM, originals on disk for rescoring
+    "int8": StorageProfile(quantization="int8", on_disk_vectors=True),
+    # ~32x smaller in RAM; suits 384+ dimension models, needs oversampling
+    "binary": StorageProfile(quantization="binary", on_disk_vectors=True),
+    # Everything on disk, served from the page cache
+    "on_disk": StorageProfile(on_disk_vectors=True, on_disk_payload=True),
+    # Large tenants: int8 in RAM, originals and payloads on disk, denser graph
+    "large": StorageProfile(
+        quantization="int8",
+        on_disk_vectors=True,
+        on_disk_payload=True,
+        hnsw_m=32,
+        hnsw_ef_construct=200,
+    ),
+}
+
+
+def get_storage_profile(name: Optional[str] = None) -> StorageProfile:
+    name = name or settings.DEFAULT_STORAGE_PROFILE
+    if name not in STORAGE_PROFILES:
+        raise ValueError(
+            f"Unknown storage profile '{name}', "
+            f"expected one of {', '.join(STORAGE_PROFILES)}"
+        )
+    return STORAGE_PROFILES[name]
+
+
+def search_params(
+    hnsw_ef: Optional[int] = None, oversampling: Optional[float] = None
+) -> Optional[models.SearchParams]:
+    """
+    Per-request search knobs, defaulting to the configured ones.
+
+    Quantization parameters only apply to quantized collections: candidates are
+    fetched with the quantized vectors, oversampled, then rescored with the
+    original vectors.
+    """
+    hnsw_ef = hnsw_ef or settings.QUERY_HNSW_EF
+    oversampling = oversampling or settings.QUERY_OVERSAMPLING
+    if hnsw_ef is None and oversampling is None:
+        return None
+    return models.SearchParams(
+        hnsw_ef=hnsw_ef,
+        quantization=models.QuantizationSearchParams(
+            rescore=True, oversampling=oversampling
+        ),
+    )
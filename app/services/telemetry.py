@@ -0,0 +1,458 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from app.config.settings import settings
+
+
+# Seconds; spans from sub-millisecond cache hits up to slow LLM turns
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# How often a shared registry writes its snapshot for the other workers
+SHARE_INTERVAL_SECONDS = 1.0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(v))}"' for name, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> List[list]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def render(self, others: Iterable[List[list]] = ()) -> List[str]:
+        """Render this process's values summed with other processes' snapshots."""
+        values: Dict[Tuple[str, ...], float] = {}
+        for series in [self.snapshot(), *others]:
+            for key, value in series:
+                values[tuple(key)] = values.get(tuple(key), 0) + value
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def snapshot(self) -> List[list]:
+        with self._lock:
+            return [
+                [list(key), list(counts), total[0]]
+                for key, (counts, total) in self._series.items()
+            ]
+
+    def render(self, others: Iterable[List[list]] = ()) -> List[str]:
+        """Render this process's series summed with other processes' snapshots."""
+        series: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+        for snapshot in [self.snapshot(), *others]:
+            for key, counts, total in snapshot:
+                merged, merged_total = series.get(
+                    tuple(key), ([0] * (len(self.buckets) + 1), 0.0)
+                )
+                merged = [a + b for a, b in zip(merged, counts)]
+                series[tuple(key)] = (merged, merged_total + total)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.label_names, key, le=le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsStore:
+    """
+    Latest metric snapshot of every worker process, in SQLite.
+
+    Rows of exited workers are kept, so counters summed over all rows never go
+    backwards when a worker is restarted; clear() starts a fresh server run.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS metric_snapshots (
+                    pid INTEGER PRIMARY KEY,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+    def save(self, pid: int, snapshot: Dict[str, List[list]]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metric_snapshots (pid, data) VALUES (?, ?)",
+                (pid, json.dumps(snapshot)),
+            )
+            self._conn.commit()
+
+    def others(self, pid: int) -> List[Dict[str, List[list]]]:
+        """Snapshots of every process except pid."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM metric_snapshots WHERE pid != ?", (pid,)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM metric_snapshots")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics, rendered in the Prometheus text exposition format.
+
+    A single process serves its own values. Under several worker processes
+    each one share()s the registry: it writes its snapshot to a MetricsStore
+    every SHARE_INTERVAL_SECONDS, and render() sums the other workers'
+    snapshots into its own, so a scrape answered by any worker covers them all.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: List[Counter | Histogram] = []
+        self._store: Optional[MetricsStore] = None
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, help, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, List[list]]:
+        return {m.name: m.snapshot() for m in self._metrics}
+
+    def share(self, store: MetricsStore) -> None:
+        """Publish this process's metrics to store and include the others' in render()."""
+        self._store = store
+
+        def publish() -> None:
+            while True:
+                time.sleep(SHARE_INTERVAL_SECONDS)
+                self.flush()
+
+        threading.Thread(target=publish, name="metrics-share", daemon=True).start()
+
+    def flush(self) -> None:
+        if self._store is not None:
+            self._store.save(os.getpid(), self.snapshot())
+
+    def render(self) -> str:
+        others = self._store.others(os.getpid()) if self._store is not None else []
+        lines = [
+            line
+            for m in self._metrics
+            for line in m.render([other.get(m.name, []) for other in others])
+        ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "rag_http_request_duration_seconds",
+    "HTTP request latency by route and status.",
+    ("method", "route", "status"),
+)
+STAGE_SECONDS = metrics.histogram(
+    "rag_stage_duration_seconds",
+    "Latency of pipeline stages: graph nodes, embedding, Qdrant, PDF parsing, LLM.",
+    ("stage",),
+)
+LLM_TOKENS = metrics.counter(
+    "rag_llm_tokens_total",
+    "LLM tokens by model and direction (input or output).",
+    ("model", "direction"),
+)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    started: float
+
+
+_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "trace_id", default=None
+)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(trace_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Run the block under one trace id, e.g. an HTTP request or ingestion job.
+
+    contextvars are copied into asyncio tasks, to_thread calls and LangGraph
+    nodes, so spans opened anywhere below (agent, tool, RAG pipeline) share it.
+    """
+    trace_id = trace_id or new_trace_id()
+    token = _trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _trace_id.reset(token)
+
+
+def _log_span(
+    span: Span, seconds: float, error: Optional[BaseException], attributes: dict
+) -> None:
+    if not settings.TELEMETRY_LOG_SPANS:
+        return
+    record = {
+        "span": span.name,
+        "trace_id": span.trace_id,
+        "span_id": span.span_id,
+        "parent_id": span.parent_id,
+        "duration_ms": round(seconds * 1000, 2),
+        **attributes,
+    }
+    if error is not None:
+        record["error"] = type(error).__name__
+    print(json.dumps(record, default=str))
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time a stage into rag_stage_duration_seconds{stage=name}.
+
+    Spans nest through the current context; attributes only go to the span
+    log (TELEMETRY_LOG_SPANS), never into metric labels.
+    """
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        trace_id=current_trace_id() or (parent.trace_id if parent else "-"),
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        started=time.perf_counter(),
+    )
+    token = _current_span.set(current)
+    error: Optional[BaseException] = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        seconds = time.perf_counter() - current.started
+        STAGE_SECONDS.observe(seconds, stage=name)
+        _log_span(current, seconds, error, attributes)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator running a sync or async function inside span(name)."""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """
+    Times every chat model call and counts its tokens.
+
+    Attached to each model LLMManager creates, so agent, summarizer and RAG
+    answer calls are all counted whether or not the caller passes callbacks.
+    """
+
+    run_inline = True  # no executor hop in async runs; keeps the trace context
+
+    def __init__(self) -> None:
+        self._runs: Dict[UUID, Tuple[float, str, Optional[str], Optional[Span]]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        model = (metadata or {}).get("ls_model_name") or settings.LLM_MODEL
+        with self._lock:
+            self._runs[run_id] = (
+                time.perf_counter(),
+                model,
+                current_trace_id(),
+                _current_span.get(),
+            )
+
+    def _finish(
+        self, run_id: UUID, error: Optional[BaseException] = None
+    ) -> Optional[str]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        started, model, trace_id, parent = run
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage="llm")
+        _log_span(
+            Span(
+                name="llm",
+                trace_id=trace_id or (parent.trace_id if parent else "-"),
+                span_id=uuid.uuid4().hex[:16],
+                parent_id=parent.span_id if parent else None,
+                started=started,
+            ),
+            seconds,
+            error,
+            {"model": model},
+        )
+        return model
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        model = self._finish(run_id)
+        if model is None:
+            return
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+        if usage is None:
+            # Providers that only report usage in llm_output (e.g. older OpenAI)
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            usage = {
+                "input_tokens": token_usage.get("prompt_tokens", 0),
+                "output_tokens": token_usage.get("completion_tokens", 0),
+            }
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), model=model, direction="input")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), model=model, direction="output")
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._finish(run_id, error)
+
+
+token_usage_callback = TokenUsageCallback()
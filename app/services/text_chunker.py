@@ -0,0 +1,231 @@
+"""
+Page-aware chunking of a file's extracted text in a single pass.
+
+Pages are appended to one running text (joined by a blank line), so chunks
+may run across page boundaries, and cut points are chosen by bisecting over
+offsets instead of re-splitting and re-merging pieces. Chunks are compact
+records of offsets; they only become LangChain Documents in to_document().
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator, List, Optional
+from langchain_core.documents import Document
+
+PAGE_SEPARATOR = "\n\n"
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_END = frozenset(".!?")
+
+
+class Chunk:
+    """A span of a file's text, with the pages it starts and ends on."""
+
+    __slots__ = ("text", "start", "end", "page", "end_page", "start_index")
+
+    def __init__(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        page: int,
+        end_page: int,
+        start_index: int,
+    ) -> None:
+        self.text = text
+        self.start = start  # offsets into the file's joined text
+        self.end = end
+        self.page = page
+        self.end_page = end_page
+        self.start_index = start_index  # offset within the start page
+
+    def __repr__(self) -> str:
+        return (
+            f"Chunk(pages={self.page}-{self.end_page}, "
+            f"start={self.start}, end={self.end})"
+        )
+
+    def to_document(self, source: str, filename: str) -> Document:
+        return Document(
+            page_content=self.text,
+            metadata={
+                "source": source,
+                "page": self.page,
+                "end_page": self.end_page,
+                "filename": filename,
+                "start_index": self.start_index,
+            },
+        )
+
+
+def _break_strength(text: str, match: re.Match) -> int:
+    """How good a cut point a run of whitespace is: paragraph > line > sentence > word."""
+    gap = match.group()
+    newlines = gap.count("\n")
+    if newlines > 1:
+        return 3
+    if newlines:
+        return 2
+    if match.start() and text[match.start() - 1] in _SENTENCE_END:
+        return 1
+    return 0
+
+
+class PageChunker:
+    """
+    Splits one file's pages into chunks of at most chunk_size units.
+
+    Units are characters, or tokens of the given tokenizer, which needs a
+    token_starts(text) method (see LazyTokenizer). Sizing by the embedding
+    model's own tokens keeps every chunk within its sequence limit instead
+    of silently truncating the tail of long chunks.
+
+    Feed pages in order with feed() and call finish() after the last page;
+    each returns the chunks that became complete. Only the text from the
+    current chunk onwards is kept.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        tokenizer: Optional[Any] = None,
+    ) -> None:
+        if chunk_overlap >= chunk_size:
+            raise ValueError(
+                f"chunk_overlap ({chunk_overlap}) must be smaller than "
+                f"chunk_size ({chunk_size})"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.tokenizer = tokenizer
+        self._text = ""
+        self._base = 0  # file offset of self._text[0]
+        self._start = 0  # file offset where the next chunk starts
+        self._page_starts: List[int] = []  # file offsets, parallel to _pages
+        self._pages: List[int] = []
+        self._token_starts: List[int] = []  # file offsets, tokens mode only
+
+    def _end(self) -> int:
+        return self._base + len(self._text)
+
+    def feed(self, page: int, text: str) -> List[Chunk]:
+        if self._text:
+            self._text += PAGE_SEPARATOR
+        offset = self._end()
+        self._page_starts.append(offset)
+        self._pages.append(page)
+        self._text += text
+        if self.tokenizer is not None:
+            self._token_starts.extend(
+                offset + start for start in self.tokenizer.token_starts(text)
+            )
+        return list(self._drain(final=False))
+
+    def finish(self) -> List[Chunk]:
+        return list(self._drain(final=True))
+
+    def _window_end(self, start: int, final: bool) -> Optional[int]:
+        """Furthest end offset of a chunk from start, None if more text is needed."""
+        if self.tokenizer is None:
+            end = start + self.chunk_size
+        else:
+            index = bisect_left(self._token_starts, start) + self.chunk_size
+            end = (
+                self._token_starts[index]
+                if index < len(self._token_starts)
+                else self._end() + 1
+            )
+        if end < self._end():
+            return end
+        return self._end() if final else None
+
+    def _cut(self, start: int, end: int) -> int:
+        """Best offset in the second half of [start, end] to end the chunk at."""
+        if end == self._end():
+            return end
+        low = start + max((end - start) // 2, 1)
+        best, best_strength = end, -1
+        for match in _WHITESPACE.finditer(
+            self._text, low - self._base, end - self._base + 1
+        ):
+            strength = _break_strength(self._text, match)
+            # The latest of the strongest breaks gives the fullest chunk
+            if strength >= best_strength:
+                best, best_strength = self._base + match.start(), strength
+        return best
+
+    def _next_start(self, start: int, cut: int) -> int:
+        if self.chunk_overlap:
+            if self.tokenizer is None:
+                target = cut - self.chunk_overlap
+            else:
+                index = bisect_left(self._token_starts, cut) - self.chunk_overlap
+                target = self._token_starts[max(index, 0)]
+            if target > start:
+                if self._text[target - self._base - 1].isspace():
+                    return target
+                # Begin the overlap on a word boundary
+                match = _WHITESPACE.search(
+                    self._text, target - self._base, cut - self._base
+                )
+                if match and self._base + match.end() < cut:
+                    return self._base + match.end()
+        return cut
+
+    def _page_at(self, offset: int) -> int:
+        return max(bisect_right(self._page_starts, offset) - 1, 0)
+
+    def _make_chunk(self, start: int, end: int) -> Optional[Chunk]:
+        raw = self._text[start - self._base : end - self._base]
+        text = raw.strip()
+        if not text:
+            return None
+        start += len(raw) - len(raw.lstrip())
+        end = start + len(text)
+        first, last = self._page_at(start), self._page_at(end - 1)
+        return Chunk(
+            text=text,
+            start=start,
+            end=end,
+            page=self._pages[first],
+            end_page=self._pages[last],
+            start_index=start - self._page_starts[first],
+        )
+
+    def _drain(self, final: bool) -> Iterator[Chunk]:
+        while self._start < self._end():
+            end = self._window_end(self._start, final)
+            if end is None:
+                break
+            cut = self._cut(self._start, end)
+            chunk = self._make_chunk(self._start, cut)
+            if chunk is not None:
+                yield chunk
+            self._start = (
+                cut if cut == self._end() else self._next_start(self._start, cut)
+            )
+        self._trim()
+
+    def _trim(self) -> None:
+        """Drop text, pages and tokens before the next chunk's start."""
+        drop = self._start - self._base
+        if drop <= 0:
+            return
+        self._text = self._text[drop:]
+        self._base = self._start
+        first = self._page_at(self._start)
+        del self._page_starts[:first], self._pages[:first]
+        del self._token_starts[: bisect_left(self._token_starts, self._start)]
+
+
+def chunk_pages(
+    pages: Iterable[tuple[int, str]],
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    tokenizer: Optional[Any] = None,
+) -> Iterator[Chunk]:
+    """Chunks of one file's (page number, text) pairs, yielded as they complete."""
+    chunker = PageChunker(chunk_size, chunk_overlap, tokenizer)
+    for page, text in pages:
+        yield from chunker.feed(page, text)
+    yield from chunker.finish()
@@ -1,31 +1,304 @@
-from typing import List
-from langchain_huggingface import HuggingFaceEmbeddings
+import contextvars
+import hashlib
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from qdrant_client import QdrantClient, models
 from qdrant_client.models import Distance, VectorParams, PayloadSchemaType
 from langchain_qdrant import QdrantVectorStore
 from langchain_core.documents import Document
 from app.config.settings import settings
+from app.services.collection_registry import CollectionEntry, CollectionRegistry
+from app.services.embedding_engine import EmbeddingEngine
+from app.services.qdrant_clients import create_qdrant_client
+from app.services.sparse_encoder import BM25SparseEncoder
+from app.services.storage_profiles import (
+    StorageProfile,
+    get_storage_profile,
+    search_params,
+)
+from app.services.telemetry import span
+
+
+# Named vectors of hybrid collections
+DENSE_VECTOR_NAME = "dense"
+SPARSE_VECTOR_NAME = "bm25"
+# Rank offset of reciprocal rank fusion across collections, as in Qdrant's RRF
+RRF_K = 60
+
+
+def filename_filter(selected_files: list[str] | None) -> Optional[models.Filter]:
+    """Qdrant filter restricting results to the given filenames."""
+    if not selected_files:
+        return None
+    return models.Filter(
+        must=[
+            models.FieldCondition(
+                key="metadata.filename",
+                match=models.MatchAny(any=selected_files),
+            )
+        ]
+    )
+
+
+def document_from_point(point: models.ScoredPoint, collection_name: str) -> Document:
+    """Convert a Qdrant point stored in the LangChain payload layout to a Document."""
+    metadata = point.payload.get(QdrantVectorStore.METADATA_KEY) or {}
+    metadata["_id"] = point.id
+    metadata["_collection_name"] = collection_name
+    return Document(
+        page_content=point.payload.get(QdrantVectorStore.CONTENT_KEY, ""),
+        metadata=metadata,
+    )
+
+
+def payload_selector(
+    content: str, metadata_fields: Optional[List[str]] = None
+) -> bool | List[str]:
+    """
+    with_payload for a search that returns content ("ids", "snippet" or
+    "full") and the given metadata fields, so Qdrant sends nothing else.
+    """
+    if content == "ids":
+        return False
+    if metadata_fields is None:
+        return [QdrantVectorStore.CONTENT_KEY, QdrantVectorStore.METADATA_KEY]
+    return [QdrantVectorStore.CONTENT_KEY] + [
+        f"{QdrantVectorStore.METADATA_KEY}.{field}" for field in metadata_fields
+    ]
+
+
+def point_result(
+    point: models.ScoredPoint, content: str, snippet_chars: int = 300
+) -> Dict[str, Any]:
+    """Plain dict for an API response, built from the point without a Document."""
+    result: Dict[str, Any] = {"id": point.id, "score": point.score}
+    if content == "ids":
+        return result
+    payload = point.payload or {}
+    text = payload.get(QdrantVectorStore.CONTENT_KEY, "")
+    if content == "snippet" and len(text) > snippet_chars:
+        text = text[:snippet_chars].rsplit(" ", 1)[0] + " ..."
+    result["content"] = text
+    result["metadata"] = payload.get(QdrantVectorStore.METADATA_KEY) or {}
+    return result
+
+
+# Namespace for deterministic chunk ids (uuid5)
+CHUNK_ID_NAMESPACE = uuid.UUID("5c3a2a55-0d0e-4c1b-9a52-6e1d1f1f4b7e")
+
+
+def chunk_position(doc: Document) -> tuple:
+    """Where a chunk sits in its file: (filename, page, start_index)."""
+    return (
+        doc.metadata.get("filename") or doc.metadata.get("source"),
+        doc.metadata.get("page"),
+        doc.metadata.get("start_index"),
+    )
+
+
+def chunk_id(collection_name: str, doc: Document) -> str:
+    """
+    Deterministic point id from the collection, the chunk's position and a hash
+    of its content: re-ingesting an unchanged chunk maps to the same point.
+    """
+    filename, page, start_index = chunk_position(doc)
+    content_hash = hashlib.sha256(doc.page_content.encode()).hexdigest()
+    key = f"{collection_name}|{filename}|{page}|{start_index}|{content_hash}"
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, key))
+
+
+def collection_config(
+    vector_size: int, hybrid: bool, profile: Optional[StorageProfile] = None
+) -> Dict[str, Any]:
+    """create_collection arguments for a dense-only or a dense + BM25 collection."""
+    profile = profile or StorageProfile()
+    dense = VectorParams(
+        size=vector_size, distance=Distance.COSINE, on_disk=profile.on_disk_vectors
+    )
+    if not hybrid:
+        return {"vectors_config": dense, **profile.collection_kwargs()}
+    return {
+        "vectors_config": {DENSE_VECTOR_NAME: dense},
+        # Qdrant applies the BM25 IDF term from its own collection statistics
+        "sparse_vectors_config": {
+            SPARSE_VECTOR_NAME: models.SparseVectorParams(
+                index=models.SparseIndexParams(on_disk=profile.on_disk_vectors),
+                modifier=models.Modifier.IDF,
+            )
+        },
+        **profile.collection_kwargs(),
+    }
+
+
+def is_hybrid_collection(info: models.CollectionInfo) -> bool:
+    return SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {})
+
+
+def collection_entry(name: str, info: models.CollectionInfo) -> CollectionEntry:
+    """Registry entry describing an existing collection."""
+    vectors = info.config.params.vectors
+    if isinstance(vectors, dict):
+        vectors = vectors[DENSE_VECTOR_NAME]
+    return CollectionEntry(
+        name=name, vector_size=vectors.size, hybrid=is_hybrid_collection(info)
+    )
+
+
+def search_request(
+    dense_vector: List[float],
+    sparse_vector: Optional[models.SparseVector],
+    hybrid_layout: bool,
+    query_filter: Optional[models.Filter],
+    k: int,
+    params: Optional[models.SearchParams] = None,
+    offset: int = 0,
+    score_threshold: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    query_points arguments: dense search, or dense and sparse candidates fused
+    with reciprocal rank fusion when the collection has a sparse vector.
+
+    offset skips that many hits (pagination); score_threshold drops hits
+    scoring below it, which for hybrid search is the fused RRF score.
+    """
+    if not hybrid_layout or sparse_vector is None or not sparse_vector.indices:
+        return {
+            "query": dense_vector,
+            "using": DENSE_VECTOR_NAME if hybrid_layout else None,
+            "query_filter": query_filter,
+            "search_params": params,
+            "limit": k,
+            "offset": offset,
+            "score_threshold": score_threshold,
+        }
+    prefetch_limit = max(settings.HYBRID_PREFETCH_LIMIT, offset + k)
+    return {
+        "prefetch": [
+            models.Prefetch(
+                query=dense_vector,
+                using=DENSE_VECTOR_NAME,
+                filter=query_filter,
+                params=params,
+                limit=prefetch_limit,
+            ),
+            models.Prefetch(
+                query=sparse_vector,
+                using=SPARSE_VECTOR_NAME,
+                filter=query_filter,
+                limit=prefetch_limit,
+            ),
+        ],
+        "query": models.FusionQuery(fusion=models.Fusion.RRF),
+        "limit": k,
+        "offset": offset,
+        "score_threshold": score_threshold,
+    }
+
+
+def batch_request(**kwargs: Any) -> models.QueryRequest:
+    """search_request arguments as a QueryRequest for query_batch_points."""
+    request = search_request(**kwargs)
+    request["filter"] = request.pop("query_filter", None)
+    request["params"] = request.pop("search_params", None)
+    return models.QueryRequest(**request, with_payload=True)
+
+
+def merge_results(
+    results: List[List[models.ScoredPoint]], collection_names: List[str], k: int
+) -> List[Document]:
+    """
+    Merge one query's hits from several collections into a single top k.
+
+    Raw scores are not comparable across collections (a hybrid collection
+    returns RRF scores, a dense one cosine similarity), so hits are fused by
+    their rank within their own collection, as reciprocal rank fusion.
+    """
+    scored = [
+        (1 / (RRF_K + rank), document_from_point(point, collection_name))
+        for points, collection_name in zip(results, collection_names)
+        for rank, point in enumerate(points, start=1)
+    ]
+    # Stable sort: equal ranks keep the order of collection_names
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [doc for _, doc in scored[:k]]
 
 
 class VectorStoreManager:
-    def __init__(self, embeddings: HuggingFaceEmbeddings) -> None:
-        self.client = QdrantClient(
-            api_key=settings.QDRANT_API_KEY,
-            url=settings.QDRANT_URL,
-        )
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        embedding_engine: Optional[EmbeddingEngine] = None,
+        sparse_encoder: Optional[BM25SparseEncoder] = None,
+        vector_size: Optional[int | Callable[[], int]] = None,
+        registry: Optional[CollectionRegistry] = None,
+    ) -> None:
+        self.client: QdrantClient = create_qdrant_client()
         self.embeddings = embeddings
+        self.embedding_engine = embedding_engine
+        # None keeps new collections dense-only
+        self.sparse_encoder = sparse_encoder
+        # A callable is resolved when the first collection is created, so the
+        # model need not be loaded to build the manager
+        self.vector_size = vector_size
+        self.registry = registry or CollectionRegistry()
+
+    def _notify_write(self, collection_name: str) -> None:
+        # Moves the data version that semantic cache entries are keyed on
+        self.registry.mark_written(collection_name)
 
     def _get_vector_size(self) -> int:
-        """Get embedding vector size dynamically."""
-        return len(self.embeddings.embed_query("dimension check"))
+        """Embedding dimension, from the model config when it's available."""
+        if callable(self.vector_size):
+            self.vector_size = self.vector_size()
+        if self.vector_size is None:
+            self.vector_size = (
+                self.embedding_engine.dimension
+                if self.embedding_engine is not None
+                else len(self.embeddings.embed_query("dimension check"))
+            )
+        return self.vector_size
 
-    def init_collection(self, collection_name: str) -> None:
-        """Create collection and indexes if not exists."""
+    def _entry(self, collection_name: str) -> CollectionEntry:
+        """Cached schema of the collection, fetched from Qdrant on first use."""
+        entry = self.registry.get(collection_name)
+        if entry is None:
+            entry = self.registry.put(
+                collection_entry(
+                    collection_name, self.client.get_collection(collection_name)
+                )
+            )
+        return entry
+
+    def _is_hybrid(self, collection_name: str) -> bool:
+        """Whether the collection uses the named dense + sparse vector layout."""
+        return self._entry(collection_name).hybrid
+
+    def init_collection(
+        self, collection_name: str, storage_profile: Optional[str] = None
+    ) -> None:
+        """
+        Create collection and indexes if not exists.
+
+        storage_profile (see STORAGE_PROFILES) only applies when the collection
+        is created; existing collections keep their storage settings.
+        """
+        if self.registry.get(collection_name) is not None:
+            return
         if not self.client.collection_exists(collection_name):
+            profile = get_storage_profile(storage_profile)
             vector_size = self._get_vector_size()
+            hybrid = self.sparse_encoder is not None
             self.client.create_collection(
                 collection_name=collection_name,
-                vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
+                **collection_config(vector_size, hybrid, profile),
+            )
+            self.registry.put(
+                CollectionEntry(
+                    name=collection_name, vector_size=vector_size, hybrid=hybrid
+                )
             )
             print(f"Created collection '{collection_name}'")
 
@@ -36,20 +309,248 @@ class VectorStoreManager:
                 field_schema=PayloadSchemaType.KEYWORD,
             )
         else:
+            self._entry(collection_name)
             print(f"Using existing collection '{collection_name}'")
 
+    def drop_collection(self, collection_name: str) -> bool:
+        """Delete the collection in Qdrant and forget it; False if it didn't exist."""
+        self.registry.invalidate(collection_name)
+        if not self.client.collection_exists(collection_name):
+            return False
+        self.client.delete_collection(collection_name)
+        self._notify_write(collection_name)
+        return True
+
+    def refresh_collection(self, collection_name: str) -> Optional[CollectionEntry]:
+        """Re-read the collection's schema from Qdrant; None if it doesn't exist."""
+        self.registry.invalidate(collection_name)
+        if not self.client.collection_exists(collection_name):
+            return None
+        return self._entry(collection_name)
+
+    def warm_up(self, collection_names: Optional[List[str]] = None) -> List[str]:
+        """Load the schema of the given (by default all) collections into the registry."""
+        if collection_names is None:
+            collection_names = [
+                c.name for c in self.client.get_collections().collections
+            ]
+        for collection_name in collection_names:
+            self._entry(collection_name)
+        return collection_names
+
     def get_vector_store(self, collection_name: str) -> QdrantVectorStore:
         """Return LangChain Qdrant vector store wrapper."""
-        return QdrantVectorStore(
-            client=self.client,
-            collection_name=collection_name,
-            embedding=self.embeddings,
+        entry = self._entry(collection_name)
+        if entry.vector_store is None:
+            entry.vector_store = QdrantVectorStore(
+                client=self.client,
+                collection_name=collection_name,
+                embedding=self.embeddings,
+                vector_name=DENSE_VECTOR_NAME if entry.hybrid else "",
+            )
+        return entry.vector_store
+
+    def _upsert(
+        self, collection_name: str, docs: list[Document], vectors: np.ndarray
+    ) -> None:
+        """Write pre-computed vectors using the LangChain payload layout."""
+        batch_vectors = vectors.tolist()
+        if self._is_hybrid(collection_name):
+            batch_vectors = {DENSE_VECTOR_NAME: batch_vectors}
+            if self.sparse_encoder is not None:
+                # Runs on the upsert thread, overlapping the next batch's embedding
+                batch_vectors[SPARSE_VECTOR_NAME] = (
+                    self.sparse_encoder.encode_documents(
+                        [doc.page_content for doc in docs]
+                    )
+                )
+        with span("qdrant.upsert", collection=collection_name, points=len(docs)):
+            self.client.upsert(
+                collection_name=collection_name,
+                points=models.Batch(
+                    ids=[chunk_id(collection_name, doc) for doc in docs],
+                    vectors=batch_vectors,
+                    payloads=[
+                        {
+                            QdrantVectorStore.CONTENT_KEY: doc.page_content,
+                            QdrantVectorStore.METADATA_KEY: doc.metadata,
+                        }
+                        for doc in docs
+                    ],
+                ),
+                wait=True,
+            )
+
+    def _embed_documents(self, texts: list[str]) -> np.ndarray:
+        with span("embedding.documents", texts=len(texts)):
+            if self.embedding_engine is not None:
+                return self.embedding_engine.embed(texts)
+            return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+    def add_document_batches(
+        self, collection_name: str, batches: Iterable[list[Document]]
+    ) -> int:
+        """Embed and upsert a stream of document batches, returning the chunk count."""
+        total = 0
+        # Embed the next batch while the previous one is being upserted
+        pending: Optional[Future] = None
+        try:
+            with ThreadPoolExecutor(max_workers=1) as upserter:
+                for docs in batches:
+                    if not docs:
+                        continue
+                    vectors = self._embed_documents([doc.page_content for doc in docs])
+                    if pending is not None:
+                        pending.result()
+                    # Carry the trace over to the upsert thread
+                    pending = upserter.submit(
+                        contextvars.copy_context().run,
+                        self._upsert,
+                        collection_name,
+                        docs,
+                        vectors,
+                    )
+                    total += len(docs)
+                if pending is not None:
+                    pending.result()
+        finally:
+            # Notify even after a partial write, since some batches may have landed
+            if total:
+                self._notify_write(collection_name)
+        return total
+
+    def _existing_chunks(self, collection_name: str, filename: str) -> Dict[str, tuple]:
+        """Point id -> chunk position for every chunk stored for the filename."""
+        existing = {}
+        offset = None
+        with span("qdrant.scroll", collection=collection_name):
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=filename_filter([filename]),
+                    limit=1000,
+                    offset=offset,
+                    with_payload=[QdrantVectorStore.METADATA_KEY],
+                    with_vectors=False,
+                )
+                for point in points:
+                    metadata = point.payload.get(QdrantVectorStore.METADATA_KEY) or {}
+                    existing[str(point.id)] = chunk_position(
+                        Document(page_content="", metadata=metadata)
+                    )
+                if offset is None:
+                    return existing
+
+    def stored_file_hash(
+        self, collection_name: str, filename: str
+    ) -> tuple[Optional[str], int]:
+        """
+        SHA-256 of the file version stored for filename, and its chunk count.
+
+        The hash is None when the file isn't stored or its chunks don't all
+        carry the same file_sha256 (e.g. ingested before hashes were recorded).
+        """
+        hashes = set()
+        count = 0
+        offset = None
+        with span("qdrant.scroll", collection=collection_name):
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=filename_filter([filename]),
+                    limit=1000,
+                    offset=offset,
+                    with_payload=[QdrantVectorStore.METADATA_KEY],
+                    with_vectors=False,
+                )
+                for point in points:
+                    metadata = point.payload.get(QdrantVectorStore.METADATA_KEY) or {}
+                    hashes.add(metadata.get("file_sha256"))
+                count += len(points)
+                if offset is None:
+                    break
+        file_hash = hashes.pop() if len(hashes) == 1 else None
+        return file_hash, count
+
+    def sync_document_batches(
+        self,
+        collection_name: str,
+        filename: str,
+        batches: Iterable[list[Document]],
+        file_sha256: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Incrementally re-ingest one file.
+
+        Unchanged chunks are neither embedded nor upserted, new and changed ones
+        are, and chunks of the file that no longer exist are deleted once the new
+        version is in place. Returns added, updated, unchanged and deleted counts.
+
+        file_sha256 is recorded on every chunk of the file, including unchanged
+        ones, so an identical re-upload can be recognised by stored_file_hash().
+        """
+        existing = self._existing_chunks(collection_name, filename)
+        existing_positions = set(existing.values())
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+        seen_ids = set()
+        seen_positions = set()
+
+        def changed_batches() -> Iterable[list[Document]]:
+            for docs in batches:
+                changed = []
+                for doc in docs:
+                    if file_sha256:
+                        doc.metadata["file_sha256"] = file_sha256
+                    point_id = chunk_id(collection_name, doc)
+                    position = chunk_position(doc)
+                    seen_ids.add(point_id)
+                    seen_positions.add(position)
+                    if point_id in existing:
+                        counts["unchanged"] += 1
+                    else:
+                        # Same position with new content replaces the old point
+                        kind = "updated" if position in existing_positions else "added"
+                        counts[kind] += 1
+                        changed.append(doc)
+                yield changed
+
+        self.add_document_batches(collection_name, changed_batches())
+
+        unchanged = [point_id for point_id in existing if point_id in seen_ids]
+        if file_sha256 and unchanged:
+            with span("qdrant.set_payload", collection=collection_name):
+                self.client.set_payload(
+                    collection_name=collection_name,
+                    payload={"file_sha256": file_sha256},
+                    points=unchanged,
+                    key=QdrantVectorStore.METADATA_KEY,
+                    wait=True,
+                )
+
+        stale = [point_id for point_id in existing if point_id not in seen_ids]
+        if stale:
+            with span("qdrant.delete", collection=collection_name, points=len(stale)):
+                self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=models.PointIdsList(points=stale),
+                    wait=True,
+                )
+            self._notify_write(collection_name)
+        counts["deleted"] = sum(
+            1 for point_id in stale if existing[point_id] not in seen_positions
         )
+        return counts
 
     def add_documents(self, collection_name: str, docs: list[Document]) -> None:
         """Insert documents into vector store."""
-        vs = self.get_vector_store(collection_name)
-        vs.add_documents(docs)
+        batch_size = settings.INGEST_BATCH_SIZE
+        self.add_document_batches(
+            collection_name,
+            (
+                docs[start : start + batch_size]
+                for start in range(0, len(docs), batch_size)
+            ),
+        )
         print(f"Uploaded {len(docs)} chunks to '{collection_name}'")
 
     def query(
@@ -58,20 +559,29 @@ class VectorStoreManager:
         query: str,
         selected_files: list[str] | None = None,
         k: int = 3,
+        hnsw_ef: Optional[int] = None,
+        oversampling: Optional[float] = None,
     ) -> List[Document]:
         """Search collection with optional filename filter."""
-        vs = self.get_vector_store(collection_name)
-
-        filter_ = None
-        if selected_files:
-            filter_ = models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="metadata.filename",
-                        match=models.MatchAny(any=selected_files),
-                    )
-                ]
+        with span("embedding.query"):
+            dense_vector = self.embeddings.embed_query(query)
+        sparse_vector = (
+            self.sparse_encoder.encode_query(query) if self.sparse_encoder else None
+        )
+        hybrid_layout = self._is_hybrid(collection_name)
+        with span("qdrant.query", collection=collection_name):
+            response = self.client.query_points(
+                collection_name=collection_name,
+                **search_request(
+                    dense_vector=dense_vector,
+                    sparse_vector=sparse_vector,
+                    hybrid_layout=hybrid_layout,
+                    query_filter=filename_filter(selected_files),
+                    k=k,
+                    params=search_params(hnsw_ef, oversampling),
+                ),
+                with_payload=True,
             )
-
-        results = vs.similarity_search(query, k=k, filter=filter_)
-        return results
+        return [
+            document_from_point(point, collection_name) for point in response.points
+        ]
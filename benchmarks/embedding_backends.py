@@ -0,0 +1,114 @@
+"""
+Compare embedding backends for speed and parity with the torch model.
+
+Chunks the PDFs, embeds every chunk with the float32 torch backend as the
+reference, then with each other backend, and reports throughput and the
+cosine similarity of each vector to its torch counterpart. Exits non-zero
+when any backend's minimum cosine falls below --tolerance, so vectors from
+that backend would not be safe to mix into existing collections.
+
+    python -m benchmarks.embedding_backends docs/*.pdf
+    python -m benchmarks.embedding_backends docs/*.pdf --backends onnx-int8 --threads 4
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from app.config.settings import settings
+from app.services.embeddings_manager import EmbeddingsManager
+from app.services.file_processor import FileProcessor
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+
+def load_texts(paths: List[str]) -> List[str]:
+    file_processor = FileProcessor()
+    texts = []
+    try:
+        for path in paths:
+            for batch in file_processor.iter_chunks(
+                file_processor.iter_pages(path), 256
+            ):
+                texts.extend(doc.page_content for doc in batch)
+    finally:
+        file_processor.shutdown()
+    return texts
+
+
+def embed(
+    backend: str, texts: List[str], threads: Optional[int], repeat: int
+) -> tuple[np.ndarray, float]:
+    manager = EmbeddingsManager(backend=backend, threads=threads)
+    engine = manager.engine
+    engine.embed(texts[:1])  # model load and export are not part of the throughput
+    started = time.perf_counter()
+    for _ in range(repeat):
+        vectors = engine.embed(texts)
+    return vectors, (time.perf_counter() - started) / repeat
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--threads", type=int, default=settings.EMBEDDING_THREADS)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.99,
+        help="minimum cosine similarity to the torch vectors",
+    )
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    # Every backend has to compute its own vectors
+    settings.EMBEDDING_CACHE_ENABLED = False
+
+    texts = load_texts(args.pdfs)
+    reference, reference_seconds = embed("torch", texts, args.threads, args.repeat)
+
+    results: List[Dict] = []
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        if backend == "torch":
+            vectors, seconds = reference, reference_seconds
+        else:
+            vectors, seconds = embed(backend, texts, args.threads, args.repeat)
+        similarity = cosine(vectors, reference)
+        results.append(
+            {
+                "backend": backend,
+                "texts": len(texts),
+                "seconds": round(seconds, 3),
+                "texts_per_s": round(len(texts) / seconds, 1),
+                "speedup": round(reference_seconds / seconds, 2),
+                "min_cosine": round(float(similarity.min()), 5),
+                "mean_cosine": round(float(similarity.mean()), 5),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(", ".join(f"{key}={value}" for key, value in result.items()))
+
+    failed = [r["backend"] for r in results if r["min_cosine"] < args.tolerance]
+    if failed:
+        print(
+            f"Below cosine tolerance {args.tolerance}: {', '.join(failed)}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
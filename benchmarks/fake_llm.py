@@ -0,0 +1,83 @@
+"""Deterministic offline chat model standing in for LLMManager in benchmarks."""
+
+import time
+import uuid
+from typing import Any, List, Optional, Sequence
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from app.services.llm_manager import LLMManager
+from app.services.telemetry import token_usage_callback
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Answers without a network call, with an optional simulated latency.
+
+    With tools bound, a user turn is answered with a rag_retrival call for the
+    user's message, and the tool result with a short answer quoting it; without
+    tools (RAG answers, summaries) it replies with the start of its prompt.
+    """
+
+    latency_ms: float = 0.0
+    answer_chars: int = 200
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools])
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[list]) -> AIMessage:
+        last = messages[-1]
+        tool_names = {tool["function"]["name"] for tool in tools or []}
+        if isinstance(last, HumanMessage) and "rag_retrival" in tool_names:
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "rag_retrival",
+                        "args": {"user_query": last.content},
+                        "id": f"call_{uuid.uuid4().hex[:12]}",
+                    }
+                ],
+            )
+        source = last.content if isinstance(last, ToolMessage) else messages[0].content
+        return AIMessage(content=f"Based on [1]: {str(source)[: self.answer_chars]}")
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        message = self._reply(messages, kwargs.get("tools"))
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = len(message.content.split()) + 10 * len(message.tool_calls)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class FakeLLMManager(LLMManager):
+    """LLMManager whose every model is one shared FakeChatModel."""
+
+    latency_ms: float = 0.0
+
+    def get_model(self, *args: Any, **kwargs: Any) -> BaseChatModel:
+        key = ("fake", "fake", "")
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = FakeChatModel(
+                    latency_ms=self.latency_ms, callbacks=[token_usage_callback]
+                )
+            return self._models[key]
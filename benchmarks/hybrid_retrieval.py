@@ -0,0 +1,152 @@
+"""
+Compare dense-only and hybrid (dense + BM25, RRF) retrieval.
+
+Ingests the PDFs into one collection per mode on a local in-memory Qdrant (or
+the server given with --qdrant-url), then runs known-item queries: a short
+span of words taken from a random chunk, which must bring that chunk back.
+Reports ingest time, query latency and recall@k / MRR for each mode.
+
+    python -m benchmarks.hybrid_retrieval docs/*.pdf --queries 200 --k 3
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Dict, List, Optional
+from langchain_core.documents import Document
+from qdrant_client import QdrantClient
+from app.config.settings import settings
+from app.services.embeddings_manager import EmbeddingsManager
+from app.services.file_processor import FileProcessor
+from app.services.sparse_encoder import BM25SparseEncoder
+from app.services.vector_store_manager import VectorStoreManager
+
+
+def load_chunks(file_processor: FileProcessor, paths: List[str]) -> List[Document]:
+    chunks = []
+    for path in paths:
+        for batch in file_processor.iter_chunks(file_processor.iter_pages(path), 256):
+            chunks.extend(batch)
+    return chunks
+
+
+def make_queries(
+    chunks: List[Document], count: int, words: int, seed: int
+) -> List[Dict]:
+    rng = random.Random(seed)
+    queries = []
+    for chunk in rng.sample(chunks, min(count, len(chunks))):
+        tokens = chunk.page_content.split()
+        if len(tokens) <= words:
+            continue
+        start = rng.randrange(len(tokens) - words)
+        queries.append(
+            {"query": " ".join(tokens[start : start + words]), "expected": chunk}
+        )
+    return queries
+
+
+def percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run_mode(
+    mode: str,
+    client: QdrantClient,
+    embeddings_manager: EmbeddingsManager,
+    chunks: List[Document],
+    queries: List[Dict],
+    k: int,
+) -> Dict:
+    manager = VectorStoreManager(
+        embeddings=embeddings_manager.embeddings,
+        embedding_engine=embeddings_manager.engine,
+        sparse_encoder=BM25SparseEncoder() if mode == "hybrid" else None,
+    )
+    manager.client = client
+    collection_name = f"benchmark_{mode}"
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    manager.init_collection(collection_name)
+
+    started = time.perf_counter()
+    manager.add_documents(collection_name, chunks)
+    ingest_seconds = time.perf_counter() - started
+
+    latencies, hits, reciprocal_ranks = [], 0, []
+    for item in queries:
+        started = time.perf_counter()
+        results = manager.query(collection_name, item["query"], k=k)
+        latencies.append(time.perf_counter() - started)
+
+        expected = item["expected"]
+        rank = next(
+            (
+                i
+                for i, doc in enumerate(results, start=1)
+                if doc.page_content == expected.page_content
+            ),
+            None,
+        )
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    return {
+        "mode": mode,
+        "chunks": len(chunks),
+        "ingest_seconds": round(ingest_seconds, 3),
+        "ingest_chunks_per_second": round(len(chunks) / ingest_seconds, 1),
+        "queries": len(queries),
+        f"recall@{k}": round(hits / len(queries), 3),
+        "mrr": round(statistics.mean(reciprocal_ranks), 3),
+        "query_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "query_p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--qdrant-url", default=None, help="defaults to in-memory")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=6)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument(
+        "--embedding-cache",
+        action="store_true",
+        help="keep the embedding cache on (both modes then share embeddings)",
+    )
+    args = parser.parse_args(argv)
+    settings.EMBEDDING_CACHE_ENABLED = args.embedding_cache
+
+    client = (
+        QdrantClient(url=args.qdrant_url)
+        if args.qdrant_url
+        else QdrantClient(location=":memory:")
+    )
+    file_processor = FileProcessor()
+    embeddings_manager = EmbeddingsManager()
+    try:
+        chunks = load_chunks(file_processor, args.pdfs)
+        queries = make_queries(chunks, args.queries, args.query_words, args.seed)
+        results = [
+            run_mode(mode, client, embeddings_manager, chunks, queries, args.k)
+            for mode in ("dense", "hybrid")
+        ]
+    finally:
+        file_processor.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(", ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Offline benchmark of ingestion, retrieval and end-to-end agent latency.
+
+Runs with no network: Qdrant in local mode (in-memory unless
+RAG_CHATBOT_QDRANT_PATH is set), the embedding model from the local Hugging
+Face cache and a fake chat model in place of LLMManager. Measures PDF
+load_and_split throughput, embedding and upsert throughput, query latency
+percentiles and /invoke-graph latency through FastAPI's test client, and
+writes the results as JSON so versions can be compared.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --files docs/*.pdf --repeat 3 --llm-latency-ms 300
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+_TMP_DIR = tempfile.mkdtemp(prefix="rag-benchmark-")
+
+# Settings are read on import, so the offline configuration has to come first;
+# variables already set in the environment win.
+_OFFLINE_ENV = {
+    "RAG_CHATBOT_QDRANT_URL": ":memory:",
+    "RAG_CHATBOT_QDRANT_API_KEY": "",
+    "RAG_CHATBOT_LLM_PROVIDER": "fake",
+    "RAG_CHATBOT_LLM_MODEL": "fake",
+    "RAG_CHATBOT_CHECKPOINTER_BACKEND": "memory",
+    "RAG_CHATBOT_EMBEDDING_CACHE_ENABLED": "false",
+    "RAG_CHATBOT_SEMANTIC_CACHE_ENABLED": "false",
+    "RAG_CHATBOT_COLLECTION_WARMUP_ENABLED": "false",
+    "RAG_CHATBOT_INGEST_JOBS_DB_PATH": os.path.join(_TMP_DIR, "jobs.sqlite3"),
+    "RAG_CHATBOT_INGEST_SPOOL_DIR": os.path.join(_TMP_DIR, "spool"),
+    "RAG_CHATBOT_COLLECTION_VERSIONS_DB_PATH": os.path.join(
+        _TMP_DIR, "collection_versions.sqlite3"
+    ),
+    "HF_HUB_OFFLINE": "1",
+    "TRANSFORMERS_OFFLINE": "1",
+}
+for _key, _value in _OFFLINE_ENV.items():
+    os.environ.setdefault(_key, _value)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.config.settings import settings  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.services_registry import services  # noqa: E402
+from benchmarks.fake_llm import FakeLLMManager  # noqa: E402
+
+services.override(llm_manager=FakeLLMManager())
+
+DEFAULT_QUERIES = [
+    "What are the main challenges of long-duration human spaceflight?",
+    "How does radiation affect astronauts?",
+    "Which renewable energy sources are growing fastest?",
+    "What limits the adoption of solar and wind power?",
+    "How can energy storage support the grid?",
+    "What role does the International Space Station play in research?",
+]
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+
+    def at(fraction: float) -> float:
+        index = min(len(ordered) - 1, int(len(ordered) * fraction))
+        return round(ordered[index] * 1000, 2)
+
+    return {
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def git_version() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_load_and_split(file_paths: List[str], repeat: int) -> tuple[Dict, list]:
+    # Warm-up pass so starting the parser processes is not part of the throughput
+    asyncio.run(services.file_processor.load_and_split(file_paths=file_paths[:1]))
+    elapsed, pages, chunks = 0.0, 0, []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = asyncio.run(
+            services.file_processor.load_and_split(file_paths=file_paths)
+        )
+        elapsed += time.perf_counter() - started
+        pages += len({(doc.metadata["source"], doc.metadata["page"]) for doc in chunks})
+    return {
+        "files": len(file_paths),
+        "pages": pages // repeat,
+        "chunks": len(chunks),
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(pages / elapsed, 1),
+        "chunks_per_s": round(len(chunks) * repeat / elapsed, 1),
+    }, chunks
+
+
+def bench_embedding(texts: List[str], repeat: int) -> tuple[Dict, list]:
+    engine = services.embeddings_manager.engine
+    engine.embed(texts[:1])  # model load is not part of the throughput
+    started = time.perf_counter()
+    for _ in range(repeat):
+        vectors = engine.embed(texts)
+    elapsed = time.perf_counter() - started
+    return {
+        "texts": len(texts),
+        "dimension": int(vectors.shape[1]),
+        "seconds": round(elapsed, 3),
+        "texts_per_s": round(len(texts) * repeat / elapsed, 1),
+    }, vectors
+
+
+def bench_upsert(collection_name: str, chunks: list, vectors, batch_size: int) -> Dict:
+    services.vector_store_manager.init_collection(collection_name)
+    started = time.perf_counter()
+    for start in range(0, len(chunks), batch_size):
+        services.vector_store_manager._upsert(
+            collection_name,
+            chunks[start : start + batch_size],
+            vectors[start : start + batch_size],
+        )
+    elapsed = time.perf_counter() - started
+    return {
+        "points": len(chunks),
+        "batch_size": batch_size,
+        "seconds": round(elapsed, 3),
+        "points_per_s": round(len(chunks) / elapsed, 1),
+    }
+
+
+def bench_query(collection_name: str, queries: List[str], runs: int, k: int) -> Dict:
+    services.vector_store_manager.query(collection_name, queries[0], k=k)  # warm-up
+    latencies = []
+    for run in range(runs):
+        started = time.perf_counter()
+        services.vector_store_manager.query(
+            collection_name, queries[run % len(queries)], k=k
+        )
+        latencies.append(time.perf_counter() - started)
+    return {"runs": runs, "k": k, "retrieval_mode": settings.RETRIEVAL_MODE} | (
+        percentiles(latencies)
+    )
+
+
+def bench_invoke_graph(collection_name: str, queries: List[str], runs: int) -> Dict:
+    latencies = []
+    with TestClient(app) as client:
+        checkpointer = services.knowledge_bot_app.checkpointer
+        for run in range(runs):
+            # The thread id names the collection rag_retrival searches, so every
+            # run starts that thread afresh: otherwise each run would carry the
+            # history of all runs before it and latency would grow with run
+            checkpointer.delete_thread(collection_name)
+            body = {
+                "user_query": queries[run % len(queries)],
+                "thread_id": collection_name,
+                "metadata": {"selected_files": None},
+            }
+            started = time.perf_counter()
+            response = client.post("/invoke-graph", json=body)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+    return {"runs": runs, "collection_name": collection_name} | percentiles(latencies)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", nargs="+", default=sorted(glob.glob("docs/*.pdf")))
+    parser.add_argument("--queries-file", help="one query per line")
+    parser.add_argument("--collection", default="benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the files")
+    parser.add_argument("--query-runs", type=int, default=100)
+    parser.add_argument("--graph-runs", type=int, default=20)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not args.files:
+        parser.error("no PDFs found, pass --files")
+    queries = DEFAULT_QUERIES
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    services.llm_manager.latency_ms = args.llm_latency_ms
+    collection_name = args.collection
+
+    try:
+        load_results, chunks = bench_load_and_split(args.files, args.repeat)
+        embed_results, vectors = bench_embedding(
+            [doc.page_content for doc in chunks], args.repeat
+        )
+        results = {
+            "version": git_version(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "config": {
+                "embedding_model": services.embeddings_manager._model_name,
+                "retrieval_mode": settings.RETRIEVAL_MODE,
+                "rerank_enabled": settings.RERANK_ENABLED,
+                "qdrant": settings.QDRANT_PATH or settings.QDRANT_URL,
+                "llm_latency_ms": args.llm_latency_ms,
+                "files": [os.path.basename(path) for path in args.files],
+            },
+            "load_and_split": load_results,
+            "embedding": embed_results,
+            "upsert": bench_upsert(collection_name, chunks, vectors, args.batch_size),
+            "query": bench_query(collection_name, queries, args.query_runs, args.k),
+            "invoke_graph": bench_invoke_graph(
+                collection_name, queries, args.graph_runs
+            ),
+        }
+    finally:
+        services.file_processor.shutdown()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
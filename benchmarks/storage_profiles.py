@@ -0,0 +1,151 @@
+"""
+Compare recall@k and query latency across collection storage profiles.
+
+Loads the same vectors into one collection per profile and checks the top k of
+each query against exact (brute-force) nearest neighbours computed with numpy.
+Vectors are synthetic clustered unit vectors by default, so no embedding model
+is needed. Each profile is queried with every --hnsw-ef / --oversampling pair.
+
+Qdrant's local mode (the default, in-memory) searches exhaustively and ignores
+quantization and HNSW settings; pass --qdrant-url of a server to measure them.
+
+    python -m benchmarks.storage_profiles --points 20000 --dim 384
+    python -m benchmarks.storage_profiles --qdrant-url http://localhost:6333
+"""
+
+import argparse
+import itertools
+import json
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from qdrant_client import QdrantClient, models
+from app.services.storage_profiles import STORAGE_PROFILES, search_params
+from app.services.vector_store_manager import collection_config
+
+
+def make_vectors(
+    points: int, queries: int, dim: int, clusters: int, seed: int
+) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(clusters, size=points + queries)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(points + queries, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors.astype(np.float32)
+    return vectors[:points], vectors[points:]
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ data.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def load_profile(
+    client: QdrantClient, profile_name: str, data: np.ndarray, batch_size: int
+) -> tuple[str, float]:
+    collection_name = f"benchmark_profile_{profile_name}"
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(
+        collection_name=collection_name,
+        **collection_config(
+            data.shape[1], hybrid=False, profile=STORAGE_PROFILES[profile_name]
+        ),
+    )
+    started = time.perf_counter()
+    for start in range(0, len(data), batch_size):
+        batch = data[start : start + batch_size]
+        client.upsert(
+            collection_name=collection_name,
+            points=models.Batch(
+                ids=list(range(start, start + len(batch))), vectors=batch.tolist()
+            ),
+            wait=True,
+        )
+    return collection_name, time.perf_counter() - started
+
+
+def run_queries(
+    client: QdrantClient,
+    collection_name: str,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+    hnsw_ef: Optional[int],
+    oversampling: Optional[float],
+) -> Dict:
+    params = search_params(hnsw_ef, oversampling)
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        response = client.query_points(
+            collection_name=collection_name,
+            query=query.tolist(),
+            search_params=params,
+            limit=k,
+        )
+        latencies.append(time.perf_counter() - started)
+        found = {point.id for point in response.points}
+        recalls.append(len(found & set(expected.tolist())) / k)
+
+    latencies.sort()
+    return {
+        "hnsw_ef": hnsw_ef,
+        "oversampling": oversampling,
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        "query_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "query_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--qdrant-url", default=None, help="defaults to in-memory")
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES))
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[None])
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[None])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    client = (
+        QdrantClient(url=args.qdrant_url)
+        if args.qdrant_url
+        else QdrantClient(location=":memory:")
+    )
+    data, queries = make_vectors(
+        args.points, args.queries, args.dim, args.clusters, args.seed
+    )
+    truth = exact_top_k(data, queries, args.k)
+
+    results = []
+    for profile_name in args.profiles:
+        collection_name, load_seconds = load_profile(
+            client, profile_name, data, args.batch_size
+        )
+        for hnsw_ef, oversampling in itertools.product(args.hnsw_ef, args.oversampling):
+            result = run_queries(
+                client, collection_name, queries, truth, args.k, hnsw_ef, oversampling
+            )
+            results.append(
+                {"profile": profile_name, "load_seconds": round(load_seconds, 2)}
+                | result
+            )
+        client.delete_collection(collection_name)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(", ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Offline settings for the test run.
+
+Settings are read on import, so they have to be in the environment before any
+test module imports app; variables already set in the environment win.
+"""
+
+import os
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="rag-tests-")
+
+_TEST_ENV = {
+    "RAG_CHATBOT_QDRANT_URL": ":memory:",
+    "RAG_CHATBOT_QDRANT_API_KEY": "",
+    "RAG_CHATBOT_LLM_PROVIDER": "fake",
+    "RAG_CHATBOT_LLM_MODEL": "fake",
+    "RAG_CHATBOT_CHECKPOINTER_BACKEND": "memory",
+    "RAG_CHATBOT_EMBEDDING_CACHE_ENABLED": "false",
+    "RAG_CHATBOT_SEMANTIC_CACHE_ENABLED": "false",
+    "RAG_CHATBOT_COLLECTION_WARMUP_ENABLED": "false",
+    "RAG_CHATBOT_INGEST_JOBS_DB_PATH": os.path.join(_TMP_DIR, "jobs.sqlite3"),
+    "RAG_CHATBOT_INGEST_SPOOL_DIR": os.path.join(_TMP_DIR, "spool"),
+    "RAG_CHATBOT_COLLECTION_VERSIONS_DB_PATH": os.path.join(
+        _TMP_DIR, "collection_versions.sqlite3"
+    ),
+    "HF_HUB_OFFLINE": "1",
+    "TRANSFORMERS_OFFLINE": "1",
+}
+for _key, _value in _TEST_ENV.items():
+    os.environ.setdefault(_key, _value)
@@ -0,0 +1,115 @@
+import itertools
+import operator
+import time
+from typing import Annotated, TypedDict
+import pytest
+from langgraph.graph import END, START, StateGraph
+from app.services.checkpointer import (
+    SEP,
+    BoundedCheckpointSaver,
+    SQLiteCheckpointStore,
+)
+
+
+class State(TypedDict):
+    items: Annotated[list, operator.add]
+
+
+def build_graph(saver: BoundedCheckpointSaver):
+    graph = StateGraph(State)
+    graph.add_node("step", lambda state: {"items": [len(state["items"])]})
+    graph.add_edge(START, "step")
+    graph.add_edge("step", END)
+    return graph.compile(checkpointer=saver)
+
+
+def run(graph, thread_id: str, item: str = "x") -> list:
+    config = {"configurable": {"thread_id": thread_id}}
+    return graph.invoke({"items": [item]}, config)["items"]
+
+
+@pytest.fixture
+def store(tmp_path) -> SQLiteCheckpointStore:
+    return SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> list:
+    # Strictly increasing time, so the LRU order of threads is well defined
+    now = [time.time()]
+    ticks = itertools.count()
+    monkeypatch.setattr(time, "time", lambda: now[0] + next(ticks) * 1e-3)
+    return now
+
+
+def test_threads_resume_from_their_latest_checkpoint(store) -> None:
+    graph = build_graph(BoundedCheckpointSaver(store))
+    assert run(graph, "a") == ["x", 1]
+    assert run(graph, "a") == ["x", 1, "x", 3]
+    assert run(graph, "b") == ["x", 1]
+
+
+def test_only_the_latest_checkpoint_and_its_blobs_are_kept(store) -> None:
+    saver = BoundedCheckpointSaver(store)
+    graph = build_graph(saver)
+    for _ in range(5):
+        run(graph, "a")
+
+    fields = store.field_names("a")
+    assert [f for f in fields if f.startswith(f"c{SEP}")] == [f"c{SEP}"]
+    checkpoint = saver.get_tuple({"configurable": {"thread_id": "a"}}).checkpoint
+    blobs = [f for f in fields if f.startswith(f"b{SEP}")]
+    assert len(blobs) == len(checkpoint["channel_versions"])
+
+
+def test_idle_threads_expire(store, clock: list) -> None:
+    saver = BoundedCheckpointSaver(store, ttl_seconds=60)
+    run(build_graph(saver), "a")
+    config = {"configurable": {"thread_id": "a"}}
+    assert saver.get_tuple(config) is not None
+
+    clock[0] += 120
+    assert saver.get_tuple(config) is None
+    assert store.field_names("a") == []
+
+
+def test_sweep_evicts_least_recently_used_threads_beyond_max_threads(
+    store, clock: list
+) -> None:
+    saver = BoundedCheckpointSaver(store, max_threads=2)
+    graph = build_graph(saver)
+    for thread_id in ("a", "b", "c"):
+        run(graph, thread_id)
+    run(graph, "a")
+
+    assert saver.sweep() == 1
+    assert sorted(thread_id for thread_id, _, _ in store.threads()) == ["a", "c"]
+
+
+def test_sweep_evicts_threads_beyond_max_bytes(store, clock: list) -> None:
+    saver = BoundedCheckpointSaver(store)
+    graph = build_graph(saver)
+    for thread_id in ("a", "b", "c"):
+        run(graph, thread_id)
+    sizes = {thread_id: size for thread_id, _, size in store.threads()}
+
+    saver.max_bytes = sizes["c"] + 1
+    assert saver.sweep() == 2
+    assert [thread_id for thread_id, _, _ in store.threads()] == ["c"]
+
+
+def test_pending_writes_are_kept_per_task(store) -> None:
+    saver = BoundedCheckpointSaver(store)
+    run(build_graph(saver), "a")
+    config = saver.get_tuple({"configurable": {"thread_id": "a"}}).config
+
+    saver.put_writes(config, [("items", ["one"])], task_id="task-1")
+    saver.put_writes(config, [("items", ["two"])], task_id="task-2")
+    # A retried task writes the same index again; it is not duplicated
+    saver.put_writes(config, [("items", ["one"])], task_id="task-1")
+
+    pending = saver.get_tuple(config).pending_writes
+    assert sorted(pending) == [
+        ("task-1", "items", ["one"]),
+        ("task-2", "items", ["two"]),
+    ]
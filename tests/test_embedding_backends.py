@@ -0,0 +1,63 @@
+"""
+Parity of the ONNX embedding backends with the torch model.
+
+Vectors from every backend end up in the same collections, so each has to
+stay within its cosine tolerance of the float32 torch vectors. Skipped when
+onnxruntime is not installed (the onnx extra) or the model is not in the
+local Hugging Face cache.
+"""
+
+from typing import Iterator
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("optimum")
+huggingface_hub = pytest.importorskip("huggingface_hub")
+
+from app.config.settings import settings  # noqa: E402
+from app.services.embeddings_manager import EmbeddingsManager  # noqa: E402
+from benchmarks.embedding_backends import cosine  # noqa: E402
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+TEXTS = [
+    "What is the capital of France?",
+    "Paris is the capital and most populous city of France.",
+    "The mitochondria is the powerhouse of the cell.",
+    "Astronauts on the International Space Station exercise two hours a day.",
+    "def merge_results(results, collection_names, k): ...",
+]
+
+if not isinstance(
+    huggingface_hub.try_to_load_from_cache(MODEL_NAME, "config.json"), str
+):
+    pytest.skip(f"{MODEL_NAME} is not in the local cache", allow_module_level=True)
+
+
+def embed(backend: str) -> np.ndarray:
+    return EmbeddingsManager(model_name=MODEL_NAME, backend=backend).engine.embed(
+        TEXTS
+    )
+
+
+@pytest.fixture(scope="module", autouse=True)
+def no_embedding_cache() -> Iterator[None]:
+    # Every backend has to compute its own vectors
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", False)
+        yield
+
+
+@pytest.fixture(scope="module")
+def reference(no_embedding_cache: None) -> np.ndarray:
+    return embed("torch")
+
+
+@pytest.mark.parametrize(
+    "backend, tolerance", [("onnx", 0.9999), ("onnx-int8", 0.99)]
+)
+def test_backend_matches_torch(
+    reference: np.ndarray, backend: str, tolerance: float
+) -> None:
+    similarity = cosine(embed(backend), reference)
+    assert similarity.min() >= tolerance
@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.services_registry import services
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    # No lifespan: the size check answers before any model or job is needed
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/upload-docs", "/api/upload-docs"])
+def test_oversized_upload_is_rejected_before_reading_the_body(
+    client: TestClient, path: str
+) -> None:
+    file_processor = services.file_processor
+    limit = file_processor.max_files * file_processor.max_bytes
+    response = client.post(
+        path,
+        content=b"x",
+        headers={
+            "content-length": str(limit + 2 * 1024 * 1024),
+            "content-type": "multipart/form-data; boundary=x",
+        },
+    )
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("Upload exceeds")
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("k", 0),
+        ("offset", -1),
+        ("snippet_chars", 0),
+        ("hnsw_ef", 0),
+        ("hnsw_ef", 100_000),
+        ("oversampling", 0.5),
+    ],
+)
+def test_out_of_range_query_values_are_rejected(
+    client: TestClient, field: str, value: float
+) -> None:
+    response = client.post(
+        "/query", json={"collection_name": "docs", "query": "q", field: value}
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", field]
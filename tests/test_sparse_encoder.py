@@ -0,0 +1,52 @@
+import zlib
+from app.services.sparse_encoder import BM25SparseEncoder
+
+encoder = BM25SparseEncoder()
+
+
+def weights(text: str) -> dict:
+    vector = encoder.encode_document(text)
+    return dict(zip(vector.indices, vector.values))
+
+
+def test_term_indices_are_crc32_and_stable_across_instances() -> None:
+    vector = BM25SparseEncoder(k1=2.0).encode_document("qdrant")
+    assert vector.indices == [zlib.crc32(b"qdrant")]
+    assert encoder.encode_query("Qdrant").indices == vector.indices
+
+
+def test_stopwords_are_dropped_and_compound_terms_split() -> None:
+    assert encoder.tokenize("The XJ-220 is in v2.1") == [
+        "xj-220",
+        "xj",
+        "220",
+        "v2.1",
+        "v2",
+        "1",
+    ]
+
+
+def test_query_matches_document_terms() -> None:
+    document = weights("Hybrid search with BM25 and dense vectors")
+    query = encoder.encode_query("bm25 vectors")
+    assert set(query.indices) <= set(document)
+    assert query.values == [1.0, 1.0]
+    assert query.indices == sorted(query.indices)
+
+
+def test_term_frequency_saturates() -> None:
+    once = weights("rust")[zlib.crc32(b"rust")]
+    twice = weights("rust rust")[zlib.crc32(b"rust")]
+    many = weights(" ".join(["rust"] * 50))[zlib.crc32(b"rust")]
+    assert once < twice < many < encoder.k1 + 1
+
+
+def test_longer_documents_weigh_a_term_less() -> None:
+    short = weights("rust compiler")[zlib.crc32(b"rust")]
+    long = weights("rust " + " ".join(f"word{i}" for i in range(300)))
+    assert long[zlib.crc32(b"rust")] < short
+
+
+def test_empty_text_encodes_to_an_empty_vector() -> None:
+    assert encoder.encode_document("the and of").indices == []
+    assert encoder.encode_query("").indices == []
@@ -0,0 +1,85 @@
+import re
+from typing import List, Tuple
+import pytest
+from app.services.text_chunker import PAGE_SEPARATOR, Chunk, PageChunker, chunk_pages
+
+PAGES = [
+    (
+        0,
+        "Alpha beta gamma. Delta epsilon zeta eta theta.\n\n"
+        "Iota kappa lambda mu nu xi omicron pi rho.",
+    ),
+    (1, "Sigma tau upsilon phi chi psi omega. The end of the second page is here."),
+]
+FULL_TEXT = PAGE_SEPARATOR.join(text for _, text in PAGES)
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word."""
+
+    def token_starts(self, text: str) -> List[int]:
+        return [match.start() for match in re.finditer(r"\S+", text)]
+
+
+def chunks(
+    size: int, overlap: int, pages: List[Tuple[int, str]] = PAGES
+) -> List[Chunk]:
+    return list(chunk_pages(pages, size, overlap))
+
+
+def test_chunks_are_spans_of_the_joined_pages() -> None:
+    for chunk in chunks(60, 15):
+        assert FULL_TEXT[chunk.start : chunk.end] == chunk.text
+        assert len(chunk.text) <= 60
+
+
+def test_cuts_prefer_a_paragraph_break() -> None:
+    first = chunks(60, 15)[0]
+    assert first.text == "Alpha beta gamma. Delta epsilon zeta eta theta."
+
+
+def test_without_overlap_chunks_cover_the_text_once() -> None:
+    words = " ".join(chunk.text for chunk in chunks(60, 0)).split()
+    assert words == FULL_TEXT.split()
+
+
+def test_overlap_starts_on_a_word_within_the_previous_chunk() -> None:
+    result = chunks(60, 15)
+    for previous, chunk in zip(result, result[1:]):
+        assert previous.start < chunk.start < previous.end
+        assert previous.end - chunk.start <= 15
+        assert FULL_TEXT[chunk.start - 1].isspace()
+
+
+def test_page_metadata_spans_page_boundaries() -> None:
+    result = chunks(60, 15)
+    pages = [(chunk.page, chunk.end_page) for chunk in result]
+    assert pages == [(0, 0), (0, 0), (0, 1), (1, 1)]
+    last = result[-1]
+    second_page = PAGES[1][1]
+    assert second_page[last.start_index :].startswith(last.text)
+
+
+def test_feeding_pages_one_by_one_matches_chunk_pages() -> None:
+    chunker = PageChunker(60, 15)
+    streamed = []
+    for page, text in PAGES:
+        streamed.extend(chunker.feed(page, text))
+    streamed.extend(chunker.finish())
+    assert [(c.start, c.end) for c in streamed] == [
+        (c.start, c.end) for c in chunks(60, 15)
+    ]
+
+
+def test_token_mode_sizes_chunks_in_tokens() -> None:
+    tokenizer = WordTokenizer()
+    result = list(chunk_pages(PAGES, 8, 2, tokenizer=tokenizer))
+    assert len(result) > 1
+    for chunk in result:
+        assert len(tokenizer.token_starts(chunk.text)) <= 8
+    assert result[-1].text.endswith("page is here.")
+
+
+def test_overlap_must_be_smaller_than_chunk_size() -> None:
+    with pytest.raises(ValueError):
+        PageChunker(chunk_size=100, chunk_overlap=100)
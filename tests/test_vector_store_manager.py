@@ -0,0 +1,70 @@
+from typing import List
+from langchain_core.documents import Document
+from qdrant_client import models
+from app.services.vector_store_manager import chunk_id, merge_results
+
+
+def points(name: str, scores: List[float]) -> List[models.ScoredPoint]:
+    return [
+        models.ScoredPoint(
+            id=i,
+            version=0,
+            score=score,
+            payload={"page_content": f"{name}-{i}", "metadata": {"filename": name}},
+        )
+        for i, score in enumerate(scores)
+    ]
+
+
+def contents(docs) -> List[str]:
+    return [doc.page_content for doc in docs]
+
+
+def test_merge_fuses_by_rank_not_raw_score() -> None:
+    # RRF scores from a hybrid collection are far below cosine similarities
+    hybrid = points("hybrid", [0.03, 0.02, 0.01])
+    dense = points("dense", [0.91, 0.90, 0.89])
+    merged = merge_results([hybrid, dense], ["hybrid", "dense"], k=4)
+    assert contents(merged) == ["hybrid-0", "dense-0", "hybrid-1", "dense-1"]
+
+
+def test_merge_keeps_a_strong_hit_from_a_short_list() -> None:
+    long = points("long", [0.9] * 10)
+    short = points("short", [0.1])
+    merged = merge_results([long, short], ["long", "short"], k=3)
+    assert contents(merged) == ["long-0", "short-0", "long-1"]
+
+
+def test_merge_tags_documents_with_their_collection() -> None:
+    merged = merge_results([points("a", [0.5]), []], ["a", "b"], k=5)
+    assert len(merged) == 1
+    assert merged[0].metadata["_collection_name"] == "a"
+    assert merged[0].metadata["_id"] == 0
+
+
+def chunk(text: str = "Mars has two moons.", **metadata) -> Document:
+    return Document(
+        page_content=text,
+        metadata={"filename": "mars.pdf", "page": 3, "start_index": 120, **metadata},
+    )
+
+
+def test_chunk_id_is_deterministic() -> None:
+    # Pinned: a changed id would re-ingest every existing chunk as new points
+    assert chunk_id("docs", chunk()) == chunk_id("docs", chunk())
+    assert chunk_id("docs", chunk()) == "867bb90e-e6cd-5d8d-9302-9abff618272b"
+
+
+def test_chunk_id_ignores_unrelated_metadata() -> None:
+    assert chunk_id("docs", chunk(source="/tmp/upload/mars.pdf")) == chunk_id(
+        "docs", chunk()
+    )
+
+
+def test_chunk_id_changes_with_position_content_and_collection() -> None:
+    base = chunk_id("docs", chunk())
+    assert chunk_id("other", chunk()) != base
+    assert chunk_id("docs", chunk("Mars has three moons.")) != base
+    assert chunk_id("docs", chunk(page=4)) != base
+    assert chunk_id("docs", chunk(start_index=121)) != base
+    assert chunk_id("docs", chunk(filename="venus.pdf")) != base